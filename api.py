@@ -0,0 +1,396 @@
+"""API HTTP/JSON de la agenda para los teléfonos de los técnicos y el bot.
+
+Uso:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Usa las mismas funciones de fx.db que la app (pool de conexiones y caché de
+lecturas incluidos); las consultas corren en el threadpool de Starlette
+para no bloquear el event loop.
+
+    GET  /appointments?date_from=&date_to=&status=&after=&limit=
+    GET  /appointments/{id}
+    POST /appointments                     {"client_name", "date", "time", ...}
+    PUT  /appointments/{id}/status         {"status": "Realizado"}
+    POST /appointments/status              {"updates": [{"id": 1, "status": "Cobrado"}, ...]}
+    GET  /route?date=&technicians=&technician=&status=    (sin status: Pendiente y Confirmado)
+    GET  /changes?since=&limit=&table=
+
+Los GET llevan ETag: mientras nadie escriba en la base, un cliente que
+manda If-None-Match recibe 304 sin que se consulte nada. Los cuerpos JSON
+se guardan en la caché de lecturas de fx.db, así que se invalidan con las
+mismas escrituras que las ETag.
+
+Los servicios archivados (fx.archive) se leen igual pero son de solo
+lectura: cambiarles el estado responde 409 con sus ids en "archived".
+"""
+import json
+import secrets
+import zlib
+from contextlib import asynccontextmanager
+from datetime import date, time
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from fx import db, routes
+
+MAX_LIMIT = 500
+MAX_UPDATES = 1000
+
+# Distingue las ETag de cada arranque: la generación de la caché vuelve a 0
+_ARRANQUE = secrets.token_hex(4)
+
+
+class BadRequest(ValueError):
+    """Parámetro o cuerpo inválido (respuesta 400)."""
+
+
+class MissingAppointments(LookupError):
+    """Ids de servicio que no existen (respuesta 404, no se guarda nada)."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        super().__init__(f"No existen los servicios {', '.join(map(str, ids))}")
+
+
+# ---------- UTILIDADES ----------
+
+def _error(status_code, mensaje, **extra):
+    return JSONResponse({"error": mensaje, **extra}, status_code=status_code)
+
+
+def _fecha(valor, campo):
+    try:
+        return date.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise BadRequest(f"{campo}: se espera AAAA-MM-DD")
+
+
+def _hora(valor, campo):
+    try:
+        return time.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise BadRequest(f"{campo}: se espera HH:MM")
+
+
+def _entero(valor, campo, minimo=None, maximo=None):
+    try:
+        n = int(valor)
+    except (TypeError, ValueError):
+        raise BadRequest(f"{campo}: se espera un entero")
+    if (minimo is not None and n < minimo) or (maximo is not None and n > maximo):
+        raise BadRequest(f"{campo}: fuera de rango")
+    return n
+
+
+def _texto(valor, campo):
+    if valor is None or isinstance(valor, str):
+        return valor
+    raise BadRequest(f"{campo}: se espera texto")
+
+
+def _estado(valor, campo="status", todos=False):
+    if valor in db.STATUSES or (todos and valor == "Todos"):
+        return valor
+    raise BadRequest(f"{campo}: debe ser uno de {', '.join(db.STATUSES)}")
+
+
+def _etag(request):
+    # La generación sube con cada escritura: misma URL + misma generación
+    # = misma respuesta. refresh_cache() la sube también si escribió otro
+    # proceso (la app de Streamlit).
+    db.refresh_cache()
+    generacion = db.cache_stats()["generation"]
+    url = zlib.crc32(str(request.url).encode())
+    return f'W/"{_ARRANQUE}-{generacion}-{url:08x}"'
+
+
+def _no_cambio(request, etag):
+    return etag in request.headers.get("if-none-match", "")
+
+
+async def _cuerpo(request):
+    try:
+        return await request.json()
+    except ValueError:
+        raise BadRequest("el cuerpo debe ser JSON")
+
+
+def _json(contenido):
+    # Igual que JSONResponse.render
+    return json.dumps(
+        contenido, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _respuesta(cuerpo, etag):
+    return Response(cuerpo, media_type="application/json", headers={"ETag": etag})
+
+
+def _servicio_json(r):
+    # fecha y hora (date/time) ya vienen como texto en date y time
+    return {k: v for k, v in r.items() if k not in ("fecha", "hora")}
+
+
+def _ruta_json(ruta):
+    return {
+        "technician": ruta.technician,
+        "km": ruta.km,
+        "late": ruta.late,
+        "zones": ruta.zones,
+        "stops": [
+            {
+                "order": s["orden"],
+                "id": s["id"],
+                "arrival": s["llegada"].strftime("%H:%M"),
+                "start": s["inicio"].strftime("%H:%M"),
+                "time": s["time"],
+                "client_name": s["client_name"],
+                "address": s["address"],
+                "zone": s["zone"],
+                "phone": s["phone"],
+                "status": s["status"],
+                "late": s["tarde"],
+                "leg_km": s["km_tramo"],
+            }
+            for s in ruta.stops
+        ],
+    }
+
+
+@db.cached
+def _pagina(date_from, date_to, status, after, limit):
+    rows, siguiente = db.get_appointments_page(
+        date_from=date_from, date_to=date_to, status=status, after=after, page_size=limit,
+    )
+    return _json({
+        "items": [_servicio_json(r) for r in rows],
+        "next": None if siguiente is None else f"{siguiente[0]},{siguiente[1]}",
+    })
+
+
+@db.cached
+def _servicio(appointment_id):
+    row = db.get_appointment_by_id(appointment_id)
+    return None if row is None else _json(_servicio_json(row))
+
+
+@db.cached
+def _rutas(fecha, technicians, status, technician):
+    # Cacheado también evita que cada consulta vuelva a planear (y que el
+    # 2-opt, limitado por tiempo, dé una ruta distinta en cada refresco)
+    rutas = routes.plan_day(fecha, technicians, status)
+    if technician is not None:
+        rutas = [r for r in rutas if r.technician == technician]
+    return _json({"date": str(fecha), "routes": [_ruta_json(r) for r in rutas]})
+
+
+def _cambiar_estados(cambios):
+    # Todo o nada: si falta algún id no se guarda ningún cambio. Un
+    # executemany por estado; si un id viene repetido, gana el último.
+    ultimos = dict(cambios)
+    por_estado = {}
+    for appointment_id, estado in ultimos.items():
+        por_estado.setdefault(estado, []).append(appointment_id)
+    with db.transaction() as tx:
+        actualizados = sum(
+            db.update_statuses(ids, estado, tx=tx) for estado, ids in por_estado.items()
+        )
+        if actualizados < len(ultimos):
+            marcas = ", ".join("?" * len(ultimos))
+            existen = {r[0] for r in tx.conn.execute(
+                f"SELECT id FROM appointments WHERE id IN ({marcas})", list(ultimos)
+            )}
+            raise MissingAppointments([i for i in ultimos if i not in existen])
+    # Ids distintos que se actualizaron (un id repetido cuenta una vez)
+    return actualizados
+
+
+# ---------- SERVICIOS ----------
+
+async def listar_servicios(request):
+    etag = _etag(request)
+    if _no_cambio(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    q = request.query_params
+    date_from = _fecha(q["date_from"], "date_from") if "date_from" in q else None
+    date_to = _fecha(q["date_to"], "date_to") if "date_to" in q else None
+    status = _estado(q["status"], todos=True) if "status" in q else None
+    limit = _entero(q.get("limit", db.PAGE_SIZE), "limit", 1, MAX_LIMIT)
+    after = None
+    if "after" in q:
+        # Cursor "scheduled_at,id" que devolvió la página anterior en "next"
+        partes = q["after"].split(",")
+        if len(partes) != 2:
+            raise BadRequest("after: se espera scheduled_at,id")
+        after = tuple(_entero(p, "after") for p in partes)
+
+    cuerpo = await run_in_threadpool(_pagina, date_from, date_to, status, after, limit)
+    return _respuesta(cuerpo, etag)
+
+
+async def ver_servicio(request):
+    etag = _etag(request)
+    if _no_cambio(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    cuerpo = await run_in_threadpool(_servicio, request.path_params["appointment_id"])
+    if cuerpo is None:
+        return _error(404, "No existe el servicio")
+    return _respuesta(cuerpo, etag)
+
+
+# Campos de texto de POST /appointments: texto o null, nada más
+_TEXTOS_SERVICIO = ("client_name", "service_type", "pest_type", "address", "zone", "phone", "notes")
+
+
+async def agendar_servicio(request):
+    datos = await _cuerpo(request)
+    if not isinstance(datos, dict):
+        raise BadRequest("client_name es obligatorio")
+    textos = {campo: _texto(datos.get(campo), campo) for campo in _TEXTOS_SERVICIO}
+    if not (textos["client_name"] or "").strip():
+        raise BadRequest("client_name es obligatorio")
+    fecha = _fecha(datos.get("date"), "date")
+    hora = _hora(datos.get("time"), "time")
+    price = datos.get("price")
+    if price is not None and not isinstance(price, (int, float)):
+        raise BadRequest("price: se espera un número")
+    client_id = datos.get("client_id")
+    if client_id is not None:
+        client_id = _entero(client_id, "client_id")
+
+    try:
+        appointment_id = await run_in_threadpool(
+            db.add_appointment,
+            **textos,
+            fecha=fecha,
+            hora=hora,
+            price=price,
+            status=_estado(datos.get("status", "Pendiente")),
+            is_monthly_service=bool(datos.get("is_monthly_service")),
+            client_id=client_id,
+            allow_overlap=bool(datos.get("allow_overlap")),
+        )
+    except db.ScheduleConflict as e:
+        huecos = await run_in_threadpool(db.next_free_slots, fecha, hora, 3)
+        return _error(
+            409, str(e),
+            conflicts=e.conflicts,
+            free_slots=[h.isoformat(timespec="minutes") for h in huecos],
+        )
+    cuerpo = await run_in_threadpool(_servicio, appointment_id)
+    return Response(cuerpo, status_code=201, media_type="application/json")
+
+
+async def cambiar_estado(request):
+    datos = await _cuerpo(request)
+    if not isinstance(datos, dict):
+        raise BadRequest('se espera {"status": ...}')
+    appointment_id = request.path_params["appointment_id"]
+    actualizados = await run_in_threadpool(
+        _cambiar_estados, [(appointment_id, _estado(datos.get("status")))]
+    )
+    return JSONResponse({"updated": actualizados})
+
+
+async def cambiar_estados(request):
+    """Varios cambios de estado en una sola transacción (cierre del día)."""
+    datos = await _cuerpo(request)
+    updates = datos.get("updates") if isinstance(datos, dict) else None
+    if not isinstance(updates, list) or not updates:
+        raise BadRequest('se espera {"updates": [{"id": ..., "status": ...}, ...]}')
+    if len(updates) > MAX_UPDATES:
+        raise BadRequest(f"como máximo {MAX_UPDATES} cambios por petición")
+    cambios = []
+    for u in updates:
+        if not isinstance(u, dict):
+            raise BadRequest('cada cambio es {"id": ..., "status": ...}')
+        cambios.append((_entero(u.get("id"), "id"), _estado(u.get("status"))))
+
+    actualizados = await run_in_threadpool(_cambiar_estados, cambios)
+    return JSONResponse({"updated": actualizados})
+
+
+# ---------- RUTA DEL DÍA ----------
+
+async def ruta_del_dia(request):
+    etag = _etag(request)
+    if _no_cambio(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    q = request.query_params
+    fecha = _fecha(q["date"], "date") if "date" in q else date.today()
+    tecnicos = _entero(q.get("technicians", db.TECHNICIANS), "technicians", 1, 50)
+    status = _estado(q["status"], todos=True) if "status" in q else None
+    tecnico = _entero(q["technician"], "technician", 1, tecnicos) if "technician" in q else None
+
+    cuerpo = await run_in_threadpool(_rutas, fecha, tecnicos, status, tecnico)
+    return _respuesta(cuerpo, etag)
+
+
+# ---------- CAMBIOS ----------
+
+async def listar_cambios(request):
+    # Para sincronizar: se pide desde el último seq que se vio y se sigue
+    # con "last" hasta que "changes" venga vacío
+    etag = _etag(request)
+    if _no_cambio(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    q = request.query_params
+    since = _entero(q.get("since", 0), "since", 0)
+    limit = _entero(q.get("limit", MAX_LIMIT), "limit", 1, MAX_LIMIT)
+    table = q.get("table")
+    if table is not None and table not in db.CHANGE_LOG_TABLES:
+        raise BadRequest(f"table: debe ser una de {', '.join(db.CHANGE_LOG_TABLES)}")
+
+    cambios = await run_in_threadpool(db.changes_since, since, limit, table)
+    return _respuesta(_json({
+        "changes": cambios,
+        "last": cambios[-1]["seq"] if cambios else since,
+    }), etag)
+
+
+# ---------- APLICACIÓN ----------
+
+async def _bad_request(request, exc):
+    return _error(400, str(exc))
+
+
+async def _missing(request, exc):
+    return _error(404, str(exc), missing=exc.ids)
+
+
+async def _archived(request, exc):
+    # Existen (GET los devuelve) pero están en un archivo por año
+    return _error(409, str(exc), archived=exc.ids)
+
+
+@asynccontextmanager
+async def _ciclo_de_vida(app):
+    db.init_db()
+    yield
+    db.close_pools()
+
+
+app = Starlette(
+    routes=[
+        Route("/appointments", listar_servicios, methods=["GET"]),
+        Route("/appointments", agendar_servicio, methods=["POST"]),
+        Route("/appointments/status", cambiar_estados, methods=["POST"]),
+        Route("/appointments/{appointment_id:int}", ver_servicio, methods=["GET"]),
+        Route("/appointments/{appointment_id:int}/status", cambiar_estado, methods=["PUT"]),
+        Route("/route", ruta_del_dia, methods=["GET"]),
+        Route("/changes", listar_cambios, methods=["GET"]),
+    ],
+    exception_handlers={
+        BadRequest: _bad_request,
+        MissingAppointments: _missing,
+        db.ArchivedAppointments: _archived,
+    },
+    lifespan=_ciclo_de_vida,
+)
@@ -0,0 +1,141 @@
+"""Peticiones por segundo del API (api.py) sobre un agenda.db grande.
+
+Uso:
+    python benchmarks/bench_api.py [--rows 100000] [--seconds 5] [--concurrency 32]
+
+Requiere httpx (cliente) y uvicorn (servidor). Levanta `uvicorn api:app`
+en otro proceso sobre un agenda.db temporal y lo carga desde un cliente
+asíncrono local con --concurrency peticiones en vuelo, un escenario a la
+vez:
+
+- lista: los servicios de la semana, sin caché HTTP
+- lista 304: la misma lista con If-None-Match (el teléfono que refresca)
+- servicio: un servicio por id
+- ruta: la ruta del día para 3 técnicos
+- estados en lote: 20 cambios de estado por petición, una transacción
+
+Cada escritura invalida la caché y las ETag, así que los escenarios de
+lectura van antes que el de escritura.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from fx import db  # noqa: E402
+from bench_reruns import ESTADOS, poblar  # noqa: E402
+
+LOTE_ESTADOS = 20
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def levantar_servidor(carpeta, puerto):
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--app-dir", RAIZ,
+         "--port", str(puerto), "--log-level", "warning", "--no-access-log"],
+        cwd=carpeta,  # DB_NAME es relativo: agenda.db de la carpeta
+    )
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            httpx.get(f"http://127.0.0.1:{puerto}/appointments?limit=1").raise_for_status()
+            return servidor
+        except httpx.TransportError:
+            time.sleep(0.1)
+    servidor.kill()
+    raise SystemExit("el servidor no arrancó")
+
+
+async def cargar(cliente, peticion, segundos, concurrencia):
+    """Lanza `peticion` en bucle desde `concurrencia` tareas durante `segundos`."""
+    latencias = []
+    fin = time.perf_counter() + segundos
+
+    async def trabajador(n):
+        i = n
+        while time.perf_counter() < fin:
+            t0 = time.perf_counter()
+            r = await peticion(cliente, i)
+            latencias.append((time.perf_counter() - t0) * 1000)
+            if r.status_code >= 400:
+                raise SystemExit(f"{r.status_code}: {r.text}")
+            i += concurrencia
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(trabajador(n) for n in range(concurrencia)))
+    return len(latencias) / (time.perf_counter() - t0), latencias
+
+
+async def escenarios(base, ids, segundos, concurrencia):
+    hoy = date.today()
+    semana = {"date_from": str(hoy), "date_to": str(hoy + timedelta(days=7)), "limit": 50}
+    rnd = random.Random(2025)
+
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=base, limits=limites, timeout=60) as cliente:
+        etag = (await cliente.get("/appointments", params=semana)).headers["etag"]
+
+        def estados(cliente, i):
+            lote = rnd.sample(ids, LOTE_ESTADOS)
+            return cliente.post("/appointments/status", json={
+                "updates": [{"id": j, "status": rnd.choice(ESTADOS)} for j in lote]
+            })
+
+        pruebas = [
+            ("lista", lambda c, i: c.get("/appointments", params=semana)),
+            ("lista 304", lambda c, i: c.get("/appointments", params=semana,
+                                             headers={"If-None-Match": etag})),
+            ("servicio", lambda c, i: c.get(f"/appointments/{ids[i % len(ids)]}")),
+            ("ruta", lambda c, i: c.get("/route", params={"date": str(hoy), "technicians": 3})),
+            (f"estados en lote ({LOTE_ESTADOS})", estados),
+        ]
+        for nombre, peticion in pruebas:
+            rps, latencias = await cargar(cliente, peticion, segundos, concurrencia)
+            cuantiles = statistics.quantiles(latencias, n=100)
+            print(f"  {nombre:22s} {rps:8.0f} req/s   p50 {cuantiles[49]:6.1f} ms"
+                  f"   p99 {cuantiles[98]:6.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        poblar(os.path.join(tmp, "agenda.db"), args.rows)
+        with db.get_conn() as conn:
+            ids = [r[0] for r in conn.execute("SELECT id FROM appointments")]
+        db.close_pools()
+
+        puerto = puerto_libre()
+        servidor = levantar_servidor(tmp, puerto)
+        try:
+            print(f"servicios: {args.rows}  concurrencia: {args.concurrency}  "
+                  f"{args.seconds:g} s por escenario")
+            asyncio.run(escenarios(f"http://127.0.0.1:{puerto}", ids, args.seconds, args.concurrency))
+        finally:
+            servidor.terminate()
+            servidor.wait()
+
+
+if __name__ == "__main__":
+    main()
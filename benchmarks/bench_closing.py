@@ -0,0 +1,115 @@
+"""Cierre del día: marcar N servicios como Realizado/Cobrado, antes y después.
+
+Uso:
+    python benchmarks/bench_closing.py [--appointments 200000] [--services 50]
+        [--repeat 10]
+
+Sobre una base de datos_sinteticos, cada repetición cierra --services
+servicios al azar:
+
+- antes: uno por uno con update_appointment_full (las 13 columnas, una
+  transacción por servicio) y el trigger FTS de antes, que rehacía el
+  índice de texto en cualquier UPDATE;
+- uno por uno: update_status por servicio, con el trigger actual;
+- en lote: update_statuses, un executemany en una sola transacción;
+- tabla: update_appointment_fields con estado y precio cambiados, como lo
+  guarda el editor de la Agenda.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import db  # noqa: E402
+from datos_sinteticos import generar  # noqa: E402
+
+# appointments_fts_au como quedó en m005: sin UPDATE OF
+TRIGGER_ANTES = f"""
+    CREATE TRIGGER appointments_fts_au AFTER UPDATE ON appointments BEGIN
+        DELETE FROM appointments_fts WHERE rowid = old.id;
+        INSERT INTO appointments_fts (rowid, {db._APPOINTMENTS_FTS_COLS})
+        SELECT v.id, {db._fts_valores(db._APPOINTMENTS_FTS_COLS, 'v')} FROM appointments_v v
+        WHERE v.id = new.id;
+    END;
+"""
+
+
+def cerrar_antes(ids, estado):
+    for i in ids:
+        r = db.get_appointment_by_id.__wrapped__(i)
+        db.update_appointment_full(
+            i, r["client_name"], r["service_type"], r["pest_type"], r["address"], r["zone"],
+            r["phone"], r["date"], r["time"], r["price"], estado, r["notes"],
+            r["is_monthly_service"],
+        )
+
+
+def cerrar_uno_por_uno(ids, estado):
+    for i in ids:
+        db.update_status(i, estado)
+
+
+def cerrar_en_lote(ids, estado):
+    db.update_statuses(ids, estado)
+
+
+def cerrar_tabla(ids, estado):
+    db.update_appointment_fields({i: {"status": estado, "price": 650.0} for i in ids})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--appointments", type=int, default=200_000)
+    parser.add_argument("--services", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        despues = os.path.join(tmp, "agenda.db")
+        generar(despues, 5000, args.appointments)
+        db.close_pools()
+        antes = os.path.join(tmp, "agenda_antes.db")
+        shutil.copyfile(despues, antes)
+        with db.get_conn() as conn:
+            ids = [r[0] for r in conn.execute("SELECT id FROM appointments")]
+        db.DB_NAME = antes
+        with db.transaction() as tx:
+            tx.conn.execute("DROP TRIGGER appointments_fts_au;")
+            tx.conn.execute(TRIGGER_ANTES)
+
+        casos = [
+            ("antes (update_appointment_full)", antes, cerrar_antes),
+            ("uno por uno (update_status)", despues, cerrar_uno_por_uno),
+            ("en lote (update_statuses)", despues, cerrar_en_lote),
+            ("tabla (update_appointment_fields)", despues, cerrar_tabla),
+        ]
+        rnd = random.Random(2025)
+        tiempos = {nombre: [] for nombre, _, _ in casos}
+        # Alternados para que el ruido afecte igual a todos
+        for n in range(args.repeat + 1):
+            for nombre, path, cerrar in casos:
+                db.DB_NAME = path
+                lote = rnd.sample(ids, args.services)
+                t0 = time.perf_counter()
+                cerrar(lote, ("Realizado", "Cobrado")[n % 2])
+                if n:  # la primera es de calentamiento
+                    tiempos[nombre].append((time.perf_counter() - t0) * 1000)
+        for path in (antes, despues):
+            db.DB_NAME = path
+            db.check_totals()
+        db.close_pools()
+
+    print(f"servicios: {args.appointments}  cierre de {args.services}  (mediana de {args.repeat}, ms)")
+    for nombre, t in tiempos.items():
+        mediana = statistics.median(t)
+        print(f"  {nombre:36s} {mediana:8.1f}   {mediana / args.services:6.2f} por servicio")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Tiempo de servidor por interacción: página completa vs solo su sección.
+
+Uso:
+    python benchmarks/bench_fragments.py [--rows 100000] [--repeat 5]
+
+Corre app.py con streamlit.testing (AppTest) sobre un agenda.db temporal,
+cambia a la página de cada interacción y la repite varias veces. AppTest
+siempre vuelve a ejecutar la página entera, así que de cada ejecución se
+toman dos tiempos que app.py deja en session_state:
+
+- "antes": la página completa (tiempo_pagina), lo que costaba cualquier
+  interacción sin secciones.
+- "después": solo la sección (st.fragment) donde está el widget, que es
+  lo único que Streamlit re-ejecuta ahora.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from fx import db  # noqa: E402
+from bench_reruns import poblar  # noqa: E402
+
+# (nombre, página, sección de la página, función que hace la interacción)
+INTERACCIONES = [
+    ("Cambiar filtro Estado", "paginas/agenda.py", "servicios_agendados",
+     lambda at, i: at.selectbox(key="filtro_estado_serv").select(["Pendiente", "Todos"][i % 2])),
+    ("Buscar servicio por ID", "paginas/agenda.py", "servicios_agendados",
+     lambda at, i: _buscar_servicio(at, i)),
+    ("Escribir en Buscar cliente", "paginas/agenda.py", "nuevo_servicio",
+     lambda at, i: at.text_input(key="texto_buscar_cliente").input(f"Cliente {i}")),
+    ("Mostrar mensuales", "paginas/mensuales.py", "servicios_mensuales",
+     lambda at, i: at.checkbox(key="ver_mensuales").set_value(i % 2 == 0)),
+    ("Buscar en editor de clientes", "paginas/clientes.py", "editar_cliente",
+     lambda at, i: at.text_input(key="texto_editar_cliente").input(f"Negocio {i}")),
+]
+
+
+def _buscar_servicio(at, i):
+    selector = next(s for s in at.selectbox if s.label == "Buscar por ID de servicio")
+    selector.select(selector.options[1 + i % (len(selector.options) - 1)])
+    return next(b for b in at.button if b.label == "🔍 Buscar servicio").click()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agenda.db")
+        poblar(path, args.rows)
+        db.DB_NAME = path
+
+        at = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=120)
+        at.run()
+        if at.exception:
+            raise SystemExit(at.exception)
+        at.checkbox(key="ver_servicios").check()
+
+        print(f"servicios: {args.rows}  (mediana de {args.repeat} interacciones, ms de servidor)")
+        print(f"  {'interacción':32s} {'antes':>9s} {'después':>9s}")
+        for nombre, pagina, seccion, interactuar in INTERACCIONES:
+            at.switch_page(pagina).run()
+            antes, despues = [], []
+            for i in range(args.repeat):
+                interactuar(at, i).run()
+                if at.exception:
+                    raise SystemExit(at.exception)
+                antes.append(at.session_state["tiempo_pagina"])
+                despues.append(at.session_state["tiempos_secciones"][seccion])
+            print(f"  {nombre:32s} {statistics.median(antes):9.1f} {statistics.median(despues):9.1f}")
+        db.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Tabla de servicios para st.dataframe: lista de dicts (antes) vs DataFrame.
+
+Uso:
+    python benchmarks/bench_frames.py [--rows 100000] [--repeat 5]
+
+"Antes" reproduce lo que hacía app.py: filas sqlite3.Row → lista de dicts
+con el mapeo de 12 columnas escrito a mano → DataFrame (lo que hace
+st.dataframe al recibir una lista). "Columnar" es db._frame: tuplas del
+cursor directo a un DataFrame y un solo rename. Si pyarrow está instalado
+se suma la conversión a Arrow, que es lo que Streamlit envía al navegador.
+También mide get_appointments_analytics sobre todas las filas.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from fx import db  # noqa: E402
+from bench_reruns import poblar  # noqa: E402
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+QUERY = "SELECT * FROM appointments_v ORDER BY scheduled_at, id"
+
+
+def antes():
+    with db.get_conn() as conn:
+        rows = db._servicios(conn, QUERY)
+    data = [
+        {
+            "ID": r["id"],
+            "Fecha": r["date"],
+            "Hora": r["time"],
+            "Cliente/Negocio": r["client_name"],
+            "Tipo servicio": r["service_type"],
+            "Plaga": r["pest_type"],
+            "Zona": r["zone"],
+            "Dirección": r["address"],
+            "Teléfono": r["phone"],
+            "Precio": r["price"],
+            "Estado": r["status"],
+            "Notas": r["notes"],
+        }
+        for r in rows
+    ]
+    return pd.DataFrame(data)
+
+
+def columnar():
+    with db.get_conn() as conn:
+        return db._frame(conn, QUERY)
+
+
+def medir(fn, repeat):
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        frame = fn()
+        if pa is not None:
+            pa.Table.from_pandas(frame)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agenda.db")
+        poblar(path, args.rows)
+        db.DB_NAME = path
+
+        assert list(antes().columns) == list(columnar().columns)
+        print(f"servicios: {args.rows}  " + ("(+ Arrow)" if pa is not None else "(sin pyarrow)"))
+        t_antes = medir(antes, args.repeat)
+        t_columnar = medir(columnar, args.repeat)
+        print(f"  lista de dicts  {t_antes:8.1f} ms")
+        print(f"  columnar        {t_columnar:8.1f} ms   x{t_antes / t_columnar:.1f}")
+
+        analitica = db.get_appointments_analytics.__wrapped__
+        t0 = time.perf_counter()
+        analitica()
+        print(f"  analítica (totales, zonas, percentiles)  {(time.perf_counter() - t0) * 1000:8.1f} ms")
+        db.close_pools()
+
+
+if __name__ == "__main__":
+    main()
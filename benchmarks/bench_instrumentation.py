@@ -0,0 +1,87 @@
+"""Costo de la instrumentación de fx.db: sin ella, apagada y encendida.
+
+Uso:
+    python benchmarks/bench_instrumentation.py [--rows 100000] [--repeat 2000]
+
+- por sentencia: `conn.execute("SELECT 1")` en una conexión sqlite3 normal
+  frente a la conexión instrumentada del pool (_Conexion) apagada.
+- por llamada: un rerun típico de lecturas (sin la caché, vía __wrapped__)
+  con la instrumentación apagada y encendida (con registro de lentas).
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import db  # noqa: E402
+from bench_reruns import poblar  # noqa: E402
+
+
+def por_sentencia(conn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute("SELECT 1").fetchall()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def rerun():
+    hoy = date.today()
+    semana = hoy + timedelta(days=7)
+    db.get_appointments_page.__wrapped__(date_from=hoy, date_to=semana)
+    db.count_appointments.__wrapped__(date_from=hoy, date_to=semana)
+    db.get_client_by_id.__wrapped__(1)
+    db.get_day_index.__wrapped__(str(hoy))
+    db.search_clients.__wrapped__("cliente 12")
+
+
+def por_rerun(repeat):
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rerun()
+        tiempos.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agenda.db")
+        poblar(path, args.rows)
+        db.DB_NAME = path
+
+        normal = sqlite3.connect(path)
+        instrumentada = sqlite3.connect(path, factory=db._Conexion)
+        por_sentencia(normal, args.repeat)  # calentar
+        print(f"por sentencia (µs, {args.repeat} × SELECT 1)")
+        print(f"  sqlite3.Connection          {por_sentencia(normal, args.repeat):7.2f}")
+        print(f"  _Conexion, apagada          {por_sentencia(instrumentada, args.repeat):7.2f}")
+        normal.close()
+        instrumentada.close()
+
+        por_rerun(args.repeat)  # calentar el pool y la caché de páginas
+        # Alternadas en tandas para que el ruido afecte igual a las dos
+        apagada, encendida = [], []
+        for _ in range(5):
+            apagada.append(por_rerun(args.repeat // 5))
+            db.enable_instrumentation(slow_log=os.path.join(tmp, "lentas.log"))
+            encendida.append(por_rerun(args.repeat // 5))
+            db.disable_instrumentation()
+        print(f"por rerun de lecturas (µs, mediana de {args.repeat}, servicios: {args.rows})")
+        print(f"  apagada                     {statistics.median(apagada):7.1f}")
+        print(f"  encendida                   {statistics.median(encendida):7.1f}")
+        db.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Generación de servicios mensuales: clientes x horizonte.
+
+Uso:
+    python benchmarks/bench_monthly.py [--clients 1000 10000] [--horizon 30 90 180]
+
+Para cada combinación crea una base nueva con N clientes mensuales sin
+servicios y mide recurrence.generate_monthly_appointments: la primera
+llamada (inserta todo el horizonte) y una segunda (no hay nada que
+agregar, solo planea). Al final comprueba los totales con check_totals.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import db, recurrence  # noqa: E402
+from bench_totals import clientes_mensuales  # noqa: E402
+
+
+def generar(horizonte):
+    t0 = time.perf_counter()
+    creados = recurrence.generate_monthly_appointments(date.today(), horizonte)
+    return creados, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1000, 10_000])
+    parser.add_argument("--horizon", type=int, nargs="+", default=[30, 90, 180])
+    args = parser.parse_args()
+
+    print(f"{'clientes':>9} {'días':>5} {'servicios':>10} {'primera':>9} {'servicios/s':>12} {'repetida':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.clients:
+            for horizonte in args.horizon:
+                clientes_mensuales(os.path.join(tmp, f"mensuales_{n}_{horizonte}.db"), n)
+                creados, primera = generar(horizonte)
+                _, repetida = generar(horizonte)
+                db.check_totals()
+                db.close_pools()
+                print(f"{n:>9} {horizonte:>5} {creados:>10} {primera:>8.2f}s "
+                      f"{creados / primera:>12.0f} {repetida:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
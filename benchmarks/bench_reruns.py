@@ -0,0 +1,153 @@
+"""Reruns por segundo: conexión por llamada (antes) vs pool de conexiones.
+
+Uso:
+    python benchmarks/bench_reruns.py [--rows 100000] [--reruns 200]
+
+Simula las consultas que hace app.py en cada rerun de Streamlit
+(init_db, get_clients x2, todos los servicios y "Próximos 7 días")
+sobre un agenda.db temporal con N servicios.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import db  # noqa: E402
+
+ZONAS = ["Centro", "Norte", "Sur", "Oriente", "Poniente", "Valle", "Cumbres", "Mitras"]
+ESTADOS = ["Pendiente", "Confirmado", "Realizado", "Cobrado"]
+
+
+def poblar(path, n_servicios, n_clientes=2000, seed=2025):
+    db.DB_NAME = path
+    db.init_db()
+    rnd = random.Random(seed)
+    inicio = date.today() - timedelta(days=365 * 3)
+    with db.get_conn() as conn:
+        # Sin actualizar los índices FTS fila a fila: se llenan al final
+        conn.execute("BEGIN IMMEDIATE;")
+        with db.fts_paused(conn, "clients"):
+            conn.executemany(
+                "INSERT INTO clients (name, business_name, address, zone, phone, notes) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (f"Cliente {i}", f"Negocio {i}" if i % 3 else None, f"Calle {i}",
+                     rnd.choice(ZONAS), f"81{i:08d}", None)
+                    for i in range(n_clientes)
+                ],
+            )
+        with db.fts_paused(conn, "appointments"):
+            conn.executemany(
+                """
+                INSERT INTO appointments (
+                    client_name, service_type, pest_type, address, zone, phone,
+                    date, time, scheduled_at, price, status, notes, created_at, is_monthly_service
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    (f"Cliente {i % n_clientes}", "Casa", "cucaracha", f"Calle {i % n_clientes}",
+                     rnd.choice(ZONAS), f"81{i % n_clientes:08d}",
+                     str(dia), hora, db.to_minutes(dia, hora),
+                     rnd.choice((450.0, 600.0, 900.0)), rnd.choice(ESTADOS), None, None,
+                     1 if rnd.random() < 0.1 else 0)
+                    for i, dia, hora in (
+                        (i, inicio + timedelta(days=rnd.randrange(365 * 4)),
+                         f"{rnd.randrange(8, 19):02d}:{rnd.choice((0, 30)):02d}")
+                        for i in range(n_servicios)
+                    )
+                ),
+            )
+        conn.execute("ANALYZE;")
+        conn.commit()
+    db.close_pools()
+
+
+def _rerun_antes(path, completo=True):
+    # Réplica del patrón original: una conexión nueva por cada helper
+    def conn_nueva():
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    conn = conn_nueva()
+    conn.execute("CREATE TABLE IF NOT EXISTS clients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS appointments (id INTEGER PRIMARY KEY AUTOINCREMENT, client_name TEXT NOT NULL)")
+    try:
+        conn.execute("ALTER TABLE appointments ADD COLUMN is_monthly_service INTEGER DEFAULT 0;")
+    except Exception:
+        pass
+    conn.commit()
+    conn.close()
+
+    hoy = date.today()
+    consultas = [
+        ("SELECT * FROM clients ORDER BY business_name, name;", ()),
+        ("SELECT * FROM appointments WHERE 1=1 ORDER BY date, time", ()),
+        ("SELECT * FROM appointments WHERE 1=1 AND date >= ? AND date <= ? ORDER BY date, time",
+         (str(hoy), str(hoy + timedelta(days=7)))),
+        ("SELECT * FROM clients ORDER BY business_name, name;", ()),
+    ]
+    if not completo:
+        del consultas[1]
+    for sql, params in consultas:
+        conn = conn_nueva()
+        conn.execute(sql, params).fetchall()
+        conn.close()
+
+
+def _rerun_despues(path, completo=True):
+    db.DB_NAME = path
+    # Sin la caché: aquí se mide el pool contra una conexión por llamada, no
+    # cuántas consultas se ahorran repitiendo el mismo rerun.
+    db.invalidate_cache()
+    hoy = date.today()
+    db.get_clients()
+    if completo:
+        db.get_appointments()
+    db.get_appointments(date_from=str(hoy), date_to=str(hoy + timedelta(days=7)))
+    db.get_clients()
+
+
+def medir(fn, path, reruns, completo):
+    fn(path, completo)  # calentamiento
+    t0 = time.perf_counter()
+    for _ in range(reruns):
+        fn(path, completo)
+    return reruns / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--reruns", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agenda.db")
+        poblar(path, args.rows)
+
+        resultados = []
+        # "completo" incluye la carga de todos los servicios que hace la tabla
+        # de mensuales; "filtrado" deja solo las consultas acotadas.
+        for completo in (True, False):
+            antes = medir(_rerun_antes, path, args.reruns, completo)
+            despues = medir(_rerun_despues, path, args.reruns, completo)
+            resultados.append(("completo" if completo else "filtrado", antes, despues))
+        db.close_pools()
+
+    print(f"servicios: {args.rows}  reruns: {args.reruns}")
+    for nombre, antes, despues in resultados:
+        print(f"[{nombre}]")
+        print(f"  antes   (conexión por llamada): {antes:8.1f} reruns/s")
+        print(f"  después (pool de conexiones):   {despues:8.1f} reruns/s")
+        print(f"  mejora: x{despues / antes:.2f}")
+
+
+if __name__ == "__main__":
+    main()
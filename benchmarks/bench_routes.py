@@ -0,0 +1,75 @@
+"""Tiempo de planear la ruta del día con routes.plan_routes.
+
+Uso:
+    python benchmarks/bench_routes.py [--stops 500] [--technicians 1 4 8] [--repeat 5]
+
+Genera un día sintético (zonas de Monterrey, direcciones con coordenadas
+en la tabla local y el 20 % sin geocodificar) y mide cuánto tarda el
+reparto + vecino más cercano + 2-opt. Objetivo: 500 paradas en < 1 s.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import time as hora
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import db, routes  # noqa: E402
+from bench_reruns import ZONAS  # noqa: E402
+
+OBJETIVO_S = 1.0
+CENTRO = (25.6866, -100.3161)
+
+
+def dia_sintetico(n, seed=2025):
+    rnd = random.Random(seed)
+    centros = {
+        z: (CENTRO[0] + rnd.uniform(-0.12, 0.12), CENTRO[1] + rnd.uniform(-0.12, 0.12))
+        for z in ZONAS
+    }
+    rows, geocodes = [], {}
+    for i in range(n):
+        zona = rnd.choice(ZONAS)
+        direccion = f"Calle {i}, {zona}"
+        if rnd.random() < 0.8:
+            la, lo = centros[zona]
+            geocodes[("address", db.address_key(direccion))] = (
+                la + rnd.gauss(0, 0.01), lo + rnd.gauss(0, 0.01)
+            )
+        rows.append({
+            "id": i,
+            "zone": zona,
+            "address": direccion,
+            "hora": hora(rnd.randrange(8, 19), rnd.choice((0, 30))),
+        })
+    return rows, geocodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stops", type=int, default=500)
+    parser.add_argument("--technicians", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows, geocodes = dia_sintetico(args.stops)
+    print(f"paradas: {args.stops}  (objetivo < {OBJETIVO_S} s)")
+    for tecnicos in args.technicians:
+        tiempos = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            rutas = routes.plan_routes(rows, tecnicos, geocodes)
+            tiempos.append(time.perf_counter() - t0)
+        mediana = statistics.median(tiempos)
+        km = sum(r.km for r in rutas)
+        tarde = sum(r.late for r in rutas)
+        marca = "ok" if max(tiempos) < OBJETIVO_S else "LENTO"
+        print(f"  técnicos {tecnicos:2d}  mediana {mediana:5.3f} s  máx {max(tiempos):5.3f} s"
+              f"  {km:7.1f} km  {tarde:3d} tarde  {marca}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Arranque en frío: tiempo de import y de la primera página renderizada.
+
+Uso:
+    python benchmarks/bench_startup.py [--rows 20000] [--repeat 3]
+
+Mide en procesos nuevos, para que nada venga ya cargado:
+
+- import: `python -X importtime -c "import <módulo>"` de cada módulo de fx
+  (tiempo acumulado) y si arrastra a streamlit; streamlit solo, de referencia.
+- primer render: AppTest de app.py sobre un agenda.db temporal; el primer
+  at.run() (la página por defecto, Agenda) ya importa fx y la página. Después,
+  en el mismo proceso, la primera visita a cada una de las otras páginas.
+  De cada ejecución se da el tiempo total de AppTest (incluye su propia
+  espera y, la primera vez, el registro de componentes de Streamlit) y el
+  del script (tiempo_pagina que deja app.py en session_state).
+
+Antes de medir se compila el paquete a .pyc (compileall) para no contar la
+compilación de los fuentes.
+"""
+import argparse
+import compileall
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from fx import db  # noqa: E402
+from bench_reruns import poblar  # noqa: E402
+
+MODULOS = ["fx.db", "fx.recurrence", "fx.routes", "fx.bulk"]
+PAGINAS = ["paginas/clientes.py", "paginas/mensuales.py", "paginas/reportes.py", "paginas/agenda.py"]
+LINEA_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def tiempo_import(modulo):
+    """(ms acumulados de importar modulo, ¿cargó streamlit?) en un proceso nuevo."""
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    ).stderr
+    acumulado, con_streamlit = None, False
+    for linea in salida.splitlines():
+        m = LINEA_IMPORTTIME.match(linea)
+        if not m:
+            continue
+        if m.group(4) == "streamlit":
+            con_streamlit = True
+        if m.group(4) == modulo and len(m.group(3)) == 1:
+            acumulado = int(m.group(2)) / 1000
+    return acumulado, con_streamlit
+
+
+def medir_paginas(carpeta):
+    """Se corre en un proceso nuevo: imprime los tiempos en JSON."""
+    os.chdir(carpeta)  # DB_NAME es relativo: agenda.db de la carpeta
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    tiempos = {"import streamlit": ((time.perf_counter() - t0) * 1000, None)}
+
+    at = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=120)
+    for nombre, pagina in [("primer render (Agenda)", None)] + [
+        (f"primera visita {p}", p) for p in PAGINAS
+    ]:
+        if pagina:
+            at.switch_page(pagina)
+        t0 = time.perf_counter()
+        at.run()
+        if at.exception:
+            raise SystemExit(at.exception)
+        tiempos[nombre] = ((time.perf_counter() - t0) * 1000, at.session_state["tiempo_pagina"])
+    print(json.dumps(tiempos))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--medir-paginas", metavar="CARPETA", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir_paginas:
+        medir_paginas(args.medir_paginas)
+        return
+
+    compileall.compile_dir(RAIZ, quiet=1)
+
+    print("import (ms acumulados, mediana)")
+    for modulo in MODULOS + ["streamlit"]:
+        medidas = [tiempo_import(modulo) for _ in range(args.repeat)]
+        mediana = statistics.median(m[0] for m in medidas)
+        nota = "" if modulo == "streamlit" else ("  ¡importa streamlit!" if medidas[0][1] else "  sin streamlit")
+        print(f"  {modulo:16s} {mediana:8.1f}{nota}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        poblar(os.path.join(tmp, "agenda.db"), args.rows)
+        db.close_pools()
+
+        corridas = []
+        for _ in range(args.repeat):
+            salida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--medir-paginas", tmp],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            corridas.append(json.loads(salida.splitlines()[-1]))
+
+        print(f"servicios: {args.rows}  (ms, mediana de {args.repeat} procesos nuevos)")
+        print(f"  {'':36s} {'AppTest':>8s} {'script':>8s}")
+        for clave in corridas[0]:
+            total = statistics.median(c[clave][0] for c in corridas)
+            script = "" if corridas[0][clave][1] is None else \
+                f"{statistics.median(c[clave][1] for c in corridas):8.1f}"
+            print(f"  {clave:36s} {total:8.1f} {script:>8s}")
+
+
+if __name__ == "__main__":
+    main()
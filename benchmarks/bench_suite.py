@@ -0,0 +1,238 @@
+"""Latencias (p50/p95/p99) de fx.db y de app.py sobre datos sintéticos.
+
+Uso:
+    python benchmarks/bench_suite.py [--clients 5000] [--appointments 200000]
+        [--seed 2025] [--repeat 30] [--db agenda_prueba.db]
+        [--save resultados.json] [--baseline resultados.json] [--tolerance 0.25]
+
+Genera la base con datos_sinteticos.generar (o usa --db, que se copia para
+no modificarla) y mide, cada caso --repeat veces:
+
+- lecturas sin la caché (vía __wrapped__): get_appointments y
+  count_appointments por cada combinación de rango (todo, año, mes,
+  semana) y estado, la primera página, get_clients, búsquedas,
+  get_totals y el historial de un cliente;
+- escrituras: alta, edición y baja de clientes y servicios y cambio de
+  estado, cada una en su transacción;
+- reruns de app.py con streamlit.testing (AppTest) en cada página, con la
+  caché llena y justo después de una escritura (caché invalidada).
+
+--save guarda los percentiles en JSON; --baseline compara contra uno
+guardado y termina con código 1 si algún caso empeoró más de --tolerance
+(y más de MARGEN_MS, para no saltar con el ruido de los casos de 0.1 ms).
+Comparar solo corridas con el mismo tamaño, semilla y máquina.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from fx import db  # noqa: E402
+from datos_sinteticos import generar  # noqa: E402
+
+PAGINAS = ["paginas/agenda.py", "paginas/clientes.py", "paginas/mensuales.py", "paginas/reportes.py"]
+MARGEN_MS = 0.5
+
+
+def percentiles(tiempos):
+    p = statistics.quantiles(tiempos, n=100, method="inclusive")
+    return {"n": len(tiempos), "p50": p[49], "p95": p[94], "p99": p[98], "max": max(tiempos)}
+
+
+def medir(fn, repeat):
+    """ms de cada llamada a fn(i), tras una de calentamiento."""
+    fn(0)
+    tiempos = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn(i)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return tiempos
+
+
+def casos_lectura(ids_clientes, hoy):
+    rangos = {
+        "todo": (None, None),
+        "año": (hoy - timedelta(days=365), hoy),
+        "mes": (hoy.replace(day=1), hoy.replace(day=1) + timedelta(days=30)),
+        "semana": (hoy, hoy + timedelta(days=7)),
+    }
+    casos = []
+    for rango, (desde, hasta) in rangos.items():
+        for estado in (None,) + db.STATUSES:
+            filtro = f"{rango}/{estado or 'Todos'}"
+            casos.append((f"get_appointments {filtro}", lambda i, d=desde, h=hasta, e=estado:
+                          db.get_appointments.__wrapped__(date_from=d, date_to=h, status=e)))
+            casos.append((f"count_appointments {filtro}", lambda i, d=desde, h=hasta, e=estado:
+                          db.count_appointments.__wrapped__(date_from=d, date_to=h, status=e)))
+        casos.append((f"get_appointments_page {rango}", lambda i, d=desde, h=hasta:
+                      db.get_appointments_page.__wrapped__(date_from=d, date_to=h)))
+
+    textos = ["garcia", "taq", "restaurante garza", "hidalgo 1", "81"]
+    casos += [
+        ("get_clients", lambda i: db.get_clients.__wrapped__()),
+        ("count_clients", lambda i: db.count_clients.__wrapped__()),
+        ("get_client_by_id", lambda i: db.get_client_by_id.__wrapped__(ids_clientes[i % len(ids_clientes)])),
+        ("get_client_appointments", lambda i:
+         db.get_client_appointments.__wrapped__(ids_clientes[i % len(ids_clientes)])),
+        ("search_clients", lambda i: db.search_clients.__wrapped__(textos[i % len(textos)])),
+        ("get_monthly_appointments (50)", lambda i: db.get_monthly_appointments.__wrapped__(limit=50)),
+        ("get_day_index", lambda i: db.get_day_index.__wrapped__(hoy + timedelta(days=i % 7))),
+        ("get_totals año/mes", lambda i: db.get_totals.__wrapped__(
+            hoy - timedelta(days=365), hoy, period="month", group_by=("status",))),
+        ("get_totals todo/zona", lambda i: db.get_totals.__wrapped__(
+            period="month", group_by=("zone", "status"))),
+    ]
+    return casos
+
+
+def casos_escritura(ids_clientes, ids_servicios, hoy, rnd):
+    nuevos_clientes, nuevos_servicios = [], []
+
+    def alta_cliente(i):
+        nuevos_clientes.append(db.add_client(
+            f"Prueba {i}", None, f"Calle de prueba {i}", "Centro", "8100000000", None))
+
+    def alta_servicio(i):
+        dia = hoy + timedelta(days=rnd.randrange(1, 60))
+        nuevos_servicios.append(db.add_appointment(
+            "Prueba", "Casa", "cucaracha", None, None, None, dia, "10:00", 600.0, "Pendiente",
+            # Los días sintéticos ya pasan de TECHNICIANS servicios a la vez
+            None, client_id=rnd.choice(ids_clientes), allow_overlap=True))
+
+    def editar_servicio(i):
+        r = db.get_appointment_by_id.__wrapped__(rnd.choice(ids_servicios))
+        db.update_appointment_full(
+            r["id"], r["client_name"], r["service_type"], r["pest_type"], r["address"],
+            r["zone"], r["phone"], r["date"], r["time"], (r["price"] or 0) + 50,
+            r["status"], r["notes"], r["is_monthly_service"])
+
+    # Orden de las claves = orden en que se corren: las bajas van al final
+    return [
+        ("add_client", alta_cliente),
+        ("update_client", lambda i: db.update_client(
+            nuevos_clientes[i % len(nuevos_clientes)], f"Prueba {i}", "Negocio de prueba",
+            "Otra calle 1", "Mitras", "8111111111", None)),
+        ("add_appointment", alta_servicio),
+        ("update_status", lambda i: db.update_status(rnd.choice(ids_servicios), rnd.choice(db.STATUSES))),
+        ("update_appointment_full", editar_servicio),
+        ("delete_appointment", lambda i: db.delete_appointment(nuevos_servicios.pop())),
+        ("delete_client", lambda i: db.delete_client(nuevos_clientes.pop())),
+    ]
+
+
+def medir_reruns(repeat):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=120)
+    at.run()
+    if at.exception:
+        raise SystemExit(at.exception)
+    at.checkbox(key="ver_servicios").check()
+
+    resultados = {}
+    for pagina in PAGINAS:
+        at.switch_page(pagina).run()
+        nombre = os.path.splitext(os.path.basename(pagina))[0]
+        for modo, antes in (("caché llena", None), ("tras escritura", db.invalidate_cache)):
+            total, script = [], []
+            for _ in range(repeat):
+                if antes:
+                    antes()
+                t0 = time.perf_counter()
+                at.run()
+                total.append((time.perf_counter() - t0) * 1000)
+                if at.exception:
+                    raise SystemExit(at.exception)
+                script.append(at.session_state["tiempo_pagina"])
+            resultados[f"rerun {nombre} {modo} (AppTest)"] = total
+            resultados[f"rerun {nombre} {modo} (script)"] = script
+    return resultados
+
+
+def comparar(actual, base, tolerancia):
+    """Casos cuyo p50 o p95 empeoró más de `tolerancia` respecto a `base`."""
+    peores = []
+    for nombre, r in actual.items():
+        if nombre not in base:
+            continue
+        for p in ("p50", "p95"):
+            antes, ahora = base[nombre][p], r[p]
+            if ahora > antes * (1 + tolerancia) and ahora - antes > MARGEN_MS:
+                peores.append((nombre, p, antes, ahora))
+    return peores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--appointments", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--db", help="agenda.db ya generado (se mide sobre una copia)")
+    parser.add_argument("--save")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--no-app", action="store_true", help="sin los reruns de app.py")
+    args = parser.parse_args()
+
+    hoy = date.today()
+    rnd = random.Random(args.seed)
+    resultados = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agenda.db")
+        if args.db:
+            shutil.copyfile(args.db, path)
+            db.DB_NAME = path
+        else:
+            t0 = time.perf_counter()
+            generar(path, args.clients, args.appointments, args.seed, hoy=hoy)
+            print(f"datos generados en {time.perf_counter() - t0:.1f} s")
+        db.check_totals()
+        with db.get_conn() as conn:
+            ids_clientes = [r[0] for r in conn.execute("SELECT id FROM clients")]
+            ids_servicios = [r[0] for r in conn.execute("SELECT id FROM appointments")]
+        print(f"clientes: {len(ids_clientes)}  servicios: {len(ids_servicios)}  "
+              f"repeticiones: {args.repeat}")
+
+        # Lecturas antes que escrituras: así todas ven la misma base
+        for nombre, fn in casos_lectura(ids_clientes, hoy):
+            resultados[nombre] = medir(fn, args.repeat)
+        for nombre, fn in casos_escritura(ids_clientes, ids_servicios, hoy, rnd):
+            resultados[nombre] = medir(fn, args.repeat)
+        db.check_totals()
+        if not args.no_app:
+            resultados.update(medir_reruns(args.repeat))
+        db.close_pools()
+
+    resultados = {nombre: percentiles(t) for nombre, t in resultados.items()}
+    print(f"  {'caso':52s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s}  (ms)")
+    for nombre, r in resultados.items():
+        print(f"  {nombre:52s} {r['p50']:8.2f} {r['p95']:8.2f} {r['p99']:8.2f} {r['max']:8.2f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"clients": len(ids_clientes), "appointments": len(ids_servicios),
+                       "seed": args.seed, "results": resultados}, f, ensure_ascii=False, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)["results"]
+        peores = comparar(resultados, base, args.tolerance)
+        for nombre, p, antes, ahora in peores:
+            print(f"REGRESIÓN {nombre} {p}: {antes:.2f} → {ahora:.2f} ms (+{(ahora / antes - 1) * 100:.0f} %)")
+        if peores:
+            sys.exit(1)
+        print(f"sin regresiones frente a {args.baseline} (tolerancia {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
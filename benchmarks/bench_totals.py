@@ -0,0 +1,135 @@
+"""Resumen de ingresos: tabla de totales vs agrupar todos los servicios.
+
+Uso:
+    python benchmarks/bench_totals.py [--rows 200000] [--repeat 20]
+        [--monthly-clients 10000]
+
+Mide db.get_totals (lee appointment_totals) contra el mismo GROUP BY
+sobre appointments_v para un año por mes y por día, y al final comprueba
+con db.check_totals() que la tabla mantenida por triggers cuadra con un
+recálculo completo.
+
+Después mide lo que cuestan los totales en un alta masiva: los servicios
+mensuales de --monthly-clients clientes a 90 días, insertados con el
+trigger fila a fila y con db.totals_paused (un GROUP BY al final).
+"""
+import argparse
+import contextlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import db, recurrence  # noqa: E402
+from bench_reruns import ZONAS, poblar  # noqa: E402
+
+# get_totals sin la caché de lecturas, para medir la consulta
+get_totals = db.get_totals.__wrapped__
+
+
+def escaneo_completo(desde, hasta, periodo):
+    clave = {"day": "date", "month": "substr(date, 1, 7)"}[periodo]
+    with db.get_conn() as conn:
+        return conn.execute(f"""
+            SELECT {clave} AS period, status, COUNT(*), SUM(COALESCE(price, 0))
+            FROM appointments_v
+            WHERE scheduled_at >= ? AND scheduled_at < ?
+            GROUP BY 1, 2
+        """, (db.to_minutes(desde), db.to_minutes(hasta + timedelta(days=1)))).fetchall()
+
+
+def clientes_mensuales(path, n, seed=2025):
+    """Base nueva en `path` con n clientes mensuales sin servicios."""
+    db.DB_NAME = path
+    db.init_db()
+    rnd = random.Random(seed)
+    with db.get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        with db.fts_paused(conn, "clients"):
+            conn.executemany(
+                "INSERT INTO clients (name, zone, phone, is_monthly, monthly_day) VALUES (?, ?, ?, 1, ?)",
+                [(f"Cliente {i}", rnd.choice(ZONAS), f"81{i:08d}", rnd.randint(1, 31)) for i in range(n)],
+            )
+        conn.commit()
+
+
+def alta_masiva(path, n_clientes, pausar):
+    """Segundos del INSERT de los mensuales a 90 días, y cuántas filas."""
+    clientes_mensuales(path, n_clientes)
+    inicio = date.today()
+    with db.transaction() as tx:
+        conn = tx.conn
+        filas = recurrence.plan_monthly_appointments(conn, inicio, inicio + timedelta(days=90))
+        t0 = time.perf_counter()
+        # El índice FTS se pausa en los dos casos, como en recurrence
+        with db.fts_paused(conn, "appointments"), \
+                db.totals_paused(conn) if pausar else contextlib.nullcontext():
+            conn.executemany("""
+                INSERT INTO appointments (
+                    client_id, client_name, service_type, pest_type,
+                    date, time, scheduled_at, price,
+                    status, notes, created_at, is_monthly_service
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            """, filas)
+        segundos = time.perf_counter() - t0
+    db.check_totals()
+    db.close_pools()
+    return segundos, len(filas)
+
+
+def medir(fn, repeat):
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--monthly-clients", type=int, default=10_000)
+    args = parser.parse_args()
+
+    hasta = date.today()
+    desde = hasta - timedelta(days=365)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agenda.db")
+        poblar(path, args.rows)
+        db.DB_NAME = path
+
+        print(f"servicios: {args.rows}  rango: {desde} a {hasta}")
+        for periodo in ("month", "day"):
+            resumen = medir(lambda: get_totals(desde, hasta, periodo, ("status",)), args.repeat)
+            completo = medir(lambda: escaneo_completo(desde, hasta, periodo), args.repeat)
+            print(f"  por {periodo:5s}  totales {resumen:8.2f} ms   "
+                  f"GROUP BY servicios {completo:8.2f} ms   x{completo / resumen:6.1f}")
+
+        t0 = time.perf_counter()
+        try:
+            db.check_totals()
+            estado = "cuadran"
+        except db.TotalsMismatchError as e:
+            estado = str(e)
+        print(f"  check_totals: {estado} ({time.perf_counter() - t0:.2f} s)")
+        db.close_pools()
+
+        print(f"alta masiva: mensuales de {args.monthly_clients} clientes a 90 días")
+        for pausar, nombre in ((False, "trigger fila a fila"), (True, "totals_paused")):
+            segundos, filas = alta_masiva(
+                os.path.join(tmp, f"mensuales_{pausar}.db"), args.monthly_clients, pausar
+            )
+            print(f"  {nombre:20s} {filas} servicios en {segundos:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
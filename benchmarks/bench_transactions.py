@@ -0,0 +1,93 @@
+"""Latencia de guardar el formulario principal (cliente nuevo + servicio).
+
+Uso:
+    python benchmarks/bench_transactions.py [--rows 10000] [--saves 200] [--dir /mnt/lento]
+
+Compara el camino anterior (add_client y add_appointment, cada uno con su
+commit) con los dos dentro de db.transaction() (un solo commit), con
+synchronous=FULL (un fsync por commit) y con el NORMAL que usa la app.
+Para simular un disco lento, pasa con --dir una carpeta en ese disco
+(una memoria USB, un recurso de red, etc.).
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, time as hora
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import db  # noqa: E402
+from bench_reruns import poblar  # noqa: E402
+
+
+def _cliente(i, tx=None):
+    return db.add_client(
+        name=f"Nuevo {i}", business_name=None, address=f"Calle nueva {i}",
+        zone="Centro", phone=f"82{i:08d}", notes=None, tx=tx,
+    )
+
+
+def _servicio(i, client_id, tx=None):
+    db.add_appointment(
+        client_name=f"Nuevo {i}", service_type="Casa", pest_type="cucaracha",
+        address=f"Calle nueva {i}", zone="Centro", phone=f"82{i:08d}",
+        fecha=date.today(), hora=hora(10, 0), price=600.0, status="Pendiente",
+        # Todas a la misma hora: aquí no interesa la comprobación de choques
+        notes=None, client_id=client_id, allow_overlap=True, tx=tx,
+    )
+
+
+def guardar_separado(i):
+    _servicio(i, _cliente(i))
+
+
+def guardar_en_transaccion(i):
+    with db.transaction() as tx:
+        _servicio(i, _cliente(i, tx), tx)
+
+
+def medir(guardar, saves, inicio):
+    tiempos = []
+    for i in range(inicio, inicio + saves):
+        t0 = time.perf_counter()
+        guardar(i)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos), statistics.quantiles(tiempos, n=20)[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--saves", type=int, default=200)
+    parser.add_argument("--dir", default=None, help="carpeta donde crear la base de prueba")
+    args = parser.parse_args()
+
+    caminos = {
+        "separado (2 commits)": guardar_separado,
+        "transacción (1 commit)": guardar_en_transaccion,
+    }
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        path = os.path.join(tmp, "agenda.db")
+        poblar(path, args.rows)
+        db.DB_NAME = path
+
+        print(f"servicios: {args.rows}  guardados por caso: {args.saves}")
+        inicio = 0
+        for synchronous in ("FULL", "NORMAL"):
+            # El pool aplica el PRAGMA al crear cada conexión
+            db.close_pools()
+            db.SYNCHRONOUS = synchronous
+            for nombre, guardar in caminos.items():
+                mediana, p95 = medir(guardar, args.saves, inicio)
+                inicio += args.saves
+                print(f"  synchronous={synchronous:6s} {nombre:24s} "
+                      f"mediana {mediana:7.2f} ms  p95 {p95:7.2f} ms")
+        db.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Latencia de las vistas "Hoy" y "Próximos 7 días" sobre una tabla grande.
+
+Uso:
+    python benchmarks/bench_views.py [--rows 1000000] [--repeat 50]
+
+Antes de medir comprueba con db.check_query_plans() que ninguna
+consulta de la app haga un SCAN completo; si alguna lo hace, termina con
+código de salida 1.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import db  # noqa: E402
+from bench_reruns import poblar  # noqa: E402
+
+OBJETIVO_MS = 5.0
+
+
+def medir(repeat, **filtros):
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        db.get_appointments(**filtros)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos), max(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    hoy = date.today()
+    vistas = {
+        "Hoy": dict(date_from=str(hoy), date_to=str(hoy)),
+        "Próximos 7 días": dict(date_from=str(hoy), date_to=str(hoy + timedelta(days=7))),
+        "Próximos 7 días, Pendiente": dict(
+            date_from=str(hoy), date_to=str(hoy + timedelta(days=7)), status="Pendiente"
+        ),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agenda.db")
+        poblar(path, args.rows)
+        db.DB_NAME = path
+
+        try:
+            db.check_query_plans()
+        except db.QueryPlanError as e:
+            print(e)
+            sys.exit(1)
+
+        print(f"servicios: {args.rows}  (objetivo < {OBJETIVO_MS} ms)")
+        for nombre, filtros in vistas.items():
+            mediana, peor = medir(args.repeat, **filtros)
+            marca = "ok" if mediana < OBJETIVO_MS else "LENTO"
+            print(f"  {nombre:28s} mediana {mediana:6.2f} ms  máx {peor:6.2f} ms  {marca}")
+        db.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Comprueba los planes de consulta de la app, vacía y con datos realistas.
+
+Uso:
+    python benchmarks/check_plans.py [-v] [--clients 500] [--appointments 10000]
+
+Corre db.check_query_plans() sobre dos bases nuevas en un directorio
+temporal: una recién migrada y vacía, y una de datos_sinteticos.generar
+(con ANALYZE, así el planificador usa estadísticas parecidas a las de una
+agenda real). Termina con código 1 si en alguna una consulta de
+db.app_queries() hace un SCAN completo o un sort sin índice que no esté en
+db.PLAN_SORTS_ALLOWED. -v imprime los planes.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import db  # noqa: E402
+from datos_sinteticos import generar  # noqa: E402
+
+
+def revisar(nombre, verbose):
+    try:
+        if verbose:
+            for consulta, plan in db.explain_query_plans().items():
+                print(f"  {consulta}: {' | '.join(plan)}")
+        db.check_query_plans()
+    except db.QueryPlanError as e:
+        print(f"{nombre}: {e}")
+        return False
+    finally:
+        db.close_pools()
+    print(f"{nombre}: {len(db.app_queries())} consultas sin SCAN completo ni sort de más")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-v", "--verbose", action="store_true", help="imprime cada plan")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--appointments", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_NAME = os.path.join(tmp, "vacia.db")
+        db.init_db()
+        ok = revisar("base vacía", args.verbose)
+
+        generar(os.path.join(tmp, "sintetica.db"), args.clients, args.appointments)
+        ok = revisar(f"sintética ({args.clients} clientes, {args.appointments} servicios)", args.verbose) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
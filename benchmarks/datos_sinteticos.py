@@ -0,0 +1,252 @@
+"""Genera un agenda.db sintético y reproducible (misma semilla = misma base).
+
+Uso:
+    python benchmarks/datos_sinteticos.py agenda_prueba.db [--clients 5000]
+        [--appointments 200000] [--seed 2025] [--years 5]
+
+Distribuciones pensadas para parecerse a la agenda real:
+
+- zonas de Monterrey con pesos desiguales (unas concentran casi todo) y
+  coordenadas en geocodes para las zonas y para el 60 % de las direcciones;
+- un tercio de los clientes son negocios; el 12 % son mensuales, con
+  un servicio cada mes en su día desde que se dieron de alta;
+- los servicios sueltos caen en `years` años hasta 90 días adelante: más
+  en los años recientes, más de abril a septiembre, casi nada en domingo y
+  más por la mañana;
+- el estado depende de la fecha (lo pasado está casi todo Cobrado, lo
+  futuro Pendiente o Confirmado) y el precio sigue una lognormal distinta
+  para casas y negocios, redondeada a $50;
+- el 85 % de los servicios sueltos son de clientes guardados (unos pocos
+  clientes piden muchos) y heredan de ellos dirección, zona y teléfono.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx import db  # noqa: E402
+
+# (zona, peso, lat, lon)
+ZONAS = [
+    ("Centro", 14, 25.6714, -100.3097),
+    ("Cumbres", 12, 25.7356, -100.4036),
+    ("Mitras", 10, 25.6953, -100.3574),
+    ("San Nicolás", 10, 25.7441, -100.2952),
+    ("Guadalupe", 9, 25.6775, -100.2597),
+    ("Apodaca", 8, 25.7817, -100.1886),
+    ("Contry", 7, 25.6297, -100.2803),
+    ("Del Valle", 6, 25.6534, -100.3585),
+    ("Obispado", 5, 25.6740, -100.3440),
+    ("Escobedo", 5, 25.7969, -100.3328),
+    ("Santa Catarina", 4, 25.6733, -100.4583),
+    ("Linda Vista", 3, 25.6850, -100.2480),
+    ("Tecnológico", 3, 25.6517, -100.2895),
+    ("Carretera Nacional", 2, 25.5620, -100.2450),
+    ("Anáhuac", 2, 25.7295, -100.3080),
+]
+# (plaga, peso)
+PLAGAS = [
+    ("cucaracha", 40), ("hormiga", 12), ("garrapata", 10), ("roedor", 10),
+    ("termita", 8), ("chinche", 7), ("alacrán", 6), ("mosco", 5), ("araña", 2),
+]
+NOMBRES = ["María", "José", "Juan", "Guadalupe", "Luis", "Ana", "Carlos", "Rosa",
+           "Jorge", "Patricia", "Miguel", "Laura", "Roberto", "Sofía", "Fernando", "Elena"]
+APELLIDOS = ["García", "Martínez", "Hernández", "López", "González", "Rodríguez",
+             "Pérez", "Sánchez", "Ramírez", "Treviño", "Garza", "Cantú", "Villarreal"]
+GIROS = ["Restaurante", "Taquería", "Abarrotes", "Farmacia", "Escuela", "Bodega",
+         "Oficinas", "Panadería", "Hotel", "Clínica", "Gimnasio", "Carnicería"]
+CALLES = ["Hidalgo", "Juárez", "Morelos", "Zaragoza", "Madero", "Padre Mier",
+          "Constitución", "Gonzalitos", "Lincoln", "Ruiz Cortines", "Garza Sada"]
+NOTAS = ["Tocar en la puerta de atrás", "Tiene mascotas", "Paquete anual",
+         "Pagar con transferencia", "Llamar antes de llegar", "Revisar cocina y bodega"]
+
+NEGOCIOS = 0.33
+MENSUALES = 0.12
+CON_CLIENTE = 0.85
+GEOCODIFICADAS = 0.6
+# Estados según la fecha del servicio: (estado, peso)
+ESTADOS_PASADO = [("Cobrado", 80), ("Realizado", 12), ("Pendiente", 6), ("Confirmado", 2)]
+ESTADOS_HOY = [("Pendiente", 40), ("Confirmado", 35), ("Realizado", 20), ("Cobrado", 5)]
+ESTADOS_FUTURO = [("Pendiente", 70), ("Confirmado", 30)]
+# Peso por día de la semana (lunes = 0)
+PESO_DIA = [1.0, 1.0, 1.0, 1.0, 0.95, 0.6, 0.12]
+HORAS = list(range(8, 19))
+PESO_HORA = [10, 12, 12, 11, 9, 6, 7, 7, 6, 5, 3]
+
+
+def _elegir(rnd, opciones):
+    valores, pesos = zip(*opciones)
+    return rnd.choices(valores, pesos)[0]
+
+
+def _precio(rnd, negocio):
+    if rnd.random() < 0.03:
+        return None
+    media = 1200 if negocio else 550
+    return max(250.0, round(rnd.lognormvariate(math.log(media), 0.45 if negocio else 0.35) / 50) * 50)
+
+
+def _hora(rnd):
+    return f"{rnd.choices(HORAS, PESO_HORA)[0]:02d}:{rnd.choice((0, 0, 30, 30, 15, 45)):02d}"
+
+
+def _estado(rnd, dia, hoy):
+    if dia < hoy:
+        return _elegir(rnd, ESTADOS_PASADO)
+    return _elegir(rnd, ESTADOS_HOY if dia == hoy else ESTADOS_FUTURO)
+
+
+def _dia(rnd, inicio, dias):
+    # Más servicios hacia el presente (el negocio crece), en temporada de
+    # calor y entre semana: muestreo por rechazo sobre un día uniforme
+    while True:
+        dia = inicio + timedelta(days=int(rnd.betavariate(1.6, 1.0) * dias))
+        temporada = 1 + 0.45 * math.sin((dia.timetuple().tm_yday - 105) / 365 * 2 * math.pi)
+        if rnd.random() * 1.45 < temporada * PESO_DIA[dia.weekday()]:
+            return dia
+
+
+def _clientes(rnd, n):
+    zonas = [(z, p) for z, p, _, _ in ZONAS]
+    for i in range(1, n + 1):
+        negocio = rnd.random() < NEGOCIOS
+        mensual = rnd.random() < MENSUALES
+        yield (
+            f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}",
+            f"{rnd.choice(GIROS)} {rnd.choice(APELLIDOS)} {i}" if negocio else None,
+            f"{rnd.choice(CALLES)} {rnd.randrange(100, 3000)}, int. {i}",
+            _elegir(rnd, zonas),
+            f"81{rnd.randrange(10_000_000, 99_999_999)}",
+            rnd.choice(NOTAS) if rnd.random() < 0.15 else None,
+            1 if mensual else 0,
+            rnd.randrange(1, 29) if mensual else None,
+        )
+
+
+def _servicios(rnd, clientes, n, years, hoy):
+    """Filas de appointments: primero las de los mensuales, luego las sueltas."""
+    inicio = hoy - timedelta(days=365 * years - 90)
+    fin = hoy + timedelta(days=90)
+    zonas = [(z, p) for z, p, _, _ in ZONAS]
+    creados = 0
+
+    def fila(client_id, c, dia, hora, mensual, propios=None):
+        negocio = c is not None and c[1] is not None
+        if c is None:
+            nombre, (address, zone, phone) = propios[0], propios[1:]
+        else:
+            # Heredados del cliente: quedan en NULL, igual que _datos_propios
+            nombre, address, zone, phone = c[1] or c[0], None, None, None
+        return (
+            client_id, nombre, "Negocio" if negocio else "Casa", _elegir(rnd, PLAGAS),
+            address, zone, phone, str(dia), hora, db.to_minutes(dia, hora),
+            _precio(rnd, negocio), _estado(rnd, dia, hoy),
+            rnd.choice(NOTAS) if rnd.random() < 0.2 else None,
+            (datetime.combine(dia, datetime.min.time()) - timedelta(days=rnd.randrange(0, 21)))
+            .isoformat(timespec="seconds"),
+            1 if mensual else 0,
+        )
+
+    # Mensuales: cada cliente mensual desde su alta hasta el fin del rango
+    for client_id, c in enumerate(clientes, start=1):
+        if not c[6]:
+            continue
+        alta = _dia(rnd, inicio, (hoy - inicio).days)
+        hora = _hora(rnd)
+        anio, mes = alta.year, alta.month
+        while creados < n:
+            dia = date(anio, mes, c[7])
+            if dia > fin:
+                break
+            if dia >= alta:
+                yield fila(client_id, c, dia, hora, True)
+                creados += 1
+            anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+    # Sueltos: unos pocos clientes piden muchos servicios (Pareto)
+    dias = (fin - inicio).days
+    while creados < n:
+        dia = _dia(rnd, inicio, dias)
+        if rnd.random() < CON_CLIENTE:
+            client_id = min(int(rnd.paretovariate(1.2)), len(clientes))
+            client_id = (client_id * 7919 + rnd.randrange(3)) % len(clientes) + 1
+            yield fila(client_id, clientes[client_id - 1], dia, _hora(rnd), False)
+        else:
+            propios = (
+                f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}",
+                f"{rnd.choice(CALLES)} {rnd.randrange(100, 3000)}",
+                _elegir(rnd, zonas),
+                f"81{rnd.randrange(10_000_000, 99_999_999)}",
+            )
+            yield fila(None, None, dia, _hora(rnd), False, propios)
+        creados += 1
+
+
+def generar(path, n_clientes=5000, n_servicios=200_000, seed=2025, years=5, hoy=None):
+    """Crea `path` con datos sintéticos; devuelve cuántas filas escribió."""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    rnd = random.Random(seed)
+    hoy = hoy or date.today()
+    db.DB_NAME = path
+    db.init_db()
+
+    clientes = list(_clientes(rnd, n_clientes))
+    with db.get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        with db.fts_paused(conn, "clients"):
+            conn.executemany(
+                "INSERT INTO clients (name, business_name, address, zone, phone, notes, is_monthly, monthly_day)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                clientes,
+            )
+        with db.fts_paused(conn, "appointments"), db.totals_paused(conn), \
+                db.changes_paused(conn, "appointments"):
+            conn.executemany(
+                """
+                INSERT INTO appointments (
+                    client_id, client_name, service_type, pest_type, address, zone, phone,
+                    date, time, scheduled_at, price, status, notes, created_at, is_monthly_service
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                _servicios(rnd, clientes, n_servicios, years, hoy),
+            )
+        geocodes = [("zone", db.address_key(z), la, lo) for z, _, la, lo in ZONAS]
+        centros = {z: (la, lo) for z, _, la, lo in ZONAS}
+        for c in clientes:
+            if rnd.random() < GEOCODIFICADAS:
+                la, lo = centros[c[3]]
+                geocodes.append(("address", db.address_key(c[2]),
+                                 la + rnd.gauss(0, 0.008), lo + rnd.gauss(0, 0.008)))
+        conn.executemany("INSERT OR REPLACE INTO geocodes (kind, key, lat, lon) VALUES (?, ?, ?, ?)", geocodes)
+        conn.execute("ANALYZE;")
+        conn.commit()
+        mensuales = conn.execute(
+            "SELECT COUNT(*) FROM appointments WHERE is_monthly_service = 1"
+        ).fetchone()[0]
+    db.invalidate_cache()
+    return {"clients": n_clientes, "appointments": n_servicios, "monthly": mensuales,
+            "geocodes": len(geocodes)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("archivo")
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--appointments", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    stats = generar(args.archivo, args.clients, args.appointments, args.seed, args.years)
+    print(", ".join(f"{k}: {v}" for k, v in stats.items()))
+    db.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""Capa de datos de la agenda, sin Streamlit.
+
+    from fx import db            # conexiones, esquema, clientes y servicios
+    from fx import recurrence    # servicios mensuales
+    from fx import routes        # ruta del día
+    from fx import bulk          # importar / exportar CSV y JSONL
+
+Aquí no se importa ningún submódulo: cada página o script carga solo lo
+que usa.
+"""
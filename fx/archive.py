@@ -0,0 +1,54 @@
+"""Archiva los servicios cobrados viejos en un archivo SQLite por año.
+
+Uso:
+    python -m fx.archive 2024-01-01              # lo cobrado antes de esa fecha
+    python -m fx.archive --keep-years 2          # deja el año en curso y los 2 anteriores
+    python -m fx.archive 2024-01-01 --db otra.db --no-vacuum
+    python -m fx.archive --list
+
+Cada año queda en su archivo junto a la base (agenda_2023.db, ...). Las
+consultas de fx.db solo los abren cuando el rango pedido llega a ellos; los
+totales de Reportes los siguen contando. Al terminar se hace VACUUM y
+ANALYZE de la base (--no-vacuum deja solo el ANALYZE).
+"""
+import argparse
+import sys
+from datetime import date
+
+from fx import db
+
+
+def cutoff(keep_years, hoy=None):
+    """Primer día que se conserva: 1 de enero de hace `keep_years` años."""
+    hoy = hoy or date.today()
+    return date(hoy.year - keep_years, 1, 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before", nargs="?", type=date.fromisoformat,
+                        help="archiva lo anterior a esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--keep-years", type=int)
+    parser.add_argument("--db", default=db.DB_NAME, help="archivo SQLite (por defecto agenda.db)")
+    parser.add_argument("--no-vacuum", action="store_true")
+    parser.add_argument("--list", action="store_true", help="solo muestra los años archivados")
+    args = parser.parse_args(argv)
+
+    db.DB_NAME = args.db
+    if not args.list:
+        if (args.before is None) == (args.keep_years is None):
+            parser.error("indica la fecha o --keep-years (solo uno)")
+        before = args.before or cutoff(args.keep_years)
+        movidos = db.archive_appointments(before, vacuum=not args.no_vacuum)
+        print(f"archivados antes de {before}: {sum(movidos.values())}")
+        for anio, n in movidos.items():
+            print(f"  {anio}: {n}")
+
+    for a in db.get_archives():
+        print(f"{a['year']}  {a['file']}  {a['rows']} servicios  (archivado {a['archived_at']})")
+    db.close_pools()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,426 @@
+"""Importación y exportación masiva de clientes y servicios (CSV o JSONL).
+
+Uso:
+    python -m fx.bulk import clients clientes.csv
+    python -m fx.bulk import appointments servicios.jsonl --batch-size 50000
+    python -m fx.bulk export appointments servicios.csv
+    python -m fx.bulk export appointments servicios.csv --no-include-archive
+    python -m fx.bulk import geocodes coordenadas.csv   # kind,key,lat,lon
+
+Los archivos se leen y escriben en streaming: nunca se cargan completos en
+memoria. El formato se deduce de la extensión (.csv o .jsonl).
+"""
+import argparse
+import csv
+import json
+import sys
+from datetime import date, datetime, time
+from functools import lru_cache
+
+from fx import db
+
+BATCH_SIZE = 20_000
+# Caché de páginas durante una importación (KiB): los índices de un millón
+# de servicios no caben en los 2 MB por defecto de SQLite
+IMPORT_CACHE_KIB = 256 * 1024
+
+CLIENT_FIELDS = [
+    "id", "name", "business_name", "address", "zone", "phone", "notes",
+    "is_monthly", "monthly_day",
+]
+APPOINTMENT_FIELDS = [
+    "id", "client_id", "client_name", "service_type", "pest_type",
+    "address", "zone", "phone", "date", "time", "price", "status", "notes",
+    "created_at", "is_monthly_service",
+]
+GEOCODE_FIELDS = ["kind", "key", "lat", "lon"]
+STATUSES = db.STATUSES
+
+
+class InvalidRecord(ValueError):
+    """Registro que no se puede importar (se cuenta y se salta)."""
+
+
+# ---------- LECTURA / ESCRITURA ----------
+
+def _formato(path):
+    if path.endswith(".jsonl"):
+        return "jsonl"
+    if path.endswith(".csv"):
+        return "csv"
+    raise ValueError(f"Formato no soportado (usa .csv o .jsonl): {path}")
+
+
+def read_records(path):
+    """Genera un dict por registro del archivo, sin leerlo completo."""
+    formato = _formato(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if formato == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for linea in f:
+                if linea.strip():
+                    yield json.loads(linea)
+
+
+def write_records(path, fields, records):
+    """Escribe los registros (un iterable de dicts) conforme van llegando."""
+    formato = _formato(path)
+    total = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if formato == "csv":
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for r in records:
+                writer.writerow([r[k] for k in fields])
+                total += 1
+        else:
+            for r in records:
+                f.write(json.dumps({k: r[k] for k in fields}, ensure_ascii=False))
+                f.write("\n")
+                total += 1
+    return total
+
+
+def _lotes(iterable, tamano):
+    lote = []
+    for item in iterable:
+        lote.append(item)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _texto(r, campo):
+    valor = r.get(campo)
+    if valor is None or valor == "":
+        return None
+    if not isinstance(valor, str):
+        valor = str(valor)
+    return valor.strip() or None
+
+
+def _bandera(r, campo):
+    return 1 if str(r.get(campo) or "").strip().lower() in ("1", "true", "si", "sí", "x") else 0
+
+
+def _entero(r, campo):
+    valor = _texto(r, campo)
+    if valor is None:
+        return None
+    try:
+        return int(float(valor))
+    except ValueError:
+        raise InvalidRecord(f"{campo} no es un número: {valor!r}")
+
+
+def _precio(r):
+    valor = _texto(r, "price")
+    if valor is None:
+        return None
+    try:
+        return float(valor.replace("$", "").replace(",", ""))
+    except ValueError:
+        raise InvalidRecord(f"price no es un número: {valor!r}")
+
+
+# ---------- IMPORTACIÓN ----------
+
+def _fila_cliente(r):
+    name = _texto(r, "name")
+    business_name = _texto(r, "business_name")
+    if not name and not business_name:
+        raise InvalidRecord("falta name y business_name")
+    monthly_day = _entero(r, "monthly_day")
+    if monthly_day is not None and not 1 <= monthly_day <= 31:
+        raise InvalidRecord(f"monthly_day fuera de rango: {monthly_day}")
+    return (
+        name or business_name,
+        business_name,
+        _texto(r, "address"),
+        _texto(r, "zone"),
+        _texto(r, "phone"),
+        _texto(r, "notes"),
+        _bandera(r, "is_monthly"),
+        monthly_day,
+    )
+
+
+def _telefonos_existentes(conn):
+    # Solo la columna de teléfono (en dígitos) → id, para deduplicar
+    return {
+        telefono: client_id
+        for client_id, telefono in conn.execute(
+            "SELECT id, phone FROM clients WHERE phone IS NOT NULL;"
+        )
+        for telefono in [db.phone_digits(telefono)]
+        if telefono
+    }
+
+
+def import_clients(records, batch_size=BATCH_SIZE):
+    """Importa clientes saltando los que repiten teléfono (ya guardado o en el archivo)."""
+    stats = {"inserted": 0, "duplicates": 0, "invalid": 0}
+    with db.get_conn() as conn:
+        telefonos = _telefonos_existentes(conn)
+        for lote in _lotes(records, batch_size):
+            filas = []
+            for r in lote:
+                try:
+                    fila = _fila_cliente(r)
+                except InvalidRecord:
+                    stats["invalid"] += 1
+                    continue
+                telefono = db.phone_digits(fila[4])
+                if telefono:
+                    if telefono in telefonos:
+                        stats["duplicates"] += 1
+                        continue
+                    telefonos[telefono] = None
+                filas.append(fila)
+
+            conn.execute("BEGIN IMMEDIATE;")
+            try:
+                with db.fts_paused(conn, "clients"):
+                    conn.executemany("""
+                        INSERT INTO clients (
+                            name, business_name, address, zone, phone, notes,
+                            is_monthly, monthly_day
+                        )
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, filas)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            stats["inserted"] += len(filas)
+
+    db.invalidate_cache()
+    return stats
+
+
+def _datos_clientes(conn):
+    # id → (address, zone, phone), para no repetir en el servicio lo heredado
+    return {
+        client_id: (address, zone, phone)
+        for client_id, address, zone, phone in conn.execute(
+            "SELECT id, address, zone, phone FROM clients;"
+        )
+    }
+
+
+# Las fechas y horas se repiten muchísimo en un archivo grande: cada texto
+# distinto se convierte una sola vez.
+@lru_cache(maxsize=65536)
+def _dia(fecha):
+    fecha = date.fromisoformat(fecha)
+    return fecha.isoformat(), db.to_minutes(fecha)
+
+
+@lru_cache(maxsize=4096)
+def _hora(hora):
+    horas, minutos = hora[:5].split(":")
+    hora = time(int(horas), int(minutos))
+    return hora.strftime("%H:%M"), hora.hour * 60 + hora.minute
+
+
+def _fila_servicio(r, telefonos, clientes, created_at):
+    client_name = _texto(r, "client_name")
+    if not client_name:
+        raise InvalidRecord("falta client_name")
+    fecha = _texto(r, "date")
+    hora = _texto(r, "time") or "00:00"
+    try:
+        fecha_iso, minutos_dia = _dia(fecha)
+        hora_hhmm, minutos_hora = _hora(hora)
+    except (AttributeError, TypeError, ValueError):
+        raise InvalidRecord(f"fecha/hora inválida: {fecha!r} {hora!r}")
+    status = _texto(r, "status") or "Pendiente"
+    if status not in STATUSES:
+        raise InvalidRecord(f"status desconocido: {status!r}")
+
+    address, zone, phone = _texto(r, "address"), _texto(r, "zone"), _texto(r, "phone")
+    # El teléfono identifica al cliente en cualquier base; el client_id solo
+    # en la que se exportó (en otra los ids van corridos). Sin teléfono que
+    # coincida se usa el id si existe aquí, si no el servicio queda suelto.
+    client_id = telefonos.get(db.phone_digits(phone)) if phone else None
+    if client_id is None:
+        client_id = _entero(r, "client_id")
+        if client_id not in clientes:
+            client_id = None
+    heredado = clientes.get(client_id)
+    if heredado:
+        # Igual que _datos_propios: lo que coincide con el cliente queda en NULL
+        address = None if address == heredado[0] else address
+        zone = None if zone == heredado[1] else zone
+        phone = None if phone == heredado[2] else phone
+
+    return (
+        client_id,
+        client_name,
+        _texto(r, "service_type"),
+        _texto(r, "pest_type"),
+        address,
+        zone,
+        phone,
+        fecha_iso,
+        hora_hhmm,
+        minutos_dia + minutos_hora,
+        _precio(r),
+        status,
+        _texto(r, "notes"),
+        _texto(r, "created_at") or created_at,
+        _bandera(r, "is_monthly_service"),
+    )
+
+
+def import_appointments(records, batch_size=BATCH_SIZE):
+    """Importa servicios enlazados por teléfono, o por client_id si existe aquí."""
+    stats = {"inserted": 0, "invalid": 0, "linked": 0}
+    created_at = datetime.now().isoformat(timespec="seconds")
+    with db.get_conn() as conn:
+        telefonos = _telefonos_existentes(conn)
+        clientes = _datos_clientes(conn)
+        cache_size = conn.execute("PRAGMA cache_size;").fetchone()[0]
+        conn.execute(f"PRAGMA cache_size = -{IMPORT_CACHE_KIB};")
+        try:
+            _insertar_servicios(conn, records, batch_size, telefonos, clientes, created_at, stats)
+        finally:
+            # La conexión vuelve al pool: se deja como estaba
+            conn.execute(f"PRAGMA cache_size = {cache_size};")
+
+    db.invalidate_cache()
+    return stats
+
+
+def _insertar_servicios(conn, records, batch_size, telefonos, clientes, created_at, stats):
+    for lote in _lotes(records, batch_size):
+        filas = []
+        for r in lote:
+            try:
+                filas.append(_fila_servicio(r, telefonos, clientes, created_at))
+            except InvalidRecord:
+                stats["invalid"] += 1
+        stats["linked"] += sum(1 for f in filas if f[0] is not None)
+
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            with db.fts_paused(conn, "appointments"), db.totals_paused(conn), \
+                    db.changes_paused(conn, "appointments"):
+                conn.executemany("""
+                    INSERT INTO appointments (
+                        client_id, client_name, service_type, pest_type,
+                        address, zone, phone,
+                        date, time, scheduled_at, price,
+                        status, notes, created_at, is_monthly_service
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, filas)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        stats["inserted"] += len(filas)
+
+
+def _fila_geocode(r):
+    kind = _texto(r, "kind") or "address"
+    if kind not in db.GEOCODE_KINDS:
+        raise InvalidRecord(f"kind desconocido: {kind!r}")
+    key = db.address_key(_texto(r, "key") or _texto(r, "address") or _texto(r, "zone"))
+    if not key:
+        raise InvalidRecord("falta key")
+    try:
+        lat, lon = float(r["lat"]), float(r["lon"])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidRecord(f"coordenadas inválidas: {r.get('lat')!r}, {r.get('lon')!r}")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise InvalidRecord(f"coordenadas fuera de rango: {lat}, {lon}")
+    return kind, key, lat, lon
+
+
+def import_geocodes(records, batch_size=BATCH_SIZE):
+    """Carga la tabla local de coordenadas (reemplaza las claves repetidas)."""
+    stats = {"inserted": 0, "invalid": 0}
+    for lote in _lotes(records, batch_size):
+        filas = []
+        for r in lote:
+            try:
+                filas.append(_fila_geocode(r))
+            except InvalidRecord:
+                stats["invalid"] += 1
+        with db.transaction() as tx:
+            tx.conn.executemany(
+                "INSERT OR REPLACE INTO geocodes (kind, key, lat, lon) VALUES (?, ?, ?, ?)", filas
+            )
+            tx.writes += len(filas)
+        stats["inserted"] += len(filas)
+    return stats
+
+
+# ---------- EXPORTACIÓN ----------
+
+def iter_rows(query, params=()):
+    """Genera las filas de la consulta sin fetchall (el cursor va leyendo)."""
+    with db.get_conn() as conn:
+        yield from conn.execute(query, params)
+
+
+def export_clients(path):
+    return write_records(path, CLIENT_FIELDS, iter_rows("SELECT * FROM clients ORDER BY id;"))
+
+
+def export_appointments(path, include_archive=True):
+    # Desde la vista: cada servicio sale con los datos heredados del cliente.
+    # Los archivados (fx.archive) ya se guardaron así.
+    return write_records(path, APPOINTMENT_FIELDS, db.iter_appointments(include_archive))
+
+
+def export_geocodes(path):
+    return write_records(
+        path, GEOCODE_FIELDS, iter_rows("SELECT kind, key, lat, lon FROM geocodes ORDER BY kind, key;")
+    )
+
+
+IMPORTERS = {
+    "clients": import_clients,
+    "appointments": import_appointments,
+    "geocodes": import_geocodes,
+}
+EXPORTERS = {
+    "clients": export_clients,
+    "appointments": export_appointments,
+    "geocodes": export_geocodes,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("accion", choices=["import", "export"])
+    parser.add_argument("tabla", choices=sorted(IMPORTERS))
+    parser.add_argument("archivo")
+    parser.add_argument("--db", default=db.DB_NAME, help="archivo SQLite (por defecto agenda.db)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--include-archive", action=argparse.BooleanOptionalAction, default=True,
+        help="export appointments: incluye los servicios de los archivos por año (por defecto sí)",
+    )
+    args = parser.parse_args(argv)
+
+    db.DB_NAME = args.db
+    if args.accion == "import":
+        stats = IMPORTERS[args.tabla](read_records(args.archivo), batch_size=args.batch_size)
+        print(", ".join(f"{k}: {v}" for k, v in stats.items()))
+    else:
+        if args.tabla == "appointments":
+            total = export_appointments(args.archivo, include_archive=args.include_archive)
+        else:
+            total = EXPORTERS[args.tabla](args.archivo)
+        print(f"exportados: {total}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
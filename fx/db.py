@@ -0,0 +1,2675 @@
+import bisect
+import functools
+import itertools
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time as _time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+
+DB_NAME = "agenda.db"
+
+# Conexiones abiertas por archivo de base de datos. Se reutilizan entre
+# reruns de Streamlit en lugar de abrir y cerrar una por cada consulta.
+POOL_SIZE = 4
+# Segundos que se espera una conexión libre antes de fallar
+POOL_TIMEOUT = 30
+MMAP_SIZE = 256 * 1024 * 1024
+CACHED_STATEMENTS = 256
+# NORMAL en WAL: un fsync por checkpoint, no por commit
+SYNCHRONOUS = "NORMAL"
+
+# Tamaño de página por defecto de los listados de servicios
+PAGE_SIZE = 50
+
+# Resultados de lectura que guardamos en memoria entre reruns
+CACHE_SIZE = 256
+
+# Duración que se supone a cada servicio al buscar choques y huecos
+SERVICE_MINUTES = 45
+# Técnicos que salen a la vez: hasta cuántos servicios pueden empalmarse
+# sin que cuente como choque
+TECHNICIANS = 2
+WORK_START = "08:00"
+WORK_END = "19:00"
+SLOT_STEP = 15
+
+# Instrumentación (apagada por defecto): llamadas recientes que se guardan
+# y a partir de cuántos ms una llamada va al registro de lentas
+INSTRUMENT_BUFFER = 500
+SLOW_CALL_MS = 200
+
+
+# ---------- INSTRUMENTACIÓN ----------
+
+class CallRecord:
+    """Una llamada a la capa de datos: qué se ejecutó y cuánto tardó.
+
+    `statements` son (sql, forma de los parámetros, ms, filas); los ms
+    incluyen el fetchall y las filas solo se conocen si hubo fetchall.
+    `connect_ms` es lo que se esperó por una conexión del pool (o lo que
+    tardó en abrirse).
+    """
+
+    __slots__ = ("seq", "name", "params", "statements", "rows", "ms", "connect_ms", "thread")
+
+    def __init__(self, name, params):
+        self.seq = None
+        self.name = name
+        self.params = params
+        self.statements = []
+        self.rows = None
+        self.ms = 0.0
+        self.connect_ms = 0.0
+        self.thread = threading.get_ident()
+
+    def __repr__(self):
+        return (f"<{self.name}({self.params}) {self.ms:.1f} ms filas={self.rows}"
+                f" sentencias={len(self.statements)} conexión={self.connect_ms:.1f} ms>")
+
+
+class Instrumentation:
+    """Buffer circular de llamadas recientes y registro de las lentas."""
+
+    MAX_STATEMENTS = 50
+
+    def __init__(self, buffer_size=INSTRUMENT_BUFFER, slow_ms=SLOW_CALL_MS, slow_log=None):
+        self.calls = deque(maxlen=buffer_size)
+        self.slow_ms = slow_ms
+        self._seq = itertools.count(1)
+        self._local = threading.local()
+        self._handler = None
+        if slow_log:
+            self._handler = logging.FileHandler(slow_log, encoding="utf-8")
+            self._handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            _log_lentas.addHandler(self._handler)
+
+    def current(self):
+        return getattr(self._local, "llamada", None)
+
+    def call(self, fn, args, kwargs):
+        rec = CallRecord(fn.__name__, _forma_parametros(args, kwargs))
+        self._local.llamada = rec
+        t0 = _time.perf_counter()
+        try:
+            resultado = fn(*args, **kwargs)
+            rec.rows = _filas(resultado)
+            return resultado
+        finally:
+            rec.ms = (_time.perf_counter() - t0) * 1000
+            self._local.llamada = None
+            rec.seq = next(self._seq)
+            self.calls.append(rec)
+            if rec.ms >= self.slow_ms:
+                _log_lentas.warning(
+                    "%.1f ms %s(%s) filas=%s conexión=%.1f ms | %s",
+                    rec.ms, rec.name, rec.params, rec.rows, rec.connect_ms,
+                    " ; ".join(f"{sql} [{forma}] {ms:.1f} ms" for sql, forma, ms, _ in rec.statements),
+                )
+
+    def statement(self, sql, forma, ms):
+        rec = self.current()
+        if rec is not None and len(rec.statements) < self.MAX_STATEMENTS:
+            rec.statements.append((" ".join(sql.split()), forma, ms, None))
+
+    def fetched(self, filas, ms):
+        # Suma el fetchall a la última sentencia de la llamada
+        rec = self.current()
+        if rec is not None and rec.statements:
+            sql, forma, anterior, _ = rec.statements[-1]
+            rec.statements[-1] = (sql, forma, anterior + ms, filas)
+
+    def close(self):
+        if self._handler is not None:
+            _log_lentas.removeHandler(self._handler)
+            self._handler.close()
+
+
+_log_lentas = logging.getLogger("fx.db.lentas")
+_instrumento = None
+
+
+def _forma_parametros(args, kwargs=None):
+    # Solo tipos, nunca valores: los parámetros llevan teléfonos y nombres
+    if isinstance(args, dict):
+        args, kwargs = (), args
+    partes = [type(a).__name__ for a in args]
+    partes += [f"{k}={type(v).__name__}" for k, v in (kwargs or {}).items()]
+    return ", ".join(partes)
+
+
+def _filas(resultado):
+    if isinstance(resultado, tuple) and resultado and isinstance(resultado[0], (list, tuple)):
+        resultado = resultado[0]  # (filas, cursor) de las páginas
+    if isinstance(resultado, (dict, sqlite3.Row)):
+        return 1
+    if isinstance(resultado, (str, bytes)):
+        return None
+    try:
+        return len(resultado)
+    except TypeError:
+        return None
+
+
+def instrumented(fn):
+    """Registra cada llamada a fn cuando la instrumentación está encendida.
+
+    Apagada cuesta un if; las llamadas anidadas se cuentan dentro de la de
+    fuera. Bajo @cached, los aciertos de la caché no llegan aquí.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        inst = _instrumento
+        if inst is None or inst.current() is not None:
+            return fn(*args, **kwargs)
+        return inst.call(fn, args, kwargs)
+
+    return wrapper
+
+
+def enable_instrumentation(buffer_size=INSTRUMENT_BUFFER, slow_ms=SLOW_CALL_MS, slow_log=None):
+    """Empieza a registrar las llamadas (para todo el proceso).
+
+    Las que tarden `slow_ms` o más se escriben en `slow_log` si se indica.
+    """
+    global _instrumento
+    disable_instrumentation()
+    _instrumento = Instrumentation(buffer_size, slow_ms, slow_log)
+    return _instrumento
+
+
+def disable_instrumentation():
+    global _instrumento
+    inst, _instrumento = _instrumento, None
+    if inst is not None:
+        inst.close()
+
+
+def instrumentation_enabled():
+    return _instrumento is not None
+
+
+# Cuántos la pidieron con request_instrumentation (sesiones de la app)
+_usuarios_instrumento = 0
+_usuarios_lock = threading.Lock()
+
+
+def request_instrumentation(slow_log=None):
+    """Enciende la instrumentación si estaba apagada y cuenta un usuario más.
+
+    A diferencia de enable_instrumentation no reinicia el buffer ni el
+    registro de quien ya la tenía encendida; se apaga cuando el último
+    llama a release_instrumentation.
+    """
+    global _usuarios_instrumento
+    with _usuarios_lock:
+        _usuarios_instrumento += 1
+        if _instrumento is None:
+            enable_instrumentation(slow_log=slow_log)
+
+
+def release_instrumentation():
+    global _usuarios_instrumento
+    with _usuarios_lock:
+        _usuarios_instrumento = max(0, _usuarios_instrumento - 1)
+        if _usuarios_instrumento == 0:
+            disable_instrumentation()
+
+
+def recent_calls(since=0, thread=None):
+    """Llamadas del buffer con seq > since (de un solo hilo si se indica)."""
+    inst = _instrumento
+    if inst is None:
+        return []
+    return [
+        c for c in list(inst.calls)
+        if c.seq > since and (thread is None or c.thread == thread)
+    ]
+
+
+def last_call_seq():
+    """seq de la última llamada registrada (0 si no hay ninguna)."""
+    inst = _instrumento
+    llamadas = list(inst.calls) if inst is not None else []
+    return llamadas[-1].seq if llamadas else 0
+
+
+def summarize_calls(calls):
+    """Totales por función: llamadas, ms, ms de conexión, sentencias y filas."""
+    resumen = {}
+    for c in calls:
+        r = resumen.setdefault(c.name, {"calls": 0, "ms": 0.0, "connect_ms": 0.0, "statements": 0, "rows": 0})
+        r["calls"] += 1
+        r["ms"] += c.ms
+        r["connect_ms"] += c.connect_ms
+        r["statements"] += len(c.statements)
+        r["rows"] += c.rows or 0
+    return resumen
+
+
+class _Cursor(sqlite3.Cursor):
+    # Mide cada sentencia solo si hay una llamada registrándose en este hilo
+
+    def execute(self, sql, parameters=()):
+        inst = _instrumento
+        if inst is None or inst.current() is None:
+            return super().execute(sql, parameters)
+        t0 = _time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            inst.statement(sql, _forma_parametros(parameters), (_time.perf_counter() - t0) * 1000)
+
+    def executemany(self, sql, seq_of_parameters):
+        inst = _instrumento
+        if inst is None or inst.current() is None:
+            return super().executemany(sql, seq_of_parameters)
+        t0 = _time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            inst.statement(sql, f"{self.rowcount} filas", (_time.perf_counter() - t0) * 1000)
+
+    def fetchall(self):
+        inst = _instrumento
+        if inst is None or inst.current() is None:
+            return super().fetchall()
+        t0 = _time.perf_counter()
+        filas = super().fetchall()
+        inst.fetched(len(filas), (_time.perf_counter() - t0) * 1000)
+        return filas
+
+
+class _Conexion(sqlite3.Connection):
+    # Conexión cuyos cursores (también los de conn.execute) son _Cursor
+
+    def cursor(self, factory=_Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ---------- CONEXIONES ----------
+
+class ConnectionPool:
+    """Pool de conexiones SQLite configuradas una sola vez (WAL, mmap, etc.)."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._libres = queue.LifoQueue()
+        self._creadas = 0
+        self._lock = threading.Lock()
+        self._esquema_listo = False
+
+    def _nueva_conexion(self):
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+            factory=_Conexion,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute(f"PRAGMA synchronous={SYNCHRONOUS};")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE};")
+        return conn
+
+    def ensure_schema(self):
+        # Una sola vez por archivo y por proceso; después es solo un if
+        if self._esquema_listo:
+            return
+        with self._lock:
+            if self._esquema_listo:
+                return
+            conn = self._nueva_conexion()
+            try:
+                migrate(conn)
+            except Exception:
+                conn.close()
+                raise
+            self._creadas += 1
+            self._esquema_listo = True
+        self._libres.put(conn)
+
+    def checkout(self):
+        self.ensure_schema()
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            crear = self._creadas < self.size
+            if crear:
+                self._creadas += 1
+        if crear:
+            try:
+                return self._nueva_conexion()
+            except Exception:
+                with self._lock:
+                    self._creadas -= 1
+                raise
+
+        # Todas las conexiones están en uso: esperamos a que se libere una,
+        # pero no para siempre (una sesión o un worker colgado no avisa)
+        try:
+            return self._libres.get(timeout=POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"pool agotado: {self.size} conexiones en uso por más de {POOL_TIMEOUT} s"
+            ) from None
+
+    def checkin(self, conn):
+        # Nunca devolvemos al pool una conexión con una transacción abierta
+        if conn.in_transaction:
+            conn.rollback()
+        self._libres.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._creadas -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    """Devuelve el pool del archivo indicado (por defecto DB_NAME)."""
+    key = os.path.abspath(path or DB_NAME)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(key)
+    return pool
+
+
+def close_pools():
+    """Cierra todas las conexiones libres (útil en scripts y benchmarks)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+    with _versiones_lock:
+        for conn, _ in _versiones.values():
+            conn.close()
+        _versiones.clear()
+
+
+def _checkout(pool):
+    # Con instrumentación, lo que se espera (o tarda en abrirse) la conexión
+    rec = _instrumento.current() if _instrumento is not None else None
+    if rec is None:
+        return pool.checkout()
+    t0 = _time.perf_counter()
+    try:
+        return pool.checkout()
+    finally:
+        rec.connect_ms += (_time.perf_counter() - t0) * 1000
+
+
+@contextmanager
+def get_conn():
+    pool = get_pool()
+    conn = _checkout(pool)
+    try:
+        yield conn
+    finally:
+        pool.checkin(conn)
+
+
+@instrumented
+def init_db():
+    """Deja el esquema de DB_NAME al día (solo hace trabajo la primera vez)."""
+    get_pool().ensure_schema()
+
+
+# ---------- TRANSACCIONES ----------
+
+class Transaction:
+    """Unidad de trabajo abierta por transaction(); se pasa como tx= a los helpers."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.writes = 0
+
+
+@contextmanager
+def transaction(tx=None):
+    """Agrupa varias escrituras en un solo commit (o ninguno si hay un error).
+
+        with db.transaction() as tx:
+            client_id = db.add_client(..., tx=tx)
+            db.add_appointment(..., client_id=client_id, tx=tx)
+
+    Si se recibe una transacción ya abierta, el bloque se suma a ella y el
+    commit lo hace quien la abrió. Las lecturas cacheadas usan otras
+    conexiones: dentro del bloque no ven lo que aún no se ha guardado.
+    """
+    if tx is not None:
+        yield tx
+        return
+
+    pool = get_pool()
+    conn = _checkout(pool)
+    try:
+        # IMMEDIATE: el bloqueo de escritura se toma al empezar, no a mitad
+        conn.execute("BEGIN IMMEDIATE;")
+        tx = Transaction(conn)
+        try:
+            yield tx
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    finally:
+        pool.checkin(conn)
+    if tx.writes:
+        invalidate_cache()
+
+
+@contextmanager
+def _escritura(tx=None):
+    # Conexión para un helper de escritura: la de tx o una transacción propia
+    with transaction(tx) as tx:
+        tx.writes += 1
+        yield tx.conn
+
+
+# ---------- ESQUEMA / MIGRACIONES ----------
+
+def _m001_tablas_base(conn):
+    # Tabla de clientes
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            business_name TEXT,
+            address TEXT,
+            zone TEXT,
+            phone TEXT,
+            notes TEXT,
+            is_monthly INTEGER DEFAULT 0,
+            monthly_day INTEGER
+        );
+    """)
+
+    # Tabla de servicios (citas)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_name TEXT NOT NULL,
+            service_type TEXT,
+            pest_type TEXT,
+            address TEXT,
+            zone TEXT,
+            phone TEXT,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            price REAL,
+            status TEXT,
+            notes TEXT,
+            created_at TEXT
+        );
+    """)
+
+
+def _m002_servicio_mensual(conn):
+    # Las bases creadas con la versión anterior de fx_db.py no la tienen
+    if "is_monthly_service" not in _columnas(conn, "appointments"):
+        conn.execute("ALTER TABLE appointments ADD COLUMN is_monthly_service INTEGER DEFAULT 0;")
+
+
+def _m003_indices(conn):
+    # Filtros de la agenda: rango de fechas, estado y servicios mensuales,
+    # siempre ordenados por fecha y hora.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_date_time ON appointments (date, time);")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_appointments_status_date_time "
+        "ON appointments (status, date, time);"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_appointments_monthly "
+        "ON appointments (date, time) WHERE is_monthly_service = 1;"
+    )
+    # Orden de la lista de clientes
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clients_business_name ON clients (business_name, name);")
+    conn.execute("ANALYZE;")
+
+
+# Teléfono solo con dígitos, en SQL, para que "8112" encuentre "81 12-34..."
+_TELEFONO_SQL = (
+    "replace(replace(replace(replace(replace(replace("
+    "coalesce({t}.phone, ''), ' ', ''), '-', ''), '(', ''), ')', ''), '.', ''), '+', '')"
+)
+
+# unicode61 + remove_diacritics: "fumigacion" encuentra "Fumigación"
+_FTS_OPCIONES = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+_CLIENTS_FTS_COLS = "name, business_name, address, zone, phone, notes"
+_APPOINTMENTS_FTS_COLS = "client_name, service_type, pest_type, address, zone, phone, notes"
+
+
+def _fts_valores(columnas, fila):
+    valores = []
+    for col in columnas.split(", "):
+        valores.append(_TELEFONO_SQL.format(t=fila) if col == "phone" else f"{fila}.{col}")
+    return ", ".join(valores)
+
+
+def _m004_busqueda_fts(conn):
+    for tabla, columnas in (("clients", _CLIENTS_FTS_COLS), ("appointments", _APPOINTMENTS_FTS_COLS)):
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla}_fts USING fts5({columnas}, {_FTS_OPCIONES});")
+
+        # Triggers que mantienen el índice sincronizado con la tabla
+        nuevos = _fts_valores(columnas, "new")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabla}_fts_ai AFTER INSERT ON {tabla} BEGIN
+                INSERT INTO {tabla}_fts (rowid, {columnas}) VALUES (new.id, {nuevos});
+            END;
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabla}_fts_ad AFTER DELETE ON {tabla} BEGIN
+                DELETE FROM {tabla}_fts WHERE rowid = old.id;
+            END;
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabla}_fts_au AFTER UPDATE ON {tabla} BEGIN
+                DELETE FROM {tabla}_fts WHERE rowid = old.id;
+                INSERT INTO {tabla}_fts (rowid, {columnas}) VALUES (new.id, {nuevos});
+            END;
+        """)
+
+        # Datos que ya existían antes de esta migración
+        conn.execute(f"DELETE FROM {tabla}_fts;")
+        conn.execute(
+            f"INSERT INTO {tabla}_fts (rowid, {columnas}) "
+            f"SELECT t.id, {_fts_valores(columnas, 't')} FROM {tabla} t;"
+        )
+
+
+# Servicios con los datos vigentes del cliente: address/zone/phone del
+# servicio solo se guardan si difieren de los del cliente (NULL = heredar).
+_APPOINTMENTS_VIEW_V5 = """
+    CREATE VIEW appointments_v AS
+    SELECT
+        a.id, a.client_id, a.client_name, a.service_type, a.pest_type,
+        COALESCE(a.address, c.address) AS address,
+        COALESCE(a.zone, c.zone) AS zone,
+        COALESCE(a.phone, c.phone) AS phone,
+        a.date, a.time, a.price, a.status, a.notes, a.created_at,
+        a.is_monthly_service
+    FROM appointments a
+    LEFT JOIN clients c ON c.id = a.client_id;
+"""
+
+
+def _crear_triggers_fts_servicios(conn):
+    # El índice de servicios se llena desde la vista para incluir lo heredado
+    # del cliente, y se refresca cuando cambia el cliente.
+    columnas = _APPOINTMENTS_FTS_COLS
+    desde_vista = f"SELECT v.id, {_fts_valores(columnas, 'v')} FROM appointments_v v"
+    for nombre in ("appointments_fts_ai", "appointments_fts_au", "appointments_fts_client_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {nombre};")
+    conn.execute(f"""
+        CREATE TRIGGER appointments_fts_ai AFTER INSERT ON appointments BEGIN
+            INSERT INTO appointments_fts (rowid, {columnas}) {desde_vista} WHERE v.id = new.id;
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER appointments_fts_au AFTER UPDATE ON appointments BEGIN
+            DELETE FROM appointments_fts WHERE rowid = old.id;
+            INSERT INTO appointments_fts (rowid, {columnas}) {desde_vista} WHERE v.id = new.id;
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER appointments_fts_client_au AFTER UPDATE ON clients BEGIN
+            DELETE FROM appointments_fts
+            WHERE rowid IN (SELECT id FROM appointments WHERE client_id = new.id);
+            INSERT INTO appointments_fts (rowid, {columnas}) {desde_vista} WHERE v.client_id = new.id;
+        END;
+    """)
+
+
+def _clave_nombre(texto):
+    return " ".join((texto or "").lower().split())
+
+
+def _m005_client_id(conn):
+    if "client_id" not in _columnas(conn, "appointments"):
+        conn.execute("ALTER TABLE appointments ADD COLUMN client_id INTEGER REFERENCES clients(id);")
+
+    # Emparejamos cada servicio con su cliente por el nombre que se mostró al
+    # agendarlo (negocio o persona); si hay varios, desempata el teléfono.
+    clientes = {}
+    por_nombre = {}
+    for c in conn.execute("SELECT id, name, business_name, address, zone, phone FROM clients;"):
+        clientes[c[0]] = c
+        for nombre in {_clave_nombre(c[1]), _clave_nombre(c[2])} - {""}:
+            por_nombre.setdefault(nombre, []).append(c[0])
+
+    cambios = []
+    filas = conn.execute(
+        "SELECT id, client_name, address, zone, phone FROM appointments WHERE client_id IS NULL;"
+    )
+    for appointment_id, client_name, address, zone, phone in filas:
+        candidatos = por_nombre.get(_clave_nombre(client_name), [])
+        if len(candidatos) > 1:
+            candidatos = [
+                i for i in candidatos
+                if phone_digits(clientes[i][5]) == phone_digits(phone)
+            ]
+        if len(candidatos) != 1:
+            continue
+        c = clientes[candidatos[0]]
+        # Lo que coincide con el cliente deja de guardarse repetido
+        cambios.append((
+            c[0],
+            None if address == c[3] else address,
+            None if zone == c[4] else zone,
+            None if phone == c[5] else phone,
+            appointment_id,
+        ))
+    conn.executemany(
+        "UPDATE appointments SET client_id = ?, address = ?, zone = ?, phone = ? WHERE id = ?;",
+        cambios,
+    )
+
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_appointments_client_date "
+        "ON appointments (client_id, date, time);"
+    )
+    conn.execute("DROP VIEW IF EXISTS appointments_v;")
+    conn.execute(_APPOINTMENTS_VIEW_V5)
+    _crear_triggers_fts_servicios(conn)
+    conn.execute("DELETE FROM appointments_fts;")
+    conn.execute(
+        f"INSERT INTO appointments_fts (rowid, {_APPOINTMENTS_FTS_COLS}) "
+        f"SELECT v.id, {_fts_valores(_APPOINTMENTS_FTS_COLS, 'v')} FROM appointments_v v;"
+    )
+
+
+_APPOINTMENTS_VIEW = """
+    CREATE VIEW appointments_v AS
+    SELECT
+        a.id, a.client_id, a.client_name, a.service_type, a.pest_type,
+        COALESCE(a.address, c.address) AS address,
+        COALESCE(a.zone, c.zone) AS zone,
+        COALESCE(a.phone, c.phone) AS phone,
+        a.date, a.time, a.scheduled_at, a.price, a.status, a.notes, a.created_at,
+        a.is_monthly_service
+    FROM appointments a
+    LEFT JOIN clients c ON c.id = a.client_id;
+"""
+
+
+# scheduled_at calculado en SQL a partir del texto de date/time. "9:00" se
+# lee como "09:00"; sin hora cuenta desde las 00:00, igual que to_minutes().
+# Si la fecha o la hora no se pueden leer el resultado es NULL.
+_SCHEDULED_AT_SQL = """
+    CAST(strftime('%s', trim(date) || CASE
+        WHEN trim(COALESCE(time, '')) = '' THEN ''
+        WHEN trim(time) GLOB '[0-9]:[0-9][0-9]*' THEN ' 0' || substr(trim(time), 1, 4)
+        ELSE ' ' || substr(trim(time), 1, 5)
+    END) AS INTEGER) / 60
+"""
+
+
+def _comprobar_scheduled_at(conn):
+    # Un servicio sin scheduled_at no sale en ninguna consulta por rango: se
+    # falla (y migrate() deshace todo) en lugar de esconderlo o ponerlo a las 00:00
+    malas = conn.execute(
+        "SELECT id, date, time FROM appointments WHERE scheduled_at IS NULL LIMIT 11;"
+    ).fetchall()
+    if malas:
+        detalle = ", ".join(f"id {i} ({d!r}, {h!r})" for i, d, h in malas[:10])
+        if len(malas) > 10:
+            detalle += ", ..."
+        raise ValueError(
+            "Servicios con fecha u hora que no se puede leer (usa YYYY-MM-DD y HH:MM "
+            f"y vuelve a abrir la app): {detalle}"
+        )
+
+
+def _m006_scheduled_at(conn):
+    # Fecha y hora juntas como minutos desde 1970-01-01 00:00 (hora local
+    # tal cual, sin zona horaria). date/time se siguen escribiendo como texto.
+    if "scheduled_at" not in _columnas(conn, "appointments"):
+        conn.execute("ALTER TABLE appointments ADD COLUMN scheduled_at INTEGER;")
+    conn.execute(f"UPDATE appointments SET scheduled_at = {_SCHEDULED_AT_SQL} WHERE scheduled_at IS NULL;")
+    _comprobar_scheduled_at(conn)
+
+    # Los índices sobre el texto se sustituyen por los de scheduled_at
+    for indice in (
+        "idx_appointments_date_time",
+        "idx_appointments_status_date_time",
+        "idx_appointments_monthly",
+        "idx_appointments_client_date",
+    ):
+        conn.execute(f"DROP INDEX IF EXISTS {indice};")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appointments_scheduled ON appointments (scheduled_at);")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_appointments_status_scheduled "
+        "ON appointments (status, scheduled_at);"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_appointments_monthly_scheduled "
+        "ON appointments (scheduled_at) WHERE is_monthly_service = 1;"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_appointments_client_scheduled "
+        "ON appointments (client_id, scheduled_at);"
+    )
+
+    conn.execute("DROP VIEW IF EXISTS appointments_v;")
+    conn.execute(_APPOINTMENTS_VIEW)
+    conn.execute("ANALYZE;")
+
+
+def _m007_geocodes(conn):
+    # Tabla local de coordenadas para planear rutas: por dirección
+    # (kind = 'address') o el centro de una zona/colonia (kind = 'zone').
+    # key es address_key() del texto, para que "Calle 5 " = "calle 5".
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS geocodes (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID;
+    """)
+
+
+# Totales por día, estado, zona y plaga. La zona es la efectiva (la del
+# servicio o, si está en NULL, la del cliente) y los NULL se guardan como ''
+# para que la clave primaria los agrupe. El importe va en centavos enteros:
+# sumar y restar nunca acumula error de redondeo.
+_TOTALS_COLS = "day, status, zone, pest_type, n, total_cents"
+_TOTALS_UPSERT = (
+    "ON CONFLICT (day, status, zone, pest_type) "
+    "DO UPDATE SET n = n + excluded.n, total_cents = total_cents + excluded.total_cents"
+)
+_CENTAVOS_SQL = "CAST(ROUND(COALESCE({}price, 0) * 100) AS INTEGER)"
+
+
+def _totales_fila_sql(fila, signo):
+    # Suma (signo "") o resta (signo "-") una fila new/old de appointments
+    return f"""
+        INSERT INTO appointment_totals ({_TOTALS_COLS})
+        VALUES (
+            {fila}.scheduled_at / 1440,
+            COALESCE({fila}.status, ''),
+            COALESCE({fila}.zone, (SELECT zone FROM clients WHERE id = {fila}.client_id), ''),
+            COALESCE({fila}.pest_type, ''),
+            {signo}1,
+            {signo}{_CENTAVOS_SQL.format(fila + ".")}
+        )
+        {_TOTALS_UPSERT};
+    """
+
+
+def _totales_cliente_sql(zona, signo):
+    # Servicios que heredan la zona del cliente: se mueven de una zona a otra
+    return f"""
+        INSERT INTO appointment_totals ({_TOTALS_COLS})
+        SELECT scheduled_at / 1440, COALESCE(status, ''), COALESCE({zona}, ''),
+               COALESCE(pest_type, ''), {signo}COUNT(*), {signo}SUM({_CENTAVOS_SQL.format("")})
+        FROM appointments
+        WHERE client_id = old.id AND zone IS NULL
+        GROUP BY 1, 2, 4
+        {_TOTALS_UPSERT};
+    """
+
+
+_TOTALS_SELECT_V8 = f"""
+    SELECT scheduled_at / 1440, COALESCE(status, ''), COALESCE(zone, ''),
+           COALESCE(pest_type, ''), COUNT(*), SUM({_CENTAVOS_SQL.format("")})
+    FROM appointments_v
+    WHERE scheduled_at IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+"""
+_TOTALS_REBUILD_V8 = f"INSERT INTO appointment_totals ({_TOTALS_COLS}) {_TOTALS_SELECT_V8};"
+
+
+def _m008_totales(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS appointment_totals (
+            day INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            zone TEXT NOT NULL,
+            pest_type TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            total_cents INTEGER NOT NULL,
+            PRIMARY KEY (day, status, zone, pest_type)
+        ) WITHOUT ROWID;
+    """)
+    limpiar = "DELETE FROM appointment_totals WHERE day = {}.scheduled_at / 1440 AND n = 0;"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS appointment_totals_ai AFTER INSERT ON appointments
+        WHEN new.scheduled_at IS NOT NULL BEGIN
+            {_totales_fila_sql("new", "")}
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS appointment_totals_ad AFTER DELETE ON appointments
+        WHEN old.scheduled_at IS NOT NULL BEGIN
+            {_totales_fila_sql("old", "-")}
+            {limpiar.format("old")}
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS appointment_totals_au
+        AFTER UPDATE OF scheduled_at, status, zone, pest_type, price, client_id ON appointments
+        BEGIN
+            {_totales_fila_sql("old", "-")}
+            {_totales_fila_sql("new", "")}
+            {limpiar.format("old")}
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS appointment_totals_client_au
+        AFTER UPDATE OF zone ON clients WHEN old.zone IS NOT new.zone BEGIN
+            {_totales_cliente_sql("old.zone", "-")}
+            {_totales_cliente_sql("new.zone", "")}
+            DELETE FROM appointment_totals WHERE zone = COALESCE(old.zone, '') AND n = 0;
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS appointment_totals_client_ad
+        AFTER DELETE ON clients WHEN old.zone IS NOT NULL BEGIN
+            {_totales_cliente_sql("old.zone", "-")}
+            {_totales_cliente_sql("NULL", "")}
+            DELETE FROM appointment_totals WHERE zone = old.zone AND n = 0;
+        END;
+    """)
+    conn.execute("DELETE FROM appointment_totals;")
+    conn.execute(_TOTALS_REBUILD_V8)
+
+
+# Desde m009 los totales incluyen también los servicios archivados
+_TOTALS_SELECT = f"""
+    SELECT day, status, zone, pest_type, SUM(n), SUM(total_cents) FROM (
+        SELECT {_TOTALS_COLS} FROM archived_totals
+        UNION ALL
+        {_TOTALS_SELECT_V8}
+    )
+    GROUP BY 1, 2, 3, 4
+"""
+_TOTALS_REBUILD = f"INSERT INTO appointment_totals ({_TOTALS_COLS}) {_TOTALS_SELECT};"
+
+
+def _m009_archivos(conn):
+    # Servicios cerrados movidos a un archivo por año (fx.archive): qué años
+    # hay y qué rango de scheduled_at cubre cada uno. archived_totals guarda
+    # lo que suman en appointment_totals, para poder recalcular los totales
+    # sin abrir los archivos.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archives (
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            first_at INTEGER NOT NULL,
+            last_at INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            archived_at TEXT NOT NULL
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archived_totals (
+            day INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            zone TEXT NOT NULL,
+            pest_type TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            total_cents INTEGER NOT NULL,
+            PRIMARY KEY (day, status, zone, pest_type)
+        ) WITHOUT ROWID;
+    """)
+
+
+def _m010_fts_solo_columnas_indexadas(conn):
+    # El índice de un servicio solo se rehace si cambia algo que está en él
+    # (o su cliente): cambiar estado, precio o fecha ya no lo toca.
+    columnas = _APPOINTMENTS_FTS_COLS
+    desde_vista = f"SELECT v.id, {_fts_valores(columnas, 'v')} FROM appointments_v v"
+    conn.execute("DROP TRIGGER IF EXISTS appointments_fts_au;")
+    conn.execute(f"""
+        CREATE TRIGGER appointments_fts_au
+        AFTER UPDATE OF {columnas}, client_id ON appointments BEGIN
+            DELETE FROM appointments_fts WHERE rowid = old.id;
+            INSERT INTO appointments_fts (rowid, {columnas}) {desde_vista} WHERE v.id = new.id;
+        END;
+    """)
+
+
+# Tablas cuyo INSERT/UPDATE/DELETE queda en change_log
+CHANGE_LOG_TABLES = ("clients", "appointments")
+
+
+def _m011_change_log(conn):
+    # Registro de cambios que solo crece (changes_since): cada alta, cambio
+    # o baja en CHANGE_LOG_TABLES deja una fila. seq es AUTOINCREMENT, así
+    # que nunca se repite ni retrocede aunque se borren filas del registro.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            changed_columns TEXT,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'))
+        );
+    """)
+    for tabla in CHANGE_LOG_TABLES:
+        columnas = [r[1] for r in conn.execute(f"PRAGMA table_info({tabla});") if r[1] != "id"]
+        # ",status,price" → "status,price"; un UPDATE que no cambia nada no se anota
+        cambiadas = " || ".join(
+            f"CASE WHEN old.{c} IS NOT new.{c} THEN ',{c}' ELSE '' END" for c in columnas
+        )
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabla}_log_ai AFTER INSERT ON {tabla} BEGIN
+                INSERT INTO change_log (table_name, op, row_id) VALUES ('{tabla}', 'insert', new.id);
+            END;
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabla}_log_au AFTER UPDATE ON {tabla} BEGIN
+                INSERT INTO change_log (table_name, op, row_id, changed_columns)
+                SELECT '{tabla}', 'update', new.id, substr(c, 2) FROM (SELECT {cambiadas} AS c)
+                WHERE c <> '';
+            END;
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabla}_log_ad AFTER DELETE ON {tabla} BEGIN
+                INSERT INTO change_log (table_name, op, row_id) VALUES ('{tabla}', 'delete', old.id);
+            END;
+        """)
+
+
+
+def _m012_scheduled_at_horas_cortas(conn):
+    # La primera versión de m006 no leía "9:00" (sin cero) y dejaba esos
+    # servicios a las 00:00, y los de fecha ilegible en NULL. Se recalculan
+    # con _SCHEDULED_AT_SQL; los que sigan sin poder leerse hacen fallar la
+    # migración, igual que en m006.
+    conn.execute(f"""
+        UPDATE appointments SET scheduled_at = {_SCHEDULED_AT_SQL}
+        WHERE scheduled_at IS NULL OR trim(time) GLOB '[0-9]:[0-9][0-9]*';
+    """)
+    _comprobar_scheduled_at(conn)
+
+
+_FTS_ORIGEN = {
+    "clients": (_CLIENTS_FTS_COLS, "clients"),
+    "appointments": (_APPOINTMENTS_FTS_COLS, "appointments_v"),
+}
+
+
+# Migraciones en orden; la posición (empezando en 1) es la versión que deja
+# guardada en PRAGMA user_version. Nunca se reordenan ni se editan: los
+# cambios nuevos van siempre al final.
+MIGRATIONS = [
+    _m001_tablas_base,
+    _m002_servicio_mensual,
+    _m003_indices,
+    _m004_busqueda_fts,
+    _m005_client_id,
+    _m006_scheduled_at,
+    _m007_geocodes,
+    _m008_totales,
+    _m009_archivos,
+    _m010_fts_solo_columnas_indexadas,
+    _m011_change_log,
+    _m012_scheduled_at_horas_cortas,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+@contextmanager
+def triggers_paused(conn, *triggers):
+    """Quita los triggers durante el bloque y los vuelve a crear al salir.
+
+    Igual que fts_paused, solo dentro de una transacción abierta.
+    """
+    sql_triggers = [
+        conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?;", (trigger,)
+        ).fetchone()[0]
+        for trigger in triggers
+    ]
+    for trigger in triggers:
+        conn.execute(f"DROP TRIGGER {trigger};")
+    try:
+        yield
+    finally:
+        for sql_trigger in sql_triggers:
+            conn.execute(sql_trigger)
+
+
+@contextmanager
+def fts_paused(conn, tabla):
+    """Inserciones masivas en `tabla` sin actualizar su índice FTS fila a fila.
+
+    Hay que usarlo dentro de una transacción abierta (BEGIN IMMEDIATE): el
+    trigger de inserción se quita durante el bloque y al salir se indexan de
+    una vez todas las filas nuevas. Como el DDL también es transaccional,
+    las demás conexiones nunca ven la tabla sin trigger.
+    """
+    columnas, origen = _FTS_ORIGEN[tabla]
+    ultimo_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabla};").fetchone()[0]
+    with triggers_paused(conn, f"{tabla}_fts_ai"):
+        yield
+    conn.execute(
+        f"INSERT INTO {tabla}_fts (rowid, {columnas}) "
+        f"SELECT v.id, {_fts_valores(columnas, 'v')} FROM {origen} v WHERE v.id > ?;",
+        (ultimo_id,),
+    )
+
+
+@contextmanager
+def totals_paused(conn):
+    """Inserciones masivas de servicios sin sumar a appointment_totals fila a fila.
+
+    Como fts_paused, dentro de una transacción abierta: el trigger de alta
+    se quita durante el bloque y al salir las filas nuevas se suman con un
+    solo GROUP BY. Solo cubre altas; los cambios y bajas del bloque no se
+    reflejarían en los totales.
+    """
+    ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM appointments;").fetchone()[0]
+    with triggers_paused(conn, "appointment_totals_ai"):
+        yield
+    conn.execute(f"""
+        INSERT INTO appointment_totals ({_TOTALS_COLS})
+        SELECT scheduled_at / 1440, COALESCE(status, ''), COALESCE(zone, ''),
+               COALESCE(pest_type, ''), COUNT(*), SUM({_CENTAVOS_SQL.format("")})
+        FROM appointments_v
+        WHERE id > ? AND scheduled_at IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+        {_TOTALS_UPSERT};
+    """, (ultimo_id,))
+
+
+@contextmanager
+def changes_paused(conn, tabla):
+    """Inserciones masivas en `tabla` anotadas en change_log con un solo INSERT.
+
+    Como fts_paused, dentro de una transacción abierta: al salir cada fila
+    nueva queda como 'insert', en orden de id. Los cambios y bajas del
+    bloque se siguen anotando con sus triggers.
+    """
+    ultimo_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabla};").fetchone()[0]
+    with triggers_paused(conn, f"{tabla}_log_ai"):
+        yield
+    conn.execute(
+        f"INSERT INTO change_log (table_name, op, row_id) "
+        f"SELECT '{tabla}', 'insert', id FROM {tabla} WHERE id > ? ORDER BY id;",
+        (ultimo_id,),
+    )
+
+
+def _columnas(conn, tabla):
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({tabla});")}
+
+
+def migrate(conn):
+    """Aplica las migraciones pendientes y devuelve la versión final."""
+    version = conn.execute("PRAGMA user_version;").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return version
+
+    # BEGIN IMMEDIATE para que otro proceso no migre el mismo archivo a la vez
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+        for numero, migracion in enumerate(MIGRATIONS, start=1):
+            if numero > version:
+                migracion(conn)
+                conn.execute(f"PRAGMA user_version = {numero};")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return SCHEMA_VERSION
+
+
+# ---------- CACHÉ DE LECTURAS ----------
+
+class ReadCache:
+    """LRU de resultados de lectura invalidado por un contador de generación.
+
+    Cada escritura de este módulo incrementa la generación al hacer commit,
+    así que una entrada solo se reutiliza mientras no haya cambiado nada.
+    Las escrituras hechas desde otro proceso no se ven: tras ellas hay que
+    llamar a invalidate_cache().
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                valor = self._datos[key]
+            except KeyError:
+                self.misses += 1
+                raise
+            self._datos.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def put(self, key, valor):
+        with self._lock:
+            # Si hubo una escritura mientras consultábamos, el resultado ya
+            # es viejo: no lo guardamos.
+            if key[0] != self.generation:
+                return
+            self._datos[key] = valor
+            self._datos.move_to_end(key)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+    def bump(self):
+        with self._lock:
+            self.generation += 1
+            self._datos.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "generation": self.generation,
+                "entries": len(self._datos),
+            }
+
+
+_cache = ReadCache()
+
+
+def cached(fn):
+    """Cachea el resultado de una función de lectura según sus parámetros.
+
+    El resultado se comparte entre llamadas: no hay que modificarlo.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (_cache.generation, DB_NAME, fn.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            return _cache.get(key)
+        except KeyError:
+            pass
+        valor = fn(*args, **kwargs)
+        _cache.put(key, valor)
+        return valor
+
+    return wrapper
+
+
+def invalidate_cache():
+    """Descarta todas las lecturas cacheadas (lo llaman las escrituras)."""
+    _cache.bump()
+
+
+def cache_stats():
+    """Aciertos, fallos, generación actual y entradas de la caché."""
+    return _cache.stats()
+
+
+# Una conexión aparte por archivo solo para leer PRAGMA data_version
+_versiones = {}
+_versiones_lock = threading.Lock()
+
+
+def refresh_cache():
+    """Invalida la caché si otra conexión guardó cambios desde la última llamada.
+
+    Cubre las escrituras de otros procesos (p. ej. el API y la app a la vez).
+    PRAGMA data_version no lee el archivo, así que se puede llamar al
+    empezar cada petición. Devuelve True si invalidó.
+    """
+    key = os.path.abspath(DB_NAME)
+    with _versiones_lock:
+        conn, anterior = _versiones.get(key, (None, None))
+        if conn is None:
+            get_pool(key).ensure_schema()
+            conn = sqlite3.connect(key, check_same_thread=False)
+        version = conn.execute("PRAGMA data_version;").fetchone()[0]
+        _versiones[key] = (conn, version)
+    # Las escrituras de este proceso también cambian data_version: en ese
+    # caso se invalida dos veces, que solo cuesta volver a consultar.
+    if anterior is None or version == anterior:
+        return False
+    invalidate_cache()
+    return True
+
+
+# ---------- CLIENTES ----------
+
+CLIENTS_QUERY = "SELECT * FROM clients ORDER BY business_name, name;"
+
+
+@instrumented
+def add_client(name, business_name, address, zone, phone, notes,
+               is_monthly=False, monthly_day=None, tx=None):
+    """Guarda un cliente nuevo y devuelve su id."""
+    with _escritura(tx) as conn:
+        cur = conn.execute("""
+            INSERT INTO clients (
+                name, business_name, address, zone, phone, notes,
+                is_monthly, monthly_day
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            name,
+            business_name,
+            address,
+            zone,
+            phone,
+            notes,
+            1 if is_monthly else 0,
+            monthly_day,
+        ))
+    return cur.lastrowid
+
+
+@instrumented
+def update_client(client_id, name, business_name, address, zone, phone, notes,
+                  is_monthly=None, monthly_day=None, tx=None):
+    """Actualiza los datos de un cliente existente.
+
+    is_monthly y monthly_day en None dejan la regla mensual como está;
+    is_monthly=False la quita (y borra el día).
+    """
+    asignaciones = "name = ?, business_name = ?, address = ?, zone = ?, phone = ?, notes = ?"
+    params = [name, business_name, address, zone, phone, notes]
+    if is_monthly is not None:
+        asignaciones += ", is_monthly = ?"
+        params.append(1 if is_monthly else 0)
+    if is_monthly is not None and not is_monthly:
+        asignaciones += ", monthly_day = NULL"
+    elif monthly_day is not None:
+        asignaciones += ", monthly_day = ?"
+        params.append(monthly_day)
+    with _escritura(tx) as conn:
+        conn.execute(f"UPDATE clients SET {asignaciones} WHERE id = ?", params + [client_id])
+        # Dirección, zona y teléfono los heredan los servicios vía
+        # appointments_v; el nombre mostrado sí está copiado en cada servicio.
+        conn.execute(
+            "UPDATE appointments SET client_name = ? WHERE client_id = ? AND client_name <> ?",
+            (business_name or name, client_id, business_name or name),
+        )
+
+
+@instrumented
+def delete_client(client_id, tx=None):
+    """Elimina un cliente de la tabla clients."""
+    with _escritura(tx) as conn:
+        # Sus servicios se quedan con una copia de los datos que heredaban
+        conn.execute("""
+            UPDATE appointments
+            SET address = COALESCE(appointments.address, c.address),
+                zone = COALESCE(appointments.zone, c.zone),
+                phone = COALESCE(appointments.phone, c.phone),
+                client_id = NULL
+            FROM (SELECT address, zone, phone FROM clients WHERE id = ?) AS c
+            WHERE appointments.client_id = ?
+        """, (client_id, client_id))
+        conn.execute("DELETE FROM clients WHERE id = ?", (client_id,))
+
+
+@cached
+@instrumented
+def get_clients():
+    with get_conn() as conn:
+        return conn.execute(CLIENTS_QUERY).fetchall()
+
+
+@cached
+@instrumented
+def get_client_by_id(client_id):
+    with get_conn() as conn:
+        return conn.execute("SELECT * FROM clients WHERE id = ?", (client_id,)).fetchone()
+
+
+@cached
+@instrumented
+def count_clients():
+    with get_conn() as conn:
+        return conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+
+
+def client_label(c):
+    """Texto con el que se muestra un cliente en los selectores."""
+    etiqueta = c["business_name"] or c["name"]
+    if c["business_name"] and c["name"]:
+        etiqueta = f"{c['business_name']} ({c['name']})"
+    return etiqueta
+
+
+# ---------- ARCHIVO HISTÓRICO ----------
+
+# Solo se archivan los servicios cerrados (fx.archive), cada año en su
+# propio archivo SQLite: agenda_2023.db junto a agenda.db. Las consultas de
+# servicios leen de la base "caliente" y adjuntan (ATTACH) solo los años que
+# alcanza el rango pedido. Los servicios archivados ya no se editan ni salen
+# en search_appointments: las escrituras sobre ellos lanzan ArchivedAppointments.
+ARCHIVE_STATUSES = ("Cobrado",)
+# Columnas de la tabla appointments de cada archivo: las de appointments_v,
+# en el mismo orden, con lo heredado del cliente ya copiado
+ARCHIVE_COLUMNS = (
+    "id", "client_id", "client_name", "service_type", "pest_type",
+    "address", "zone", "phone", "date", "time", "scheduled_at",
+    "price", "status", "notes", "created_at", "is_monthly_service",
+)
+# Bases adjuntas por conexión que permite SQLite (SQLITE_MAX_ATTACHED)
+MAX_ATTACHED = 10
+
+
+def archive_file(year, path=None):
+    """Nombre del archivo de `year` para la base `path` (por defecto DB_NAME)."""
+    base, extension = os.path.splitext(os.path.basename(path or DB_NAME))
+    return f"{base}_{year}{extension or '.db'}"
+
+
+@cached
+@instrumented
+def get_archives():
+    """Años archivados: year, file, first_at/last_at (scheduled_at) y rows."""
+    with get_conn() as conn:
+        return conn.execute("SELECT * FROM archives ORDER BY year").fetchall()
+
+
+def _archivos_del_rango(date_from=None, date_to=None, status=None):
+    # Sin date_from la consulta es del día a día: nunca baja a los archivos
+    if not date_from or (status and status != "Todos" and status not in ARCHIVE_STATUSES):
+        return []
+    desde = to_minutes(date_from)
+    hasta = to_minutes(_como_fecha(date_to) + timedelta(days=1)) if date_to else None
+    return [
+        a for a in get_archives()
+        if a["last_at"] >= desde and (hasta is None or a["first_at"] < hasta)
+    ]
+
+
+def _alias_archivo(year):
+    return f"archivo_{year}"
+
+
+def _adjuntar(conn, archivos):
+    """Adjunta a conn los archivos que le falten; devuelve sus tablas de servicios.
+
+    Los adjuntos se quedan en la conexión del pool para las siguientes
+    consultas; si no caben más, se sueltan los que esta no usa.
+    """
+    if not archivos:
+        return []
+    necesarios = {_alias_archivo(a["year"]) for a in archivos}
+    adjuntos = {r[1] for r in conn.execute("PRAGMA database_list;")} - {"main", "temp"}
+    faltan = [a for a in archivos if _alias_archivo(a["year"]) not in adjuntos]
+    if faltan and len(adjuntos) + len(faltan) > MAX_ATTACHED:
+        for alias in adjuntos - necesarios:
+            conn.execute(f"DETACH DATABASE {alias};")
+    carpeta = os.path.dirname(os.path.abspath(DB_NAME))
+    for a in faltan:
+        conn.execute(
+            f"ATTACH DATABASE ? AS {_alias_archivo(a['year'])};",
+            (os.path.join(carpeta, a["file"]),),
+        )
+    return [f"{_alias_archivo(a['year'])}.appointments" for a in archivos]
+
+
+def _union(tablas, where, params, columnas="*"):
+    # El mismo WHERE en cada tabla, para que cada una use sus índices
+    query = " UNION ALL ".join(f"SELECT {columnas} FROM {t}{where}" for t in tablas)
+    return query, list(params) * len(tablas)
+
+
+class ArchivedAppointments(LookupError):
+    """Servicios que están en un archivo por año: son de solo lectura (ids en .ids)."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        super().__init__(f"Los servicios {', '.join(map(str, ids))} están archivados (solo lectura)")
+
+
+def _comprobar_archivados(conn, appointment_ids):
+    # Solo se llama cuando una escritura no encontró algún id en la base:
+    # si está en un archivo se avisa en vez de devolver "no existe". Los
+    # archivos se abren aparte (solo lectura): dentro de la transacción de
+    # la escritura no se puede hacer ATTACH.
+    ids = list(dict.fromkeys(appointment_ids))
+    carpeta = os.path.dirname(os.path.abspath(DB_NAME))
+    marcas = ", ".join("?" * len(ids))
+    archivados = []
+    for (archivo,) in conn.execute("SELECT file FROM archives ORDER BY year"):
+        ruta = os.path.join(carpeta, archivo)
+        if not os.path.exists(ruta):
+            continue
+        arch = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+        try:
+            archivados += [
+                r[0] for r in arch.execute(f"SELECT id FROM appointments WHERE id IN ({marcas})", ids)
+            ]
+        finally:
+            arch.close()
+    if archivados:
+        raise ArchivedAppointments(sorted(archivados))
+
+
+_ARCHIVE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS appointments (
+        id INTEGER PRIMARY KEY,
+        client_id INTEGER,
+        client_name TEXT,
+        service_type TEXT,
+        pest_type TEXT,
+        address TEXT,
+        zone TEXT,
+        phone TEXT,
+        date TEXT,
+        time TEXT,
+        scheduled_at INTEGER,
+        price REAL,
+        status TEXT,
+        notes TEXT,
+        created_at TEXT,
+        is_monthly_service INTEGER
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_archive_scheduled ON appointments (scheduled_at);",
+    "CREATE INDEX IF NOT EXISTS idx_archive_client_scheduled ON appointments (client_id, scheduled_at);",
+)
+
+
+def _escribir_archivo(path, filas):
+    # Conexión propia al archivo: queda guardado (commit) antes de que se
+    # borre nada de la base. Devuelve (servicios, primer y último scheduled_at).
+    conn = sqlite3.connect(path, factory=_Conexion)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute(f"PRAGMA synchronous={SYNCHRONOUS};")
+        conn.execute("BEGIN IMMEDIATE;")
+        for sql in _ARCHIVE_SCHEMA:
+            conn.execute(sql)
+        # OR REPLACE: repetir una corrida que se cortó no duplica servicios
+        conn.executemany(
+            f"INSERT OR REPLACE INTO appointments ({', '.join(ARCHIVE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(ARCHIVE_COLUMNS))})",
+            filas,
+        )
+        conn.commit()
+        conn.execute("ANALYZE;")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        return conn.execute(
+            "SELECT COUNT(*), MIN(scheduled_at), MAX(scheduled_at) FROM appointments"
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+@instrumented
+def archive_appointments(before, vacuum=True):
+    """Mueve a su archivo por año los servicios cerrados (ARCHIVE_STATUSES)
+    de antes de `before`. Devuelve {año: servicios movidos}.
+
+    La base queda bloqueada para escribir (BEGIN IMMEDIATE) desde que se
+    leen los servicios hasta que se borran. Cada archivo se guarda antes del
+    borrado; si algo se corta entre los dos pasos, los servicios quedan en
+    ambos lados y volver a correrlo lo deja bien. Al final, maintain_db().
+    """
+    estados = ", ".join("?" * len(ARCHIVE_STATUSES))
+    where = f" WHERE scheduled_at < ? AND status IN ({estados})"
+    params = [to_minutes(before), *ARCHIVE_STATUSES]
+    carpeta = os.path.dirname(os.path.abspath(DB_NAME))
+    ahora = datetime.now().isoformat(timespec="seconds")
+    movidos = {}
+
+    # Conexión aparte, sin archivos adjuntos: BEGIN IMMEDIATE bloquea también
+    # las bases adjuntas y no dejaría escribir en ellas desde _escribir_archivo
+    init_db()
+    conn = sqlite3.connect(os.path.abspath(DB_NAME), factory=_Conexion)
+    try:
+        conn.execute("BEGIN IMMEDIATE;")
+        filas = conn.execute(
+            f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM appointments_v{where} ORDER BY scheduled_at, id",
+            params,
+        ).fetchall()
+        i = ARCHIVE_COLUMNS.index("scheduled_at")
+        for anio, grupo in itertools.groupby(filas, key=lambda f: from_minutes(f[i]).year):
+            grupo = list(grupo)
+            archivo = archive_file(anio)
+            total, primero, ultimo = _escribir_archivo(os.path.join(carpeta, archivo), grupo)
+            conn.execute("""
+                INSERT OR REPLACE INTO archives (year, file, first_at, last_at, rows, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (anio, archivo, primero, ultimo, total, ahora))
+            movidos[anio] = len(grupo)
+
+        # Lo que suman en appointment_totals se queda ahí: el trigger de
+        # borrado no corre y archived_totals lo anota para rebuild_totals
+        conn.execute(f"""
+            INSERT INTO archived_totals ({_TOTALS_COLS})
+            SELECT scheduled_at / 1440, COALESCE(status, ''), COALESCE(zone, ''),
+                   COALESCE(pest_type, ''), COUNT(*), SUM({_CENTAVOS_SQL.format("")})
+            FROM appointments_v{where}
+            GROUP BY 1, 2, 3, 4
+            {_TOTALS_UPSERT};
+        """, params)
+        # En change_log quedan como 'archive', no como 'delete'
+        conn.execute(
+            "INSERT INTO change_log (table_name, op, row_id) "
+            "SELECT 'appointments', 'archive', id FROM appointments" + where + " ORDER BY id",
+            params,
+        )
+        with triggers_paused(conn, "appointment_totals_ad", "appointments_log_ad"):
+            conn.execute("DELETE FROM appointments" + where, params)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if movidos:
+        invalidate_cache()
+        if vacuum:
+            maintain_db()
+    return movidos
+
+
+@instrumented
+def maintain_db(vacuum=True):
+    """VACUUM (si vacuum) y ANALYZE de la base; los archivos se analizan al escribirlos."""
+    with get_conn() as conn:
+        if vacuum:
+            conn.execute("VACUUM main;")
+        conn.execute("ANALYZE main;")
+        # En WAL el archivo solo se achica al pasar el WAL a la base
+        conn.execute("PRAGMA main.wal_checkpoint(TRUNCATE);")
+
+
+# ---------- SERVICIOS ----------
+
+STATUSES = ("Pendiente", "Confirmado", "Realizado", "Cobrado")
+# Los que todavía hay que atender: los que entran en la ruta del día
+OPEN_STATUSES = ("Pendiente", "Confirmado")
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+
+def _como_fecha(valor):
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def _como_hora(valor):
+    if isinstance(valor, str):
+        horas, minutos = valor[:5].split(":")
+        return time(int(horas), int(minutos))
+    return valor
+
+
+def to_minutes(fecha, hora=None):
+    """Fecha (y hora) → minutos desde 1970, el valor de scheduled_at.
+
+    Acepta objetos date/time o texto "YYYY-MM-DD" / "HH:MM".
+    """
+    minutos = (_como_fecha(fecha).toordinal() - _EPOCH_ORDINAL) * 1440
+    hora = _como_hora(hora)
+    if hora is not None:
+        minutos += hora.hour * 60 + hora.minute
+    return minutos
+
+
+def from_minutes(minutos):
+    return _EPOCH + timedelta(minutes=minutos)
+
+
+class AppointmentRow(dict):
+    """Fila de servicio con la fecha y la hora ya convertidas.
+
+    Además de las columnas trae "fecha" (date) y "hora" (time), calculadas
+    una sola vez aquí a partir de scheduled_at.
+    """
+
+    __slots__ = ()
+
+
+def _fila_servicio(cursor, row):
+    fila = AppointmentRow(zip([d[0] for d in cursor.description], row))
+    minutos = fila.get("scheduled_at")
+    if minutos is not None:
+        momento = from_minutes(minutos)
+        fila["fecha"] = momento.date()
+        fila["hora"] = momento.time()
+    else:
+        fila["fecha"] = fila["hora"] = None
+    return fila
+
+
+def _servicios(conn, query, params=()):
+    cur = conn.cursor()
+    cur.row_factory = _fila_servicio
+    return cur.execute(query, params).fetchall()
+
+
+def _servicio(conn, query, params=()):
+    cur = conn.cursor()
+    cur.row_factory = _fila_servicio
+    return cur.execute(query, params).fetchone()
+
+
+def _datos_propios(conn, client_id, address, zone, phone):
+    # Con cliente asociado solo guardamos lo que difiere de sus datos;
+    # lo demás lo hereda el servicio a través de appointments_v.
+    if client_id is None:
+        return address, zone, phone
+    c = conn.execute("SELECT address, zone, phone FROM clients WHERE id = ?", (client_id,)).fetchone()
+    if c is None:
+        return address, zone, phone
+    return (
+        None if address == c["address"] else address,
+        None if zone == c["zone"] else zone,
+        None if phone == c["phone"] else phone,
+    )
+
+
+@instrumented
+def add_appointment(client_name, service_type, pest_type,
+                    address, zone, phone, fecha, hora,
+                    price, status, notes, is_monthly_service=False,
+                    client_id=None, allow_overlap=False, tx=None):
+    """Agenda un servicio y devuelve su id. Lanza ScheduleConflict si en algún
+    momento de su duración ya hay TECHNICIANS servicios a la vez, salvo con
+    allow_overlap=True."""
+    created_at = datetime.now().isoformat(timespec="seconds")
+    scheduled_at = to_minutes(fecha, hora)
+    momento = from_minutes(scheduled_at)
+
+    with _escritura(tx) as conn:
+        if not allow_overlap:
+            _comprobar_choques(conn, scheduled_at)
+        address, zone, phone = _datos_propios(conn, client_id, address, zone, phone)
+        cur = conn.execute("""
+            INSERT INTO appointments (
+                client_id, client_name, service_type, pest_type,
+                address, zone, phone,
+                date, time, scheduled_at, price,
+                status, notes, created_at, is_monthly_service
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            client_id,
+            client_name,
+            service_type,
+            pest_type,
+            address,
+            zone,
+            phone,
+            momento.strftime("%Y-%m-%d"),
+            momento.strftime("%H:%M"),
+            scheduled_at,
+            price,
+            status,
+            notes,
+            created_at,
+            1 if is_monthly_service else 0,
+        ))
+        return cur.lastrowid
+
+
+def _appointments_where(date_from=None, date_to=None, status=None):
+    where = " WHERE 1=1"
+    params = []
+
+    # Rango de días completo: [date_from 00:00, date_to + 1 día 00:00)
+    if date_from:
+        where += " AND scheduled_at >= ?"
+        params.append(to_minutes(date_from))
+    if date_to:
+        where += " AND scheduled_at < ?"
+        params.append(to_minutes(_como_fecha(date_to) + timedelta(days=1)))
+    if status and status != "Todos":
+        where += " AND status = ?"
+        params.append(status)
+
+    return where, params
+
+
+_HOT = ("appointments_v",)
+
+
+def _appointments_query(date_from=None, date_to=None, status=None, tablas=_HOT):
+    where, params = _appointments_where(date_from, date_to, status)
+    query, params = _union(tablas, where, params)
+    return query + " ORDER BY scheduled_at, id", params
+
+
+def _appointments_page_query(date_from=None, date_to=None, status=None,
+                             after=None, page_size=PAGE_SIZE, tablas=_HOT):
+    where, params = _appointments_where(date_from, date_to, status)
+    if after is not None:
+        # Keyset: seguimos justo después de la última fila de la página
+        # anterior, sin OFFSET, así que cualquier página cuesta lo mismo.
+        where += " AND (scheduled_at, id) > (?, ?)"
+        params += list(after)
+    # Pedimos una fila de más para saber si hay página siguiente
+    query, params = _union(tablas, where, params)
+    return query + " ORDER BY scheduled_at, id LIMIT ?", params + [page_size + 1]
+
+
+@contextmanager
+def _conn_servicios(date_from=None, date_to=None, status=None):
+    # Conexión y tablas a consultar: la base caliente y los archivos del rango
+    archivos = _archivos_del_rango(date_from, date_to, status)
+    with get_conn() as conn:
+        yield conn, _HOT + tuple(_adjuntar(conn, archivos))
+
+
+@cached
+@instrumented
+def get_appointments(date_from=None, date_to=None, status=None):
+    """Servicios del rango, en orden. Los archivados solo entran si date_from
+    llega a algún año archivado."""
+    with _conn_servicios(date_from, date_to, status) as (conn, tablas):
+        query, params = _appointments_query(date_from, date_to, status, tablas)
+        return _servicios(conn, query, params)
+
+
+@cached
+@instrumented
+def get_appointments_page(date_from=None, date_to=None, status=None,
+                          after=None, page_size=PAGE_SIZE):
+    """Una página de servicios y el cursor de la siguiente (None si es la última).
+
+    `after` es el cursor (scheduled_at, id) devuelto por la página anterior.
+    """
+    with _conn_servicios(date_from, date_to, status) as (conn, tablas):
+        query, params = _appointments_page_query(date_from, date_to, status, after, page_size, tablas)
+        rows = _servicios(conn, query, params)
+
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    ultima = rows[-1]
+    return rows, (ultima["scheduled_at"], ultima["id"])
+
+
+@cached
+@instrumented
+def get_appointment_by_id(appointment_id):
+    """El servicio con ese id, aunque esté archivado (None si no existe)."""
+    # Antes de tomar la conexión: get_archives() toma otra del pool y, con
+    # todas ocupadas, esperaría a que se soltara esta
+    archivos = get_archives()
+    with get_conn() as conn:
+        fila = _servicio(conn, "SELECT * FROM appointments_v WHERE id = ?", (appointment_id,))
+        if fila is not None or not archivos:
+            return fila
+        query, params = _union(_adjuntar(conn, archivos), " WHERE id = ?", [appointment_id])
+        return _servicio(conn, query, params)
+
+
+def iter_appointments(include_archive=True):
+    """Todos los servicios, sin cargarlos en memoria (para exportar).
+
+    Con include_archive van primero los de cada archivo por año y luego los
+    de la base; cada parte en orden de id.
+    """
+    archivos = get_archives() if include_archive else []
+    with get_conn() as conn:
+        for tabla in tuple(_adjuntar(conn, archivos)) + _HOT:
+            yield from conn.execute(f"SELECT * FROM {tabla} ORDER BY id;")
+
+
+CLIENT_APPOINTMENTS_QUERY = (
+    "SELECT * FROM appointments_v WHERE client_id = ? ORDER BY scheduled_at DESC"
+)
+
+
+@cached
+@instrumented
+def get_client_appointments(client_id, limit=None):
+    """Historial de servicios de un cliente, del más reciente al más antiguo
+    (con los archivados)."""
+    archivos = get_archives()
+    with get_conn() as conn:
+        if archivos:
+            tablas = _HOT + tuple(_adjuntar(conn, archivos))
+            query, params = _union(tablas, " WHERE client_id = ?", [client_id])
+            query += " ORDER BY scheduled_at DESC"
+        else:
+            query, params = CLIENT_APPOINTMENTS_QUERY, [client_id]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return _servicios(conn, query, params)
+
+
+def appointment_label(r):
+    """Texto con el que se muestra un servicio en los selectores."""
+    return f"{r['client_name']} ({r['date']} {r['time']})"
+
+
+@cached
+@instrumented
+def count_appointments(date_from=None, date_to=None, status=None):
+    """Total de servicios con esos filtros (se resuelve solo con el índice)."""
+    where, params = _appointments_where(date_from, date_to, status)
+    with _conn_servicios(date_from, date_to, status) as (conn, tablas):
+        tablas = ("appointments",) + tablas[1:]
+        query = " + ".join(f"(SELECT COUNT(*) FROM {t}{where})" for t in tablas)
+        return conn.execute("SELECT " + query, params * len(tablas)).fetchone()[0]
+
+
+MONTHLY_QUERY = "SELECT * FROM appointments_v WHERE is_monthly_service = 1 ORDER BY scheduled_at"
+# INDEXED BY: con pocos mensuales y ANALYZE, SQLite prefería recorrer la tabla
+COUNT_MONTHLY_QUERY = (
+    "SELECT COUNT(*) FROM appointments INDEXED BY idx_appointments_monthly_scheduled"
+    " WHERE is_monthly_service = 1"
+)
+
+
+@cached
+@instrumented
+def get_monthly_appointments(limit=None, offset=0):
+    """Servicios marcados como mensuales, filtrados y paginados en SQL."""
+    query = MONTHLY_QUERY
+    params = []
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    with get_conn() as conn:
+        return _servicios(conn, query, params)
+
+
+@cached
+@instrumented
+def count_monthly_appointments():
+    with get_conn() as conn:
+        return conn.execute(COUNT_MONTHLY_QUERY).fetchone()[0]
+
+
+@instrumented
+def update_status(appointment_id, new_status, tx=None):
+    """Cambia el estado de un servicio; devuelve 0 si el id no existe.
+
+    Lanza ArchivedAppointments si el servicio está archivado.
+    """
+    with _escritura(tx) as conn:
+        actualizados = conn.execute(
+            "UPDATE appointments SET status = ? WHERE id = ?",
+            (new_status, appointment_id),
+        ).rowcount
+        if not actualizados:
+            _comprobar_archivados(conn, [appointment_id])
+        return actualizados
+
+
+@instrumented
+def update_statuses(appointment_ids, new_status, tx=None):
+    """Pone el mismo estado a varios servicios con un solo executemany.
+
+    Todo en una transacción (la de tx o una propia). Devuelve cuántos
+    servicios se actualizaron: menos que los ids si alguno no existe. Si
+    alguno está archivado lanza ArchivedAppointments y no se guarda nada.
+    """
+    appointment_ids = list(appointment_ids)
+    with _escritura(tx) as conn:
+        actualizados = conn.executemany(
+            "UPDATE appointments SET status = ? WHERE id = ?",
+            [(new_status, i) for i in appointment_ids],
+        ).rowcount
+        if actualizados < len(appointment_ids):
+            _comprobar_archivados(conn, appointment_ids)
+        return actualizados
+
+
+# Columnas que se pueden cambiar sueltas (update_appointment_fields); fecha
+# y hora van por update_appointment_full, que revisa los choques
+EDITABLE_APPOINTMENT_COLUMNS = (
+    "client_name", "pest_type", "address", "zone", "phone", "price", "status", "notes",
+)
+# NOT NULL en appointments: no se pueden dejar vacías al editar
+REQUIRED_APPOINTMENT_COLUMNS = ("client_name", "date")
+# Lo que coincide con el cliente se guarda en NULL, como en _datos_propios
+_ASIGNACION_HEREDADA = "{0} = NULLIF(?, (SELECT {0} FROM clients WHERE id = appointments.client_id))"
+
+
+@instrumented
+def update_appointment_fields(cambios, tx=None):
+    """Guarda solo lo que cambió: {appointment_id: {columna: valor}}.
+
+    Las filas a las que les cambiaron las mismas columnas van juntas en un
+    executemany, todas en una transacción. Devuelve cuántos servicios se
+    actualizaron. Lanza ValueError (sin guardar nada) si alguna columna de
+    REQUIRED_APPOINTMENT_COLUMNS queda vacía.
+    """
+    grupos = {}
+    for appointment_id, valores in cambios.items():
+        desconocidas = set(valores) - set(EDITABLE_APPOINTMENT_COLUMNS)
+        if desconocidas:
+            raise ValueError(f"No se pueden editar: {', '.join(sorted(desconocidas))}")
+        vacias = [
+            c for c in REQUIRED_APPOINTMENT_COLUMNS
+            if c in valores and (valores[c] is None or not str(valores[c]).strip())
+        ]
+        if vacias:
+            raise ValueError(
+                f"El servicio {appointment_id} no puede quedar sin "
+                + ", ".join(APPOINTMENT_COLUMNS.get(c, c) for c in vacias)
+            )
+        if valores:
+            columnas = tuple(sorted(valores))
+            grupos.setdefault(columnas, []).append(
+                tuple(valores[c] for c in columnas) + (appointment_id,)
+            )
+    if not grupos:
+        return 0
+
+    actualizados = 0
+    with _escritura(tx) as conn:
+        for columnas, filas in grupos.items():
+            asignaciones = ", ".join(
+                _ASIGNACION_HEREDADA.format(c) if c in ("address", "zone", "phone") else f"{c} = ?"
+                for c in columnas
+            )
+            actualizados += conn.executemany(
+                f"UPDATE appointments SET {asignaciones} WHERE id = ?", filas
+            ).rowcount
+        if actualizados < sum(len(filas) for filas in grupos.values()):
+            _comprobar_archivados(conn, [f[-1] for filas in grupos.values() for f in filas])
+    return actualizados
+
+
+@instrumented
+def delete_appointment(appointment_id, tx=None):
+    """Borra un servicio; lanza ArchivedAppointments si está archivado."""
+    with _escritura(tx) as conn:
+        if not conn.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,)).rowcount:
+            _comprobar_archivados(conn, [appointment_id])
+
+
+@instrumented
+def update_appointment_full(appointment_id, client_name, service_type, pest_type,
+                            address, zone, phone, fecha, hora,
+                            price, status, notes, is_monthly_service,
+                            allow_overlap=False, tx=None):
+    """Actualiza todos los datos principales de un servicio.
+
+    Los choques solo se revisan si cambia la fecha u hora: un servicio que
+    ya estaba empalmado (importado, mensual) se puede editar igual. Lanza
+    ArchivedAppointments si el servicio está archivado.
+    """
+    scheduled_at = to_minutes(fecha, hora)
+    momento = from_minutes(scheduled_at)
+
+    with _escritura(tx) as conn:
+        fila = conn.execute(
+            "SELECT client_id, scheduled_at FROM appointments WHERE id = ?", (appointment_id,)
+        ).fetchone()
+        if fila is None:
+            _comprobar_archivados(conn, [appointment_id])
+        else:
+            if not allow_overlap and fila["scheduled_at"] != scheduled_at:
+                _comprobar_choques(conn, scheduled_at, exclude_id=appointment_id)
+            address, zone, phone = _datos_propios(conn, fila["client_id"], address, zone, phone)
+        conn.execute("""
+            UPDATE appointments
+            SET client_name = ?,
+                service_type = ?,
+                pest_type = ?,
+                address = ?,
+                zone = ?,
+                phone = ?,
+                date = ?,
+                time = ?,
+                scheduled_at = ?,
+                price = ?,
+                status = ?,
+                notes = ?,
+                is_monthly_service = ?
+            WHERE id = ?
+        """, (
+            client_name,
+            service_type,
+            pest_type,
+            address,
+            zone,
+            phone,
+            momento.strftime("%Y-%m-%d"),
+            momento.strftime("%H:%M"),
+            scheduled_at,
+            price,
+            status,
+            notes,
+            1 if is_monthly_service else 0,
+            appointment_id,
+        ))
+
+
+# ---------- CHOQUES Y HUECOS EN LA AGENDA ----------
+
+class ScheduleConflict(ValueError):
+    """El servicio se empalma con otros ya agendados (ids en .conflicts)."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(f"Se empalma con los servicios {', '.join(map(str, conflicts))}")
+
+
+# Todos los servicios duran SERVICE_MINUTES: dos se empalman si sus inicios
+# están a menos de esa distancia, así que basta con un rango de inicios. Es
+# choque cuando, en algún momento del servicio nuevo, los que corren a la
+# vez ya ocupan a los TECHNICIANS técnicos (_max_simultaneos).
+CONFLICTS_QUERY = (
+    "SELECT id, scheduled_at FROM appointments"
+    " WHERE scheduled_at > ? AND scheduled_at < ? AND id <> ?"
+    " ORDER BY scheduled_at"
+)
+DAY_INDEX_QUERY = (
+    "SELECT id, scheduled_at FROM appointments"
+    " WHERE scheduled_at >= ? AND scheduled_at < ? ORDER BY scheduled_at"
+)
+
+
+def _max_simultaneos(starts, scheduled_at, duration=SERVICE_MINUTES):
+    # Barrido sobre los inicios ordenados de los que se empalman con
+    # [scheduled_at, scheduled_at + duration): cuántos corren a la vez como
+    # máximo. Solo cambia al empezar alguno, así que basta mirar el inicio
+    # de la ventana y cada inicio dentro de ella; en el instante x corren
+    # los que empezaron en (x - duration, x].
+    momentos = [scheduled_at] + [s for s in starts if scheduled_at < s < scheduled_at + duration]
+    return max(
+        bisect.bisect_right(starts, x) - bisect.bisect_right(starts, x - duration) for x in momentos
+    )
+
+
+def _comprobar_choques(conn, scheduled_at, duration=SERVICE_MINUTES, exclude_id=None):
+    # En la conexión de la escritura: ve también lo que la transacción
+    # lleva agendado y aún no se ha guardado.
+    filas = conn.execute(
+        CONFLICTS_QUERY, (scheduled_at - duration, scheduled_at + duration, exclude_id or 0)
+    ).fetchall()
+    if _max_simultaneos([r[1] for r in filas], scheduled_at, duration) >= TECHNICIANS:
+        raise ScheduleConflict([r[0] for r in filas])
+
+
+class DayIndex:
+    """Inicios (scheduled_at) de los servicios de un día en un arreglo ordenado.
+
+    Las consultas son búsquedas binarias: O(log n) por comprobación.
+    """
+
+    def __init__(self, fecha, rows):
+        self.fecha = _como_fecha(fecha)
+        self.inicio = to_minutes(self.fecha)
+        self.starts = [r[1] for r in rows]
+        self.ids = [r[0] for r in rows]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlapping(self, scheduled_at, duration=SERVICE_MINUTES, exclude_id=None):
+        """Ids de los servicios que se empalman con uno que empieza en scheduled_at."""
+        desde = bisect.bisect_right(self.starts, scheduled_at - duration)
+        hasta = bisect.bisect_left(self.starts, scheduled_at + duration)
+        return [i for i in self.ids[desde:hasta] if i != exclude_id]
+
+    def concurrent(self, scheduled_at, duration=SERVICE_MINUTES, exclude_id=None):
+        """Máximo de servicios a la vez durante [scheduled_at, scheduled_at + duration)."""
+        desde = bisect.bisect_right(self.starts, scheduled_at - duration)
+        hasta = bisect.bisect_left(self.starts, scheduled_at + duration)
+        inicios = [
+            s for s, i in zip(self.starts[desde:hasta], self.ids[desde:hasta]) if i != exclude_id
+        ]
+        return _max_simultaneos(inicios, scheduled_at, duration)
+
+    def free_slots(self, desde=None, duration=SERVICE_MINUTES,
+                   work_start=WORK_START, work_end=WORK_END, step=SLOT_STEP):
+        """Genera los inicios del día (minutos) con un técnico libre, de `duration` en `duration`."""
+        primero = self.inicio + to_minutes(_EPOCH, work_start)
+        ultimo = self.inicio + to_minutes(_EPOCH, work_end) - duration
+        candidato = max(primero, desde or primero)
+        while True:
+            # Redondeo hacia arriba al siguiente múltiplo de `step`
+            candidato = -(-candidato // step) * step
+            if candidato > ultimo:
+                return
+            i = bisect.bisect_right(self.starts, candidato - duration)
+            j = bisect.bisect_left(self.starts, candidato + duration)
+            if _max_simultaneos(self.starts[i:j], candidato, duration) >= TECHNICIANS:
+                # Hasta que acabe el primero no baja el máximo: antes no hay hueco
+                candidato = self.starts[i] + duration
+                continue
+            yield candidato
+            candidato += duration
+
+
+@cached
+@instrumented
+def get_day_index(fecha):
+    """DayIndex de `fecha`; se reconstruye solo cuando hay escrituras."""
+    dia = to_minutes(fecha)
+    with get_conn() as conn:
+        return DayIndex(fecha, conn.execute(DAY_INDEX_QUERY, (dia, dia + 1440)).fetchall())
+
+
+@instrumented
+def find_conflicts(fecha, hora, duration=SERVICE_MINUTES, exclude_id=None):
+    """Ids de los servicios que chocarían con uno nuevo en esa fecha y hora.
+
+    Vacío mientras quede un técnico libre en toda su duración (menos de
+    TECHNICIANS servicios a la vez).
+    """
+    indice = get_day_index(str(_como_fecha(fecha)))
+    scheduled_at = to_minutes(fecha, hora)
+    if indice.concurrent(scheduled_at, duration, exclude_id) < TECHNICIANS:
+        return []
+    return indice.overlapping(scheduled_at, duration, exclude_id)
+
+
+@instrumented
+def next_free_slots(fecha, hora=None, n=5, duration=SERVICE_MINUTES, max_days=30):
+    """Los siguientes `n` huecos libres (datetime) a partir de fecha/hora."""
+    fecha = _como_fecha(fecha)
+    desde = to_minutes(fecha, hora) if hora is not None else None
+    huecos = []
+    for dias in range(max_days):
+        dia = fecha + timedelta(days=dias)
+        for inicio in get_day_index(str(dia)).free_slots(desde, duration):
+            huecos.append(from_minutes(inicio))
+            if len(huecos) == n:
+                return huecos
+        desde = None
+    return huecos
+
+
+# ---------- TOTALES (RESUMEN DE INGRESOS) ----------
+
+TOTALS_GROUPS = ("status", "zone", "pest_type")
+# Clave de cada periodo a partir de `day` (días desde 1970)
+_PERIODOS_SQL = {
+    "day": "date(day * 86400, 'unixepoch')",
+    "week": "date(day * 86400, 'unixepoch', '-6 days', 'weekday 1')",
+    "month": "strftime('%Y-%m', day * 86400, 'unixepoch')",
+}
+
+
+class TotalsMismatchError(AssertionError):
+    """appointment_totals no coincide con lo que sale de recalcular."""
+
+
+def _dia(fecha):
+    return to_minutes(fecha) // 1440
+
+
+def _totals_query(date_from, date_to, period, group_by):
+    columnas = ", ".join(("period",) + group_by)
+    where, params = " WHERE 1=1", []
+    if date_from:
+        where += " AND day >= ?"
+        params.append(_dia(date_from))
+    if date_to:
+        where += " AND day <= ?"
+        params.append(_dia(date_to))
+    return (
+        f"SELECT {_PERIODOS_SQL[period]} AS period"
+        + "".join(f", {c}" for c in group_by)
+        + ", SUM(n) AS n, SUM(total_cents) AS total_cents FROM appointment_totals"
+        + where
+        + f" GROUP BY {columnas} ORDER BY {columnas}"
+    ), params
+
+
+@cached
+@instrumented
+def get_totals(date_from=None, date_to=None, period="day", group_by=("status",)):
+    """Servicios e importe por periodo y por las columnas de group_by.
+
+    Lee solo appointment_totals: el costo depende del número de días y
+    combinaciones, no del de servicios. Devuelve dicts con "period",
+    las columnas agrupadas, "n" y "total".
+    """
+    if period not in _PERIODOS_SQL:
+        raise ValueError(f"period desconocido: {period!r}")
+    group_by = tuple(group_by)
+    desconocidas = set(group_by) - set(TOTALS_GROUPS)
+    if desconocidas:
+        raise ValueError(f"No se puede agrupar por: {', '.join(sorted(desconocidas))}")
+
+    query, params = _totals_query(date_from, date_to, period, group_by)
+    with get_conn() as conn:
+        filas = conn.execute(query, params).fetchall()
+    return [
+        dict(zip(r.keys()[:-1], r[:-1]), total=r["total_cents"] / 100)
+        for r in filas
+    ]
+
+
+@instrumented
+def rebuild_totals(tx=None):
+    """Recalcula appointment_totals desde cero."""
+    with _escritura(tx) as conn:
+        conn.execute("DELETE FROM appointment_totals;")
+        conn.execute(_TOTALS_REBUILD)
+
+
+@instrumented
+def diff_totals(conn=None):
+    """Diferencias entre appointment_totals y un recálculo completo.
+
+    Devuelve [(clave, guardado, esperado)], con (n, total_cents) o None.
+    """
+    if conn is None:
+        with get_conn() as conn:
+            return diff_totals(conn)
+
+    guardado = {
+        tuple(r[:4]): (r[4], r[5])
+        for r in conn.execute(f"SELECT {_TOTALS_COLS} FROM appointment_totals")
+    }
+    # El mismo SELECT que usa la reconstrucción, sin escribir nada
+    esperado = {tuple(r[:4]): (r[4], r[5]) for r in conn.execute(_TOTALS_SELECT)}
+    return [
+        (clave, guardado.get(clave), esperado.get(clave))
+        for clave in sorted(guardado.keys() | esperado.keys())
+        if guardado.get(clave) != esperado.get(clave)
+    ]
+
+
+@instrumented
+def check_totals(conn=None):
+    """Lanza TotalsMismatchError si el resumen no cuadra con los servicios."""
+    diferencias = diff_totals(conn)
+    if diferencias:
+        raise TotalsMismatchError(
+            f"{len(diferencias)} diferencias en appointment_totals, p. ej.: "
+            + "; ".join(f"{k}: {g} ≠ {e}" for k, g, e in diferencias[:5])
+        )
+
+
+# ---------- BÚSQUEDA DE TEXTO ----------
+
+SEARCH_LIMIT = 10
+
+
+def fts_query(texto):
+    """Convierte lo que escribe el usuario en una consulta FTS5 por prefijos.
+
+    Cada palabra se busca como prefijo y todas deben aparecer:
+    "fumig centro" → "fumig"* "centro"*
+    """
+    palabras = re.findall(r"\w+", texto or "")
+    return " ".join(f'"{p}"*' for p in palabras)
+
+
+# Pesos bm25 por columna: el nombre pesa más que las notas
+_CLIENTS_SEARCH = """
+    SELECT c.* FROM clients_fts f JOIN clients c ON c.id = f.rowid
+    WHERE clients_fts MATCH ?
+    ORDER BY bm25(clients_fts, 10.0, 10.0, 3.0, 3.0, 5.0, 1.0)
+    LIMIT ?
+"""
+
+_APPOINTMENTS_SEARCH = """
+    SELECT a.* FROM appointments_fts f JOIN appointments_v a ON a.id = f.rowid
+    WHERE appointments_fts MATCH ?
+    ORDER BY bm25(appointments_fts, 10.0, 1.0, 5.0, 3.0, 3.0, 5.0, 1.0), a.scheduled_at DESC
+    LIMIT ?
+"""
+
+
+@cached
+@instrumented
+def search_clients(texto, limit=SEARCH_LIMIT):
+    """Los `limit` clientes que mejor coinciden con el texto (sin acentos, por prefijo)."""
+    consulta = fts_query(texto)
+    if not consulta:
+        return []
+    with get_conn() as conn:
+        return conn.execute(_CLIENTS_SEARCH, (consulta, limit)).fetchall()
+
+
+@cached
+@instrumented
+def search_appointments(texto, limit=SEARCH_LIMIT):
+    """Servicios que coinciden por cliente, dirección, zona, plaga o notas."""
+    consulta = fts_query(texto)
+    if not consulta:
+        return []
+    with get_conn() as conn:
+        return _servicios(conn, _APPOINTMENTS_SEARCH, (consulta, limit))
+
+
+# ---------- UBICACIONES ----------
+
+GEOCODE_KINDS = ("address", "zone")
+
+
+def address_key(texto):
+    """Clave de búsqueda de una dirección o zona en geocodes."""
+    return _clave_nombre(texto)
+
+
+@instrumented
+def set_geocode(texto, lat, lon, kind="address", tx=None):
+    """Guarda (o reemplaza) las coordenadas de una dirección o zona."""
+    if kind not in GEOCODE_KINDS:
+        raise ValueError(f"kind desconocido: {kind!r}")
+    with _escritura(tx) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO geocodes (kind, key, lat, lon) VALUES (?, ?, ?, ?)",
+            (kind, address_key(texto), lat, lon),
+        )
+
+
+@cached
+@instrumented
+def get_geocodes():
+    """Toda la tabla local como {(kind, key): (lat, lon)}."""
+    with get_conn() as conn:
+        return {
+            (kind, key): (lat, lon)
+            for kind, key, lat, lon in conn.execute("SELECT kind, key, lat, lon FROM geocodes")
+        }
+
+
+# ---------- ÍNDICES EN MEMORIA ----------
+
+def phone_digits(phone):
+    """Teléfono solo con dígitos, para comparar "81 1234-5678" con "8112345678"."""
+    return "".join(ch for ch in (phone or "") if ch.isdigit())
+
+
+class RecordIndex:
+    """Búsquedas O(1) sobre una lista de filas: id → fila y etiqueta → id."""
+
+    def __init__(self, rows, label):
+        self.rows = rows
+        self.by_id = {r["id"]: r for r in rows}
+        self.labels = [label(r) for r in rows]
+        self.id_by_label = {etiqueta: r["id"] for etiqueta, r in zip(self.labels, rows)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, record_id):
+        return self.by_id.get(record_id)
+
+    def by_label(self, etiqueta):
+        record_id = self.id_by_label.get(etiqueta)
+        return None if record_id is None else self.by_id[record_id]
+
+
+# ---------- TABLAS COLUMNARES (pandas) ----------
+
+# Encabezados en español de las tablas de servicios, en el orden en que se
+# muestran. Es el único lugar donde se define este mapeo.
+APPOINTMENT_COLUMNS = {
+    "id": "ID",
+    "date": "Fecha",
+    "time": "Hora",
+    "client_name": "Cliente/Negocio",
+    "service_type": "Tipo servicio",
+    "pest_type": "Plaga",
+    "zone": "Zona",
+    "address": "Dirección",
+    "phone": "Teléfono",
+    "price": "Precio",
+    "status": "Estado",
+    "notes": "Notas",
+}
+PRICE_PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+def _frame(conn, query, params=(), columns=APPOINTMENT_COLUMNS):
+    # pandas llega con streamlit; se importa aquí para que fx.db (y los
+    # scripts que lo usan) no dependan de él.
+    import pandas as pd
+
+    cur = conn.cursor()
+    cur.row_factory = None  # tuplas: sin sqlite3.Row ni dicts intermedios
+    cur.execute(query, params)
+    nombres = [d[0] for d in cur.description]
+    frame = pd.DataFrame.from_records(cur.fetchall(), columns=nombres)
+    if columns is None:
+        return frame
+    return frame[list(columns)].rename(columns=columns)
+
+
+@cached
+@instrumented
+def get_appointments_page_frame(date_from=None, date_to=None, status=None,
+                                after=None, page_size=PAGE_SIZE):
+    """Como get_appointments_page, pero la página es un DataFrame ya con
+    los encabezados en español (APPOINTMENT_COLUMNS)."""
+    with _conn_servicios(date_from, date_to, status) as (conn, tablas):
+        query, params = _appointments_page_query(date_from, date_to, status, after, page_size, tablas)
+        frame = _frame(conn, query, params, columns=None)
+
+    siguiente = None
+    if len(frame) > page_size:
+        frame = frame.iloc[:page_size]
+        siguiente = (int(frame["scheduled_at"].iat[-1]), int(frame["id"].iat[-1]))
+    return frame[list(APPOINTMENT_COLUMNS)].rename(columns=APPOINTMENT_COLUMNS), siguiente
+
+
+@cached
+@instrumented
+def get_monthly_frame(limit=None, offset=0):
+    """get_monthly_appointments como DataFrame con encabezados en español."""
+    query = MONTHLY_QUERY
+    params = []
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    with get_conn() as conn:
+        return _frame(conn, query, params)
+
+
+@cached
+@instrumented
+def get_appointments_analytics(date_from=None, date_to=None, status=None):
+    """Totales, servicios por zona y percentiles de precio, vectorizados.
+
+    Solo se leen las tres columnas necesarias. Devuelve un dict con
+    "count", "total", "by_status" y "by_zone" (DataFrames) y
+    "price_percentiles" (Series).
+    """
+    where, params = _appointments_where(date_from, date_to, status)
+    with _conn_servicios(date_from, date_to, status) as (conn, tablas):
+        query, params = _union(tablas, where, params, columnas="status, zone, price")
+        frame = _frame(conn, query, params, columns=None)
+
+    precio = frame["price"].astype("float64")
+    por_estado = (
+        frame.assign(price=precio)
+        .groupby("status", sort=True)["price"]
+        .agg(["size", "sum"])
+        .rename(columns={"size": "Servicios", "sum": "Importe ($)"})
+        .rename_axis("Estado")
+    )
+    por_zona = (
+        frame["zone"].fillna("Sin zona")
+        .value_counts()
+        .rename("Servicios")
+        .rename_axis("Zona")
+        .to_frame()
+    )
+    return {
+        "count": len(frame),
+        "total": float(precio.sum()),
+        "by_status": por_estado,
+        "by_zone": por_zona,
+        "price_percentiles": precio.quantile(list(PRICE_PERCENTILES)),
+    }
+
+
+# ---------- REGISTRO DE CAMBIOS ----------
+
+CHANGES_LIMIT = 1000
+# op de cada fila de change_log; 'archive' es un servicio que pasó a su
+# archivo por año (sigue existiendo, ya no en la base caliente)
+CHANGE_OPS = ("insert", "update", "delete", "archive")
+
+
+CHANGES_QUERY = (
+    "SELECT seq, table_name, op, row_id, changed_columns, changed_at "
+    "FROM change_log WHERE seq > ?"
+)
+LAST_CHANGE_QUERY = "SELECT COALESCE(MAX(seq), 0) FROM change_log"
+
+
+def _changes_query(seq, limit, table):
+    query, params = CHANGES_QUERY, [seq]
+    if table is not None:
+        query += " AND table_name = ?"
+        params.append(table)
+    return query + " ORDER BY seq LIMIT ?", params + [limit]
+
+
+@instrumented
+def changes_since(seq=0, limit=CHANGES_LIMIT, table=None):
+    """Cambios con seq mayor que `seq`, del más viejo al más nuevo.
+
+    Cada uno es un dict con seq, table, op, row_id, columns (las que
+    cambiaron, solo en 'update') y changed_at. Para seguir, se vuelve a
+    llamar con el seq del último. No se cachea: cada llamada lee lo nuevo.
+    """
+    query, params = _changes_query(seq, limit, table)
+    with get_conn() as conn:
+        return [
+            {
+                "seq": r[0],
+                "table": r[1],
+                "op": r[2],
+                "row_id": r[3],
+                "columns": tuple(r[4].split(",")) if r[4] else (),
+                "changed_at": r[5],
+            }
+            for r in conn.execute(query, params)
+        ]
+
+
+@instrumented
+def last_change_seq():
+    """El seq del último cambio (0 si no hay). Quien va a leer las tablas
+    completas lo toma antes y después sigue con changes_since desde ahí."""
+    with get_conn() as conn:
+        return conn.execute(LAST_CHANGE_QUERY).fetchone()[0]
+
+
+# ---------- DIAGNÓSTICO ----------
+
+
+class QueryPlanError(AssertionError):
+    """Alguna consulta de la app recorre una tabla completa o la ordena aparte."""
+
+
+def app_queries():
+    """Consultas de lectura que emite la app, con parámetros de ejemplo."""
+    hoy = date.today()
+    rangos = {
+        "Hoy": (str(hoy), str(hoy)),
+        "Próximos 7 días": (str(hoy), str(hoy + timedelta(days=7))),
+        "Todos": (None, None),
+    }
+    consultas = [
+        ("get_clients", CLIENTS_QUERY, []),
+        ("get_client_by_id", "SELECT * FROM clients WHERE id = ?", [1]),
+        ("get_appointment_by_id", "SELECT * FROM appointments_v WHERE id = ?", [1]),
+        ("get_client_appointments", CLIENT_APPOINTMENTS_QUERY + " LIMIT ?", [1, 50]),
+        ("get_monthly_appointments", MONTHLY_QUERY + " LIMIT ? OFFSET ?", [50, 0]),
+        ("count_monthly_appointments", COUNT_MONTHLY_QUERY, []),
+        ("search_clients", _CLIENTS_SEARCH, [fts_query("garcia"), SEARCH_LIMIT]),
+        ("search_appointments", _APPOINTMENTS_SEARCH, [fts_query("garcia"), SEARCH_LIMIT]),
+        ("get_totals[mes, estado]", *_totals_query(hoy.replace(day=1), hoy, "month", ("status",))),
+        ("get_totals[día, zona y estado]", *_totals_query(
+            hoy - timedelta(days=30), hoy, "day", ("zone", "status")
+        )),
+        ("changes_since", *_changes_query(0, CHANGES_LIMIT, None)),
+        ("changes_since[tabla]", *_changes_query(0, CHANGES_LIMIT, "appointments")),
+        ("last_change_seq", LAST_CHANGE_QUERY, []),
+        ("get_day_index", DAY_INDEX_QUERY, [to_minutes(hoy), to_minutes(hoy) + 1440]),
+        ("_comprobar_choques", CONFLICTS_QUERY, [
+            to_minutes(hoy, "09:00") - SERVICE_MINUTES, to_minutes(hoy, "09:00") + SERVICE_MINUTES, 0
+        ]),
+    ]
+    for rango, (desde, hasta) in rangos.items():
+        for estado in ("Todos", "Pendiente"):
+            sql, params = _appointments_query(desde, hasta, estado)
+            consultas.append((f"get_appointments[{rango}, {estado}]", sql, params))
+            sql, params = _appointments_page_query(
+                desde, hasta, estado, after=(to_minutes(hoy, "09:00"), 1)
+            )
+            consultas.append((f"get_appointments_page[{rango}, {estado}]", sql, params))
+    return consultas
+
+
+def explain_query_plans(conn=None):
+    """Devuelve {nombre: [líneas de EXPLAIN QUERY PLAN]} para app_queries()."""
+    if conn is None:
+        with get_conn() as conn:
+            return explain_query_plans(conn)
+
+    planes = {}
+    for nombre, sql, params in app_queries():
+        filas = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        planes[nombre] = [f[3] for f in filas]
+    return planes
+
+
+# Consultas (por nombre de función en app_queries) que ordenan aparte a
+# propósito: ahí se acepta USE TEMP B-TREE, con el motivo al lado. Un SCAN
+# completo no se acepta nunca.
+PLAN_SORTS_ALLOWED = {
+    # bm25 se calcula por coincidencia: no hay índice que dé ese orden, y
+    # solo se ordenan las filas que devolvió el MATCH
+    "search_clients": "orden por relevancia (bm25)",
+    "search_appointments": "orden por relevancia (bm25)",
+    # Agrupa por una expresión de day (semana, mes) y por las columnas que
+    # se pidan: el sort es sobre las filas resumidas del rango, no sobre
+    # los servicios
+    "get_totals": "GROUP BY del periodo sobre appointment_totals",
+}
+
+
+def check_query_plans(conn=None):
+    """Lanza QueryPlanError si alguna consulta degrada a SCAN completo o sort."""
+    malos = {}
+    for nombre, plan in explain_query_plans(conn).items():
+        ordena_permitido = nombre.split("[")[0] in PLAN_SORTS_ALLOWED
+        for detalle in plan:
+            scan_completo = detalle.startswith("SCAN") and "INDEX" not in detalle
+            if scan_completo or ("TEMP B-TREE" in detalle and not ordena_permitido):
+                malos[nombre] = plan
+                break
+    if malos:
+        raise QueryPlanError(
+            "Consultas sin índice: "
+            + "; ".join(f"{n}: {' | '.join(p)}" for n, p in malos.items())
+        )
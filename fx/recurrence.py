@@ -0,0 +1,123 @@
+import calendar
+from datetime import date, datetime, timedelta
+
+from fx import db
+
+# Horizonte por defecto al generar servicios mensuales
+HORIZON_DAYS = 90
+DEFAULT_TIME = "09:00"
+
+EPOCH = date(1970, 1, 1)
+
+
+def monthly_occurrences(monthly_day, start, end):
+    """Fechas del día `monthly_day` de cada mes entre start y end (inclusive).
+
+    En los meses cortos un día 29–31 cae en el último día del mes
+    (31 → 30 de abril, 28/29 de febrero).
+    """
+    fechas = []
+    anio, mes = start.year, start.month
+    while (anio, mes) <= (end.year, end.month):
+        ultimo = calendar.monthrange(anio, mes)[1]
+        fecha = date(anio, mes, min(monthly_day, ultimo))
+        if start <= fecha <= end:
+            fechas.append(fecha)
+        mes += 1
+        if mes > 12:
+            anio, mes = anio + 1, 1
+    return fechas
+
+
+def _reglas(conn):
+    # Clientes mensuales y, de su último servicio mensual, la hora, el precio
+    # y el tipo de servicio que se repiten.
+    return conn.execute("""
+        SELECT
+            c.id, c.name, c.business_name, c.monthly_day,
+            a.time, a.price, a.pest_type, a.service_type, a.notes
+        FROM clients c
+        LEFT JOIN appointments a ON a.id = (
+            SELECT id FROM appointments
+            WHERE client_id = c.id AND is_monthly_service = 1
+            ORDER BY scheduled_at DESC
+            LIMIT 1
+        )
+        WHERE c.is_monthly = 1 AND c.monthly_day BETWEEN 1 AND 31
+    """).fetchall()
+
+
+def _meses_con_servicio(conn, start, end):
+    # (client_id, año, mes) que ya tienen un servicio mensual: no se duplican
+    # aunque se haya movido a otro día del mes.
+    desde = db.to_minutes(start.replace(day=1))
+    hasta = db.to_minutes(end + timedelta(days=1))
+    filas = conn.execute("""
+        SELECT client_id, substr(date, 1, 7) FROM appointments
+        WHERE is_monthly_service = 1 AND client_id IS NOT NULL
+          AND scheduled_at >= ? AND scheduled_at < ?
+    """, (desde, hasta))
+    return {(client_id, mes) for client_id, mes in filas}
+
+
+def plan_monthly_appointments(conn, start, end, status="Pendiente"):
+    """Filas de servicios mensuales que faltan entre start y end (sin insertar)."""
+    existentes = _meses_con_servicio(conn, start, end)
+    created_at = datetime.now().isoformat(timespec="seconds")
+    # Solo hay 31 días posibles: las fechas de cada uno se calculan una vez
+    fechas_por_dia = {
+        dia: [(f, f.isoformat(), db.to_minutes(f)) for f in monthly_occurrences(dia, start, end)]
+        for dia in range(1, 32)
+    }
+    filas = []
+    for r in _reglas(conn):
+        hora = (r["time"] or DEFAULT_TIME)[:5]
+        minuto_del_dia = db.to_minutes(EPOCH, hora)
+        for fecha, fecha_iso, minutos in fechas_por_dia[r["monthly_day"]]:
+            if (r["id"], fecha_iso[:7]) in existentes:
+                continue
+            filas.append((
+                r["id"],
+                r["business_name"] or r["name"],
+                r["service_type"] or ("Negocio" if r["business_name"] else "Casa"),
+                r["pest_type"],
+                fecha_iso,
+                hora,
+                minutos + minuto_del_dia,
+                r["price"],
+                status,
+                r["notes"],
+                created_at,
+            ))
+    return filas
+
+
+@db.instrumented
+def generate_monthly_appointments(start=None, horizon_days=HORIZON_DAYS, status="Pendiente",
+                                  tx=None):
+    """Agenda los servicios de los clientes mensuales para los próximos días.
+
+    Es idempotente: un cliente no recibe un segundo servicio mensual en un
+    mes que ya tiene uno. Todo se inserta con un solo executemany y un solo
+    commit. Devuelve cuántos servicios se crearon.
+    """
+    start = start or date.today()
+    end = start + timedelta(days=horizon_days)
+
+    # La transacción empieza con BEGIN IMMEDIATE: dos generaciones
+    # simultáneas no pueden duplicar
+    with db.transaction(tx) as tx:
+        conn = tx.conn
+        filas = plan_monthly_appointments(conn, start, end, status)
+        with db.fts_paused(conn, "appointments"), db.totals_paused(conn), \
+                db.changes_paused(conn, "appointments"):
+            conn.executemany("""
+                INSERT INTO appointments (
+                    client_id, client_name, service_type, pest_type,
+                    date, time, scheduled_at, price,
+                    status, notes, created_at, is_monthly_service
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            """, filas)
+        tx.writes += len(filas)
+    return len(filas)
@@ -0,0 +1,286 @@
+"""Ruta del día: agrupa los servicios por zona, los reparte entre técnicos
+y ordena las visitas de cada uno respetando la hora agendada.
+
+Las coordenadas salen de la tabla local geocodes (por dirección o por
+zona). Sin coordenadas se usan distancias supuestas: cerca dentro de la
+misma zona y lejos entre zonas distintas.
+"""
+import math
+import time as _time
+from datetime import date, time
+
+from fx import db
+
+DAY_START = "08:00"
+SERVICE_MINUTES = db.SERVICE_MINUTES
+# Margen alrededor de la hora agendada en que se puede llegar
+WINDOW_MINUTES = 60
+SPEED_KMH = 25.0
+SAME_ZONE_KM = 1.5
+UNKNOWN_KM = 6.0
+# Tiempo máximo que se dedica a mejorar las rutas con 2-opt
+TWO_OPT_SECONDS = 0.5
+
+NO_ZONE = "Sin zona"
+EPOCH = date(1970, 1, 1)
+_KM_POR_GRADO = 111.2
+
+
+class Route:
+    """Ruta de un técnico: paradas en orden, kilómetros y llegadas tarde."""
+
+    def __init__(self, technician, stops, km):
+        self.technician = technician
+        self.stops = stops
+        self.km = km
+        self.late = sum(1 for s in stops if s["tarde"])
+
+    def __len__(self):
+        return len(self.stops)
+
+    @property
+    def zones(self):
+        return sorted({s["zona_ruta"] for s in self.stops})
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def _como_time(minutos):
+    minutos = min(int(round(minutos)), 24 * 60 - 1)
+    return time(minutos // 60, minutos % 60)
+
+
+def _coordenadas(rows, geocodes):
+    # Dirección → zona (tabla) → centro de las direcciones conocidas de la zona
+    coords = [
+        geocodes.get(("address", db.address_key(r["address"])))
+        or geocodes.get(("zone", db.address_key(r["zone"])))
+        for r in rows
+    ]
+    sumas = {}
+    for r, c in zip(rows, coords):
+        if c is not None and r["zone"]:
+            s = sumas.setdefault(r["zone"], [0.0, 0.0, 0])
+            s[0] += c[0]
+            s[1] += c[1]
+            s[2] += 1
+    centros = {z: (la / n, lo / n) for z, (la, lo, n) in sumas.items()}
+    return [c or centros.get(r["zone"]) for r, c in zip(rows, coords)], centros
+
+
+def _zonas(rows, coords, centros):
+    # Un servicio sin zona pero con coordenadas va a la zona más cercana
+    zonas = []
+    for r, c in zip(rows, coords):
+        zona = r["zone"]
+        if not zona and c is not None and centros:
+            zona = min(centros, key=lambda z: (centros[z][0] - c[0]) ** 2 + (centros[z][1] - c[1]) ** 2)
+        zonas.append(zona or NO_ZONE)
+    return zonas
+
+
+def _repartir(indices_por_zona, technicians, orden_hora):
+    # Zonas enteras al técnico con menos paradas (de mayor a menor zona).
+    # Si hay técnicos de sobra, las zonas más grandes se parten por horario.
+    grupos = [sorted(ids, key=orden_hora) for ids in indices_por_zona.values()]
+    while grupos and len(grupos) < technicians:
+        grande = max(grupos, key=len)
+        if len(grande) < 2:
+            break
+        grupos.remove(grande)
+        mitad = len(grande) // 2
+        grupos += [grande[:mitad], grande[mitad:]]
+
+    cargas = [[] for _ in range(technicians)]
+    for grupo in sorted(grupos, key=len, reverse=True):
+        min(cargas, key=len).extend(grupo)
+    return cargas
+
+
+class _Planificador:
+    """Ordena las paradas de un técnico (índices sobre las listas del día)."""
+
+    def __init__(self, paradas, coords, zonas, ventanas, inicio_dia, origen):
+        self.paradas = paradas
+        n = len(paradas)
+        # Distancias en km: equirectangular, suficiente dentro de una ciudad
+        xy = []
+        for i in paradas:
+            c = coords[i]
+            if c is None:
+                xy.append(None)
+            else:
+                xy.append((c[1] * _KM_POR_GRADO * math.cos(math.radians(c[0])), c[0] * _KM_POR_GRADO))
+        self.km = [[0.0] * n for _ in range(n)]
+        for a in range(n):
+            fila = self.km[a]
+            pa, za = xy[a], zonas[paradas[a]]
+            for b in range(a + 1, n):
+                pb = xy[b]
+                if pa is not None and pb is not None:
+                    d = math.hypot(pa[0] - pb[0], pa[1] - pb[1])
+                else:
+                    d = SAME_ZONE_KM if za == zonas[paradas[b]] else UNKNOWN_KM
+                fila[b] = d
+                self.km[b][a] = d
+        # Desde el punto de salida (si no hay, la primera visita no cuenta)
+        if origen is None:
+            self.km_origen = [0.0] * n
+        else:
+            ox = origen[1] * _KM_POR_GRADO * math.cos(math.radians(origen[0]))
+            oy = origen[0] * _KM_POR_GRADO
+            self.km_origen = [
+                UNKNOWN_KM if p is None else math.hypot(p[0] - ox, p[1] - oy) for p in xy
+            ]
+        self.abre = [ventanas[i][0] for i in paradas]
+        self.cierra = [ventanas[i][1] for i in paradas]
+        self.inicio_dia = inicio_dia
+        self.min_por_km = 60.0 / SPEED_KMH
+
+    def vecino_mas_cercano(self):
+        """Siguiente parada: la que se alcanza antes (viaje + espera) sin llegar tarde."""
+        n = len(self.paradas)
+        pendientes = set(range(n))
+        orden = []
+        reloj = self.inicio_dia
+        distancias = self.km_origen
+        while pendientes:
+            mejor, mejor_costo = None, None
+            for j in pendientes:
+                llegada = reloj + distancias[j] * self.min_por_km
+                if llegada > self.cierra[j]:
+                    continue
+                costo = max(llegada, self.abre[j]) - reloj
+                if mejor_costo is None or costo < mejor_costo:
+                    mejor, mejor_costo = j, costo
+            if mejor is None:
+                # Ya no se llega a tiempo a ninguna: la que vence antes,
+                # contando lo que cuesta llegar
+                mejor = min(pendientes, key=lambda j: self.cierra[j] + distancias[j] * self.min_por_km)
+            llegada = reloj + distancias[mejor] * self.min_por_km
+            reloj = max(llegada, self.abre[mejor]) + SERVICE_MINUTES
+            distancias = self.km[mejor]
+            pendientes.remove(mejor)
+            orden.append(mejor)
+        return orden
+
+    def horario(self, orden):
+        """Llegada a cada parada y minutos de retraso acumulados."""
+        llegadas = []
+        retraso = 0.0
+        reloj = self.inicio_dia
+        distancias = self.km_origen
+        for j in orden:
+            llegada = reloj + distancias[j] * self.min_por_km
+            llegadas.append(llegada)
+            if llegada > self.cierra[j]:
+                retraso += llegada - self.cierra[j]
+            reloj = max(llegada, self.abre[j]) + SERVICE_MINUTES
+            distancias = self.km[j]
+        return llegadas, retraso
+
+    def dos_opt(self, orden, limite):
+        """Invierte tramos que acortan la ruta sin aumentar el retraso."""
+        km = self.km
+        _, retraso = self.horario(orden)
+        mejora = True
+        while mejora and _time.perf_counter() < limite:
+            mejora = False
+            for i in range(len(orden) - 1):
+                # Distancias desde la parada anterior al tramo; antes de la
+                # primera está el punto de salida. No cambia al invertir el tramo.
+                previa = self.km_origen if i == 0 else km[orden[i - 1]]
+                b = orden[i]
+                for k in range(i + 1, len(orden)):
+                    c = orden[k]
+                    d = orden[k + 1] if k + 1 < len(orden) else None
+                    antes = previa[b] + (km[c][d] if d is not None else 0.0)
+                    despues = previa[c] + (km[b][d] if d is not None else 0.0)
+                    if despues >= antes - 1e-9:
+                        continue
+                    candidato = orden[:i] + orden[i:k + 1][::-1] + orden[k + 1:]
+                    _, retraso_nuevo = self.horario(candidato)
+                    if retraso_nuevo <= retraso:
+                        orden, retraso = candidato, retraso_nuevo
+                        b = orden[i]
+                        mejora = True
+                if _time.perf_counter() >= limite:
+                    break
+        return orden
+
+
+def plan_routes(rows, technicians=1, geocodes=None, start_at=None, day_start=DAY_START):
+    """Reparte y ordena los servicios de un día. Devuelve una Route por técnico.
+
+    `rows` son filas de servicio con "hora" (como las de get_appointments),
+    `geocodes` es el dict de db.get_geocodes() y `start_at` el (lat, lon)
+    de donde salen los técnicos, si se conoce.
+    """
+    technicians = max(1, int(technicians))
+    limite = _time.perf_counter() + TWO_OPT_SECONDS
+    rows = list(rows)
+    coords, centros = _coordenadas(rows, geocodes or {})
+    zonas = _zonas(rows, coords, centros)
+    inicio_dia = db.to_minutes(EPOCH, day_start)
+
+    # Un servicio sin hora (00:00) se puede visitar en cualquier momento
+    ventanas = []
+    for r in rows:
+        agendado = _minutos(r["hora"])
+        if agendado == 0:
+            ventanas.append((inicio_dia, 24 * 60))
+        else:
+            ventanas.append((agendado - WINDOW_MINUTES, agendado + WINDOW_MINUTES))
+
+    por_zona = {}
+    for i, zona in enumerate(zonas):
+        por_zona.setdefault(zona, []).append(i)
+    cargas = _repartir(por_zona, technicians, lambda i: (ventanas[i][0], i))
+
+    rutas = []
+    for tecnico, paradas in enumerate(cargas, start=1):
+        if not paradas:
+            rutas.append(Route(tecnico, [], 0.0))
+            continue
+        plan = _Planificador(paradas, coords, zonas, ventanas, inicio_dia, start_at)
+        orden = plan.vecino_mas_cercano()
+        # El tiempo de mejora se reparte entre los técnicos que faltan
+        restantes = technicians - tecnico + 1
+        ahora = _time.perf_counter()
+        orden = plan.dos_opt(orden, ahora + max(0.0, limite - ahora) / restantes)
+        llegadas, _ = plan.horario(orden)
+
+        stops = []
+        km_total = 0.0
+        anterior = None
+        for n, (j, llegada) in enumerate(zip(orden, llegadas), start=1):
+            tramo = plan.km_origen[j] if anterior is None else plan.km[anterior][j]
+            km_total += tramo
+            anterior = j
+            i = paradas[j]
+            stops.append(dict(
+                rows[i],
+                orden=n,
+                llegada=_como_time(llegada),
+                inicio=_como_time(max(llegada, ventanas[i][0])),
+                tarde=llegada > ventanas[i][1],
+                km_tramo=round(tramo, 2),
+                zona_ruta=zonas[i],
+            ))
+        rutas.append(Route(tecnico, stops, round(km_total, 2)))
+    return rutas
+
+
+@db.instrumented
+def plan_day(fecha, technicians=1, status=None, start_at=None):
+    """Rutas del día `fecha` con los servicios agendados en la base.
+
+    Sin `status` solo entran los abiertos (db.OPEN_STATUSES); con "Todos"
+    también los ya realizados o cobrados.
+    """
+    rows = db.get_appointments(date_from=str(fecha), date_to=str(fecha), status=status)
+    if status is None:
+        rows = [r for r in rows if r["status"] in db.OPEN_STATUSES]
+    return plan_routes(rows, technicians, db.get_geocodes(), start_at)
@@ -0,0 +1,596 @@
+"""Agenda: alta de servicios, servicios agendados y ruta del día."""
+from datetime import date, timedelta, datetime as dt
+
+import streamlit as st
+
+from fx import db, routes
+from paginas.comun import seccion
+
+hoy = date.today()
+
+
+# =========================
+# FORMULARIO CLIENTE + SERVICIO
+# =========================
+@seccion
+def nuevo_servicio():
+    st.subheader("Nuevo servicio / Guardar cliente y agendar")
+
+    # 🔍 Buscar cliente: solo mandamos al navegador los mejores resultados
+    col_bc1, col_bc2 = st.columns(2)
+    with col_bc1:
+        texto_cliente = st.text_input(
+            "Buscar cliente (nombre, negocio, teléfono, zona...)",
+            key="texto_buscar_cliente",
+        )
+    clientes_encontrados = db.RecordIndex(db.search_clients(texto_cliente), db.client_label)
+    with col_bc2:
+        opciones = ["-- Cliente nuevo --"] + clientes_encontrados.labels
+        seleccion = st.selectbox("Cliente", opciones)
+    cliente_sel = clientes_encontrados.by_label(seleccion)
+
+    # Fecha y hora van fuera del formulario para avisar de choques al momento
+    col_fh1, col_fh2 = st.columns(2)
+    with col_fh1:
+        service_date = st.date_input("Fecha del servicio", value=hoy)
+    with col_fh2:
+        service_time = st.time_input("Hora del servicio")
+
+    choques = db.find_conflicts(service_date, service_time)
+    if choques:
+        etiquetas_choques = [db.appointment_label(db.get_appointment_by_id(i)) for i in choques]
+        huecos = db.next_free_slots(service_date, service_time, n=3)
+        st.warning(
+            "⚠️ Se empalma con: " + "; ".join(etiquetas_choques)
+            + ("\n\nHuecos libres: " + ", ".join(h.strftime("%d/%m %H:%M") for h in huecos) if huecos else "")
+        )
+
+    with st.form("form_servicio_cliente", clear_on_submit=True):
+        col1, col2, col3 = st.columns(3)
+
+        # -------- DATOS DEL CLIENTE --------
+        with col1:
+            name = st.text_input(
+                "Nombre de la persona / contacto",
+                value=cliente_sel["name"] if cliente_sel else "",
+            )
+            business_name = st.text_input(
+                "Nombre del negocio",
+                value=cliente_sel["business_name"] if cliente_sel else "",
+            )
+
+        with col2:
+            phone = st.text_input(
+                "Teléfono",
+                value=cliente_sel["phone"] if cliente_sel else "",
+            )
+            zone = st.text_input(
+                "Colonia / zona",
+                value=cliente_sel["zone"] if cliente_sel else "",
+            )
+            address = st.text_input(
+                "Dirección",
+                value=cliente_sel["address"] if cliente_sel else "",
+            )
+
+        with col3:
+            # -------- DATOS DEL SERVICIO --------
+            price = st.number_input("Precio del servicio ($)", min_value=0.0, step=50.0)
+            status = st.selectbox(
+                "Estado del servicio",
+                ["Pendiente", "Confirmado", "Realizado", "Cobrado"],
+            )
+
+        # Estos siempre empiezan en blanco aunque el cliente exista
+        pest_type = st.text_input("Tipo de plaga (cucaracha, garrapata, termita, etc.)")
+        notes = st.text_area("Notas (referencias, paquete, observaciones, etc.)")
+
+        # Mensualidad por SERVICIO
+        is_monthly_service = st.checkbox("Servicio mensual", value=False)
+        permitir_empalme = st.checkbox("Agendar aunque se empalme con otro servicio", value=False)
+
+        # ---------- ÚNICO BOTÓN: GUARDAR CLIENTE Y AGENDAR SERVICIO ----------
+        guardar_cliente_servicio = st.form_submit_button("🟩 Guardar cliente y agendar servicio")
+
+        if guardar_cliente_servicio:
+            if not name and not business_name:
+                st.error("Pon al menos el nombre de la persona o del negocio.")
+            else:
+                # Cliente nuevo y servicio se guardan juntos: un solo commit
+                try:
+                    with db.transaction() as tx:
+                        # Si es cliente NUEVO (no seleccionado en "Buscar cliente") → guardar cliente
+                        if seleccion == "-- Cliente nuevo --":
+                            client_id = db.add_client(
+                                name=name or (business_name or "Cliente sin nombre"),
+                                business_name=business_name,
+                                address=address,
+                                zone=zone,
+                                phone=phone,
+                                notes=notes,
+                                # Un servicio mensual hace mensual al cliente, ese mismo día
+                                is_monthly=is_monthly_service,
+                                monthly_day=service_date.day if is_monthly_service else None,
+                                tx=tx,
+                            )
+                        else:
+                            client_id = cliente_sel["id"] if cliente_sel else None
+
+                        # Siempre agendar el servicio
+                        nombre_mostrar = business_name or name
+                        db.add_appointment(
+                            client_name=nombre_mostrar,
+                            service_type="Negocio" if business_name else "Casa",
+                            pest_type=pest_type,
+                            address=address,
+                            zone=zone,
+                            phone=phone,
+                            fecha=service_date,
+                            hora=service_time,
+                            price=price if price > 0 else None,
+                            status=status,
+                            notes=notes,
+                            is_monthly_service=is_monthly_service,
+                            client_id=client_id,
+                            allow_overlap=permitir_empalme,
+                            tx=tx,
+                        )
+                except db.ScheduleConflict:
+                    # Nada se guardó: ni el servicio ni el cliente nuevo
+                    st.error(
+                        "El servicio se empalma con otro ya agendado. Cambia la hora "
+                        "o marca 'Agendar aunque se empalme con otro servicio'."
+                    )
+                else:
+                    st.success(
+                        "✅ Servicio agendado."
+                        + (" Cliente guardado." if seleccion == "-- Cliente nuevo --" else "")
+                    )
+                    st.rerun()
+
+
+nuevo_servicio()
+
+
+# =========================
+# SERVICIOS AGENDADOS (EN EXPANDER)
+# =========================
+def cambios_tabla_servicios(tabla, edited_rows):
+    """Lo editado en el st.data_editor de servicios, listo para
+    db.update_appointment_fields: {id: {columna: valor}}.
+
+    `edited_rows` es el de st.session_state[clave]; solo cuentan las celdas
+    que de verdad quedaron distintas de `tabla`.
+    """
+    import pandas as pd
+
+    columnas = {encabezado: c for c, encabezado in db.APPOINTMENT_COLUMNS.items()}
+    cambios = {}
+    for posicion, celdas in edited_rows.items():
+        fila = tabla.iloc[int(posicion)]
+        valores = {}
+        for encabezado, valor in celdas.items():
+            antes = fila[encabezado]
+            if (pd.isna(antes) and pd.isna(valor)) or antes == valor:
+                continue
+            valores[columnas[encabezado]] = None if pd.isna(valor) else valor
+        if valores:
+            cambios[int(fila["ID"])] = valores
+    return cambios
+
+
+@seccion
+def servicios_agendados():
+    with st.expander("📅 Servicios agendados", expanded=False):
+        col_f1, col_f2, col_f3 = st.columns(3)
+
+        with col_f1:
+            filtro_rango = st.selectbox(
+                "Rango de fechas",
+                ["Hoy", "Próximos 7 días", "Todos"],
+                index=1,
+                key="filtro_rango_serv",
+            )
+
+        with col_f2:
+            filtro_estado = st.selectbox(
+                "Estado",
+                ["Todos", "Pendiente", "Confirmado", "Realizado", "Cobrado"],
+                index=0,
+                key="filtro_estado_serv",
+            )
+
+        with col_f3:
+            por_pagina = st.selectbox(
+                "Servicios por página",
+                [25, 50, 100, 200],
+                index=1,
+                key="por_pagina_serv",
+            )
+
+        # Como en mensuales: con el expander cerrado no se consulta ni se arma
+        # la tabla (la primera tabla además carga pandas y pyarrow)
+        if not st.checkbox("Mostrar servicios", key="ver_servicios"):
+            return
+
+        date_from = None
+        date_to = None
+
+        if filtro_rango == "Hoy":
+            date_from = str(hoy)
+            date_to = str(hoy)
+        elif filtro_rango == "Próximos 7 días":
+            date_from = str(hoy)
+            date_to = str(hoy + timedelta(days=7))
+
+        # Paginación por cursor: guardamos el cursor con el que empieza cada página
+        # visitada; si cambian los filtros volvemos a la primera página.
+        filtros_serv = (filtro_rango, filtro_estado, por_pagina, str(hoy))
+        if st.session_state.get("serv_filtros") != filtros_serv:
+            st.session_state["serv_filtros"] = filtros_serv
+            st.session_state["serv_cursores"] = [None]
+        cursores_serv = st.session_state["serv_cursores"]
+
+        # Una sola consulta por página: la tabla sale columnar del cursor, ya
+        # con los encabezados en español, y de ella salen también los
+        # selectores de abajo y el cursor de la siguiente página
+        tabla_serv, cursor_siguiente = db.get_appointments_page_frame(
+            date_from=date_from,
+            date_to=date_to,
+            status=filtro_estado,
+            after=cursores_serv[-1],
+            page_size=por_pagina,
+        )
+
+        if tabla_serv.empty and len(cursores_serv) > 1:
+            # La página se quedó vacía (p. ej. tras eliminar servicios)
+            st.session_state["serv_cursores"] = [None]
+            st.rerun()
+
+        if tabla_serv.empty:
+            st.info("No hay servicios con los filtros seleccionados.")
+        else:
+            # ✏️ Cierre del día: estado, precio, notas, etc. se cambian en la
+            # misma tabla y se guardan de una vez solo las celdas editadas
+            if not st.toggle("✏️ Editar en la tabla", key="editar_tabla_serv"):
+                st.dataframe(tabla_serv, use_container_width=True, hide_index=True)
+            else:
+                editables = {db.APPOINTMENT_COLUMNS[c] for c in db.EDITABLE_APPOINTMENT_COLUMNS}
+                # Otra clave tras guardar o al cambiar de página/filtros: el
+                # editor vuelve a empezar sobre los datos nuevos
+                clave_editor = "editor_serv_{}_{}_{}".format(
+                    st.session_state.get("version_editor_serv", 0),
+                    len(cursores_serv),
+                    "_".join(map(str, filtros_serv)),
+                )
+                st.data_editor(
+                    tabla_serv,
+                    key=clave_editor,
+                    use_container_width=True,
+                    hide_index=True,
+                    disabled=[c for c in tabla_serv.columns if c not in editables],
+                    column_config={
+                        "Estado": st.column_config.SelectboxColumn(options=list(db.STATUSES), required=True),
+                        "Precio": st.column_config.NumberColumn(min_value=0.0, step=50.0),
+                    },
+                )
+                cambios_tabla = cambios_tabla_servicios(tabla_serv, st.session_state[clave_editor]["edited_rows"])
+
+                col_t1, col_t2, col_t3 = st.columns([2, 1, 1])
+                with col_t1:
+                    guardar_tabla = st.button(
+                        f"💾 Guardar cambios de la tabla ({len(cambios_tabla)} servicios)",
+                        disabled=not cambios_tabla,
+                    )
+                # Cambia toda la página de un clic: sin estado elegido de
+                # antemano y con casilla de confirmación, como eliminar
+                with col_t2:
+                    estado_pagina = st.selectbox(
+                        "Estado para toda la página",
+                        db.STATUSES,
+                        index=None,
+                        placeholder="Elige un estado",
+                        key="estado_pagina_serv",
+                    )
+                    confirmar_pagina = st.checkbox(
+                        f"✅ Confirmar: cambiar los {len(tabla_serv)} servicios de la página",
+                        key=f"confirmar_pagina_{clave_editor}",
+                    )
+                with col_t3:
+                    aplicar_pagina = st.button(
+                        f"Marcar {len(tabla_serv)} como {estado_pagina or '…'}",
+                        disabled=estado_pagina is None,
+                    )
+
+                # Si algo falla no se guarda nada (una sola transacción) y la
+                # tabla conserva lo editado para corregirlo
+                if guardar_tabla:
+                    try:
+                        actualizados = db.update_appointment_fields(cambios_tabla)
+                    except (ValueError, db.ArchivedAppointments) as e:
+                        st.error(f"No se guardó ningún cambio. {e}.")
+                    else:
+                        st.session_state["version_editor_serv"] = st.session_state.get("version_editor_serv", 0) + 1
+                        st.success(f"✅ {actualizados} servicios actualizados.")
+                        st.rerun()
+                if aplicar_pagina and not confirmar_pagina:
+                    st.warning("Marca la casilla 'Confirmar' para cambiar el estado de toda la página.")
+                elif aplicar_pagina:
+                    try:
+                        actualizados = db.update_statuses(tabla_serv["ID"].tolist(), estado_pagina)
+                    except (ValueError, db.ArchivedAppointments) as e:
+                        st.error(f"No se cambió ningún estado. {e}.")
+                    else:
+                        st.session_state["version_editor_serv"] = st.session_state.get("version_editor_serv", 0) + 1
+                        st.success(f"✅ {actualizados} servicios marcados como {estado_pagina}.")
+                        st.rerun()
+
+            total_serv = db.count_appointments(date_from=date_from, date_to=date_to, status=filtro_estado)
+            paginas_serv = (total_serv - 1) // por_pagina + 1
+
+            col_p1, col_p2, col_p3 = st.columns([1, 2, 1])
+            with col_p1:
+                if st.button("⬅️ Anterior", disabled=len(cursores_serv) == 1):
+                    cursores_serv.pop()
+                    st.rerun()
+            with col_p2:
+                st.caption(f"Página {len(cursores_serv)} de {paginas_serv} · {total_serv} servicios")
+            with col_p3:
+                if st.button("Siguiente ➡️", disabled=cursor_siguiente is None):
+                    cursores_serv.append(cursor_siguiente)
+                    st.rerun()
+
+            st.markdown("---")
+            st.subheader("Buscar / editar servicio")
+
+            # -------- BUSCAR SERVICIO POR ID, NOMBRE O TEXTO --------
+            texto_serv = st.text_input(
+                "Buscar en todos los servicios (cliente, dirección, zona, plaga, notas)",
+                key="texto_buscar_serv",
+            )
+            # id → etiqueta; sin texto se ofrecen los servicios de la página
+            # actual, tomados de la misma tabla
+            if texto_serv:
+                etiquetas_serv = {r["id"]: db.appointment_label(r) for r in db.search_appointments(texto_serv)}
+            else:
+                etiquetas_serv = {
+                    int(i): f"{cliente} ({fecha} {hora})"
+                    for i, cliente, fecha, hora in zip(
+                        tabla_serv["ID"], tabla_serv["Cliente/Negocio"], tabla_serv["Fecha"], tabla_serv["Hora"]
+                    )
+                }
+            id_por_etiqueta_serv = {etiqueta: i for i, etiqueta in etiquetas_serv.items()}
+
+            col_bs1, col_bs2, col_bs3 = st.columns([2, 2, 1])
+
+            with col_bs1:
+                opciones_ids_serv = ["--"] + [str(i) for i in etiquetas_serv]
+                servicio_id_sel = st.selectbox("Buscar por ID de servicio", opciones_ids_serv)
+
+            with col_bs2:
+                opciones_nombres_serv = ["--"] + list(etiquetas_serv.values())
+                servicio_nombre_sel = st.selectbox("Buscar por cliente / negocio", opciones_nombres_serv)
+
+            with col_bs3:
+                buscar_servicio_btn = st.button("🔍 Buscar servicio")
+
+            if buscar_servicio_btn:
+                servicio_id = None
+
+                # Preferimos búsqueda por ID si se eligió
+                if servicio_id_sel != "--":
+                    try:
+                        sid = int(servicio_id_sel)
+                        if sid in etiquetas_serv:
+                            servicio_id = sid
+                    except ValueError:
+                        servicio_id = None
+                elif servicio_nombre_sel != "--":
+                    servicio_id = id_por_etiqueta_serv.get(servicio_nombre_sel)
+
+                if servicio_id is None:
+                    st.error("No se encontró el servicio con los datos seleccionados.")
+                    st.session_state["servicio_edit_id"] = None
+                else:
+                    st.session_state["servicio_edit_id"] = servicio_id
+
+            servicio_edit_id = st.session_state.get("servicio_edit_id")
+
+            # -------- EDITAR / ELIMINAR SERVICIO (solo si se buscó) --------
+            if servicio_edit_id:
+                selected_row = db.get_appointment_by_id(servicio_edit_id)
+
+                if selected_row:
+                    st.markdown("### ✏️ Editar servicio seleccionado")
+
+                    # fx.db ya entrega la fecha y la hora convertidas
+                    fecha_edit = selected_row["fecha"] or hoy
+                    hora_edit = selected_row["hora"] or dt.now().time()
+
+                    is_monthly_service_current = False
+                    if "is_monthly_service" in selected_row.keys() and selected_row["is_monthly_service"] == 1:
+                        is_monthly_service_current = True
+
+                    with st.form("form_editar_servicio"):
+                        col_e1, col_e2, col_e3 = st.columns(3)
+
+                        with col_e1:
+                            client_name_edit = st.text_input(
+                                "Cliente / Negocio",
+                                value=selected_row["client_name"],
+                            )
+                            pest_type_edit = st.text_input(
+                                "Tipo de plaga",
+                                value=selected_row["pest_type"] or "",
+                            )
+
+                        with col_e2:
+                            zone_edit = st.text_input(
+                                "Colonia / zona",
+                                value=selected_row["zone"] or "",
+                            )
+                            address_edit = st.text_input(
+                                "Dirección",
+                                value=selected_row["address"] or "",
+                            )
+                            phone_edit = st.text_input(
+                                "Teléfono",
+                                value=selected_row["phone"] or "",
+                            )
+
+                        with col_e3:
+                            service_date_edit = st.date_input(
+                                "Fecha del servicio (editar)",
+                                value=fecha_edit,
+                                key="fecha_edit",
+                            )
+                            service_time_edit = st.time_input(
+                                "Hora del servicio (editar)",
+                                value=hora_edit,
+                                key="hora_edit",
+                            )
+                            price_edit = st.number_input(
+                                "Precio ($) (editar)",
+                                min_value=0.0,
+                                step=50.0,
+                                value=float(selected_row["price"]) if selected_row["price"] is not None else 0.0,
+                                key="price_edit",
+                            )
+                            status_edit = st.selectbox(
+                                "Estado (editar)",
+                                ["Pendiente", "Confirmado", "Realizado", "Cobrado"],
+                                index=["Pendiente", "Confirmado", "Realizado", "Cobrado"].index(selected_row["status"]) if selected_row["status"] in ["Pendiente", "Confirmado", "Realizado", "Cobrado"] else 0,
+                                key="status_edit",
+                            )
+
+                        notes_edit = st.text_area(
+                            "Notas (editar)",
+                            value=selected_row["notes"] or "",
+                        )
+
+                        is_monthly_service_edit = st.checkbox(
+                            "Servicio mensual (editar)",
+                            value=is_monthly_service_current,
+                        )
+
+                        permitir_empalme_edit = st.checkbox(
+                            "Guardar aunque se empalme con otro servicio",
+                            key=f"empalme_serv_{servicio_edit_id}",
+                        )
+
+                        confirmar_eliminar_serv = st.checkbox(
+                            "✅ Confirmar eliminación de este servicio",
+                            key=f"confirm_del_serv_{servicio_edit_id}",
+                        )
+
+                        col_btn_s1, col_btn_s2 = st.columns(2)
+                        with col_btn_s1:
+                            guardar_cambios_serv = st.form_submit_button("💾 Guardar cambios del servicio")
+                        with col_btn_s2:
+                            eliminar_servicio_btn = st.form_submit_button("🗑️ Eliminar servicio")
+
+                        if guardar_cambios_serv:
+                            try:
+                                db.update_appointment_full(
+                                    appointment_id=servicio_edit_id,
+                                    client_name=client_name_edit,
+                                    service_type=selected_row["service_type"],
+                                    pest_type=pest_type_edit,
+                                    address=address_edit,
+                                    zone=zone_edit,
+                                    phone=phone_edit,
+                                    fecha=service_date_edit,
+                                    hora=service_time_edit,
+                                    price=price_edit if price_edit > 0 else None,
+                                    status=status_edit,
+                                    notes=notes_edit,
+                                    is_monthly_service=is_monthly_service_edit,
+                                    allow_overlap=permitir_empalme_edit,
+                                )
+                            except db.ScheduleConflict as e:
+                                huecos = db.next_free_slots(service_date_edit, service_time_edit, n=3)
+                                st.error(
+                                    f"Se empalma con los servicios {', '.join(map(str, e.conflicts))}. "
+                                    "Huecos libres: "
+                                    + (", ".join(h.strftime("%d/%m %H:%M") for h in huecos) or "ninguno")
+                                )
+                            except db.ArchivedAppointments as e:
+                                st.error(f"{e}: no se puede editar.")
+                            else:
+                                st.success("✅ Servicio actualizado correctamente.")
+                                st.session_state["servicio_edit_id"] = None
+                                st.rerun()
+
+                        if eliminar_servicio_btn:
+                            if confirmar_eliminar_serv:
+                                try:
+                                    db.delete_appointment(servicio_edit_id)
+                                except db.ArchivedAppointments as e:
+                                    st.error(f"{e}: no se puede eliminar.")
+                                else:
+                                    st.warning("🗑️ Servicio eliminado correctamente.")
+                                    st.session_state["servicio_edit_id"] = None
+                                    st.rerun()
+                            else:
+                                st.warning("Marca la casilla 'Confirmar eliminación de este servicio' para eliminar.")
+
+
+servicios_agendados()
+
+
+# =========================
+# RUTA DEL DÍA (EN EXPANDER)
+# =========================
+@seccion
+def ruta_del_dia():
+    with st.expander("🚐 Ruta del día", expanded=False):
+        # Igual que en mensuales: no se planea nada hasta que se pide
+        col_r1, col_r2, col_r3 = st.columns(3)
+        with col_r1:
+            fecha_ruta = st.date_input("Día", value=hoy, key="fecha_ruta")
+        with col_r2:
+            tecnicos_ruta = st.number_input(
+                "Técnicos", min_value=1, max_value=20, value=db.TECHNICIANS, key="tecnicos_ruta"
+            )
+        with col_r3:
+            estado_ruta = st.selectbox(
+                "Estado",
+                ["Abiertos", "Pendiente", "Confirmado", "Todos"],
+                index=0,
+                key="estado_ruta",
+            )
+
+        if st.checkbox("Planear ruta", key="ver_ruta"):
+            rutas = routes.plan_day(
+                fecha_ruta,
+                technicians=tecnicos_ruta,
+                status=None if estado_ruta == "Abiertos" else estado_ruta,
+            )
+            if not any(rutas):
+                st.info("No hay servicios agendados ese día.")
+            for ruta in rutas:
+                if not ruta:
+                    continue
+                st.markdown(
+                    f"**Técnico {ruta.technician}** · {len(ruta)} servicios · "
+                    f"{ruta.km:.1f} km · zonas: {', '.join(ruta.zones)}"
+                    + (f" · ⚠️ {ruta.late} fuera de horario" if ruta.late else "")
+                )
+                tabla_ruta = [
+                    {
+                        "#": s["orden"],
+                        "Llegada": s["llegada"].strftime("%H:%M"),
+                        "Hora agendada": s["time"],
+                        "Cliente/Negocio": s["client_name"],
+                        "Zona": s["zone"],
+                        "Dirección": s["address"],
+                        "Teléfono": s["phone"],
+                        "Km": s["km_tramo"],
+                        "Tarde": "⚠️" if s["tarde"] else "",
+                    }
+                    for s in ruta.stops
+                ]
+                st.dataframe(tabla_ruta, use_container_width=True)
+
+
+ruta_del_dia()
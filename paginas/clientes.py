@@ -0,0 +1,167 @@
+"""Clientes: buscar, editar y eliminar."""
+from datetime import date
+
+import streamlit as st
+
+from fx import db
+from paginas.comun import seccion
+
+hoy = date.today()
+
+
+# =========================
+# BUSCAR Y EDITAR CLIENTE
+# =========================
+@seccion
+def editar_cliente():
+    st.markdown("---")
+    st.subheader("Buscar y editar cliente")
+
+    if not db.count_clients():
+        st.info("Aún no tienes clientes guardados.")
+    else:
+        col_c1, col_c2, col_c3 = st.columns([2, 2, 1])
+
+        with col_c1:
+            cliente_id_sel = st.text_input("Buscar por ID de cliente", key="id_buscar_cliente").strip() or "--"
+
+        with col_c2:
+            texto_cliente_edit = st.text_input(
+                "Buscar por nombre / negocio / teléfono",
+                key="texto_editar_cliente",
+            )
+            clientes_para_editar = db.RecordIndex(db.search_clients(texto_cliente_edit), db.client_label)
+            opciones_nombres = ["--"] + clientes_para_editar.labels
+            cliente_nombre_sel = st.selectbox("Resultados", opciones_nombres)
+
+        with col_c3:
+            buscar_cliente_btn = st.button("🔍 Buscar cliente")
+
+        if buscar_cliente_btn:
+            cliente_id = None
+
+            if cliente_id_sel != "--":
+                try:
+                    cid = int(cliente_id_sel)
+                    if db.get_client_by_id(cid) is not None:
+                        cliente_id = cid
+                except ValueError:
+                    cliente_id = None
+            elif cliente_nombre_sel != "--":
+                cliente_id = clientes_para_editar.id_by_label.get(cliente_nombre_sel)
+
+            if cliente_id is None:
+                st.error("No se encontró el cliente con los datos seleccionados.")
+                st.session_state["cliente_edit_id"] = None
+            else:
+                st.session_state["cliente_edit_id"] = cliente_id
+
+        cliente_edit_id = st.session_state.get("cliente_edit_id")
+
+        if cliente_edit_id:
+            cliente_encontrado = db.get_client_by_id(cliente_edit_id)
+
+            if cliente_encontrado:
+                st.markdown("### ✏️ Editar datos del cliente")
+
+                historial = db.get_client_appointments(cliente_edit_id, limit=20)
+                with st.expander(f"🗂️ Últimos servicios del cliente ({len(historial)})", expanded=False):
+                    if not historial:
+                        st.info("Este cliente aún no tiene servicios asociados.")
+                    else:
+                        st.dataframe(
+                            [
+                                {
+                                    "ID": r["id"],
+                                    "Fecha": r["date"],
+                                    "Hora": r["time"],
+                                    "Plaga": r["pest_type"],
+                                    "Precio": r["price"],
+                                    "Estado": r["status"],
+                                }
+                                for r in historial
+                            ],
+                            use_container_width=True,
+                        )
+
+                with st.form("form_editar_cliente"):
+                    name_edit = st.text_input(
+                        "Nombre de la persona / contacto",
+                        value=cliente_encontrado["name"] or "",
+                    )
+                    business_name_edit = st.text_input(
+                        "Nombre del negocio",
+                        value=cliente_encontrado["business_name"] or "",
+                    )
+                    phone_edit = st.text_input(
+                        "Teléfono",
+                        value=cliente_encontrado["phone"] or "",
+                    )
+                    zone_edit = st.text_input(
+                        "Colonia / zona",
+                        value=cliente_encontrado["zone"] or "",
+                    )
+                    address_edit = st.text_input(
+                        "Dirección",
+                        value=cliente_encontrado["address"] or "",
+                    )
+                    notes_edit = st.text_area(
+                        "Notas",
+                        value=cliente_encontrado["notes"] or "",
+                    )
+
+                    col_men1, col_men2 = st.columns(2)
+                    with col_men1:
+                        is_monthly_edit = st.checkbox(
+                            "Cliente mensual (se agenda solo cada mes)",
+                            value=cliente_encontrado["is_monthly"] == 1,
+                        )
+                    with col_men2:
+                        monthly_day_edit = st.number_input(
+                            "Día del mes",
+                            min_value=1,
+                            max_value=31,
+                            value=cliente_encontrado["monthly_day"] or hoy.day,
+                        )
+
+                    confirmar_eliminar_cliente = st.checkbox(
+                        "✅ Confirmar eliminación de este cliente",
+                        key=f"confirm_del_cli_{cliente_edit_id}",
+                    )
+
+                    col_btn_c1, col_btn_c2 = st.columns(2)
+                    with col_btn_c1:
+                        guardar_cliente_cambios = st.form_submit_button("💾 Guardar cambios del cliente")
+                    with col_btn_c2:
+                        eliminar_cliente_btn = st.form_submit_button("🗑️ Eliminar cliente")
+
+                    if guardar_cliente_cambios:
+                        if not name_edit and not business_name_edit:
+                            st.error("Pon al menos el nombre de la persona o del negocio.")
+                        else:
+                            db.update_client(
+                                client_id=cliente_edit_id,
+                                name=name_edit or "Cliente sin nombre",
+                                business_name=business_name_edit,
+                                address=address_edit,
+                                zone=zone_edit,
+                                phone=phone_edit,
+                                notes=notes_edit,
+                                is_monthly=is_monthly_edit,
+                                monthly_day=int(monthly_day_edit) if is_monthly_edit else None,
+                            )
+                            st.success("✅ Cliente actualizado correctamente.")
+                            st.session_state["cliente_edit_id"] = None
+                            st.rerun()
+
+                    if eliminar_cliente_btn:
+                        if confirmar_eliminar_cliente:
+                            db.delete_client(cliente_edit_id)
+                            st.warning("🗑️ Cliente eliminado correctamente.")
+                            st.session_state["cliente_edit_id"] = None
+                            st.rerun()
+                        else:
+                            st.warning("Marca la casilla 'Confirmar eliminación de este cliente' para eliminar.")
+
+
+editar_cliente()
@@ -0,0 +1,25 @@
+"""Piezas compartidas por las páginas de la app."""
+import functools
+import time
+
+import streamlit as st
+
+
+def seccion(fn):
+    """Sección de la página que se re-ejecuta sola (st.fragment).
+
+    Un widget dentro de la sección solo vuelve a correr esa función y sus
+    consultas. Las escrituras llaman a st.rerun(), que sí refresca toda la
+    página. Cada ejecución deja su tiempo en session_state["tiempos_secciones"].
+    """
+    @st.fragment
+    @functools.wraps(fn)
+    def wrapper():
+        t0 = time.perf_counter()
+        try:
+            fn()
+        finally:
+            tiempos = st.session_state.setdefault("tiempos_secciones", {})
+            tiempos[fn.__name__] = (time.perf_counter() - t0) * 1000
+
+    return wrapper
@@ -0,0 +1,55 @@
+"""Mensuales: servicios marcados como mensuales y su agenda automática."""
+import streamlit as st
+
+from fx import db, recurrence
+from paginas.comun import seccion
+
+
+# =========================
+# TABLA SERVICIOS MENSUALES (EN EXPANDER)
+# =========================
+MENSUALES_POR_PAGINA = 50
+
+
+@seccion
+def servicios_mensuales():
+    with st.expander("📌 Servicios marcados como mensuales", expanded=False):
+        # El contenido del expander se ejecuta aunque esté cerrado, así que no
+        # consultamos nada hasta que el usuario pide ver la lista.
+        col_m1, col_m2 = st.columns([2, 1])
+        with col_m1:
+            ver_mensuales = st.checkbox("Mostrar servicios mensuales", key="ver_mensuales")
+        with col_m2:
+            if st.button(f"🔁 Agendar mensuales ({recurrence.HORIZON_DAYS} días)"):
+                nuevos = recurrence.generate_monthly_appointments()
+                # Se refresca toda la página: los servicios nuevos salen en otras secciones
+                st.session_state["aviso_mensuales"] = f"✅ {nuevos} servicios mensuales agendados."
+                st.rerun()
+        if "aviso_mensuales" in st.session_state:
+            st.success(st.session_state.pop("aviso_mensuales"))
+
+        if ver_mensuales:
+            total_mensuales = db.count_monthly_appointments()
+
+            if not total_mensuales:
+                st.info("Aún no tienes servicios marcados como mensuales.")
+            else:
+                paginas_mensuales = (total_mensuales - 1) // MENSUALES_POR_PAGINA + 1
+                pagina_mensuales = 1
+                if paginas_mensuales > 1:
+                    pagina_mensuales = st.number_input(
+                        f"Página (de {paginas_mensuales})",
+                        min_value=1,
+                        max_value=paginas_mensuales,
+                        value=1,
+                        key="pagina_mensuales",
+                    )
+
+                tabla_mensuales = db.get_monthly_frame(
+                    limit=MENSUALES_POR_PAGINA,
+                    offset=(pagina_mensuales - 1) * MENSUALES_POR_PAGINA,
+                )
+                st.dataframe(tabla_mensuales, use_container_width=True, hide_index=True)
+
+
+servicios_mensuales()
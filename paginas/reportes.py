@@ -0,0 +1,103 @@
+"""Reportes: resumen de ingresos."""
+from datetime import date
+
+import streamlit as st
+
+from fx import db
+from paginas.comun import seccion
+
+hoy = date.today()
+
+
+# =========================
+# RESUMEN DE INGRESOS (EN EXPANDER)
+# =========================
+PERIODOS_RESUMEN = {"Día": "day", "Semana": "week", "Mes": "month"}
+GRUPOS_RESUMEN = {"Estado": "status", "Zona": "zone", "Plaga": "pest_type"}
+
+
+@seccion
+def resumen_ingresos():
+    with st.expander("📊 Resumen de ingresos", expanded=False):
+        # Sale de la tabla de totales (un renglón por día y combinación), no de
+        # recorrer todos los servicios
+        col_t1, col_t2, col_t3, col_t4 = st.columns(4)
+        with col_t1:
+            resumen_desde = st.date_input("Desde", value=hoy.replace(day=1), key="resumen_desde")
+        with col_t2:
+            resumen_hasta = st.date_input("Hasta", value=hoy, key="resumen_hasta")
+        with col_t3:
+            periodo_resumen = st.selectbox("Periodo", list(PERIODOS_RESUMEN), index=2, key="periodo_resumen")
+        with col_t4:
+            grupos_resumen = st.multiselect(
+                "Agrupar por", list(GRUPOS_RESUMEN), default=["Estado"], key="grupos_resumen"
+            )
+
+        if st.checkbox("Mostrar resumen", key="ver_resumen"):
+            # Importe por estado y servicios por zona: una lectura de la tabla
+            # de totales, sin recorrer los servicios
+            por_zona_estado = db.get_totals(
+                resumen_desde, resumen_hasta, period="month", group_by=("zone", "status")
+            )
+            importe_estado, servicios_zona = {}, {}
+            for r in por_zona_estado:
+                importe_estado[r["status"]] = importe_estado.get(r["status"], 0) + r["total"]
+                zona = r["zone"] or "Sin zona"
+                servicios_zona[zona] = servicios_zona.get(zona, 0) + r["n"]
+
+            col_k1, col_k2, col_k3 = st.columns(3)
+            col_k1.metric("Cobrado", f"${importe_estado.get('Cobrado', 0):,.2f}")
+            col_k2.metric("Realizado (por cobrar)", f"${importe_estado.get('Realizado', 0):,.2f}")
+            col_k3.metric(
+                "Pendiente / Confirmado",
+                f"${importe_estado.get('Pendiente', 0) + importe_estado.get('Confirmado', 0):,.2f}",
+            )
+
+            totales = db.get_totals(
+                resumen_desde,
+                resumen_hasta,
+                period=PERIODOS_RESUMEN[periodo_resumen],
+                group_by=tuple(GRUPOS_RESUMEN[g] for g in grupos_resumen),
+            )
+            nombres_resumen = {"period": periodo_resumen, "n": "Servicios", "total": "Importe ($)"}
+            nombres_resumen.update({v: k for k, v in GRUPOS_RESUMEN.items()})
+            st.dataframe(
+                [{nombres_resumen[k]: v for k, v in r.items()} for r in totales],
+                use_container_width=True,
+            )
+
+            col_a1, col_a2 = st.columns(2)
+            with col_a1:
+                st.caption(f"Servicios por zona ({sum(servicios_zona.values())})")
+                st.dataframe(
+                    [
+                        {"Zona": zona, "Servicios": n}
+                        for zona, n in sorted(servicios_zona.items(), key=lambda zn: -zn[1])
+                    ],
+                    use_container_width=True,
+                )
+            with col_a2:
+                # Los percentiles sí necesitan el precio de cada servicio del
+                # rango: solo se leen si se piden
+                if st.checkbox("Ver precio por percentil", key="ver_percentiles"):
+                    analisis = db.get_appointments_analytics(resumen_desde, resumen_hasta)
+                    st.caption(f"Precio por percentil ({analisis['count']} servicios)")
+                    st.dataframe(
+                        analisis["price_percentiles"]
+                        .rename("Precio ($)")
+                        .rename(lambda p: f"P{round(p * 100)}")
+                        .to_frame(),
+                        use_container_width=True,
+                    )
+
+            if st.button("🧮 Verificar totales"):
+                try:
+                    db.check_totals()
+                    st.success("✅ Los totales cuadran con los servicios.")
+                except db.TotalsMismatchError as e:
+                    st.error(str(e))
+                    db.rebuild_totals()
+                    st.info("Se recalcularon los totales desde cero.")
+
+
+resumen_ingresos()